@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'dashboard.middleware.MetricsMiddleware',  # Outermost, so it times everything below
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,12 +61,175 @@ MIDDLEWARE = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'dashboard.authentication.DeviceAPIKeyAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'dashboard.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
-    )
+    ),
+    # orjson-backed JSON (falls back to DRF's encoder when orjson is missing).
+    'DEFAULT_RENDERER_CLASSES': (
+        'dashboard.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+}
+
+# In-process api_key -> Device cache used by DeviceAPIKeyAuthentication.
+# NEGATIVE_TTL applies to unknown keys so brute-force floods stay off the DB;
+# they are kept in a separate NEGATIVE_MAX_SIZE LRU so they cannot evict real devices.
+DEVICE_API_KEY_CACHE = {
+    'MAX_SIZE': config('DEVICE_API_KEY_CACHE_SIZE', default=1024, cast=int),
+    'TTL': config('DEVICE_API_KEY_CACHE_TTL', default=300, cast=int),
+    'NEGATIVE_TTL': config('DEVICE_API_KEY_CACHE_NEGATIVE_TTL', default=30, cast=int),
+    'NEGATIVE_MAX_SIZE': config('DEVICE_API_KEY_CACHE_NEGATIVE_SIZE', default=256, cast=int),
+}
+
+# In-process user id -> (User, active Device) cache used by CachedJWTAuthentication.
+# Invalidated by User/Device signals; TTL bounds staleness across workers.
+JWT_PRINCIPAL_CACHE = {
+    'MAX_SIZE': config('JWT_PRINCIPAL_CACHE_SIZE', default=1024, cast=int),
+    'TTL': config('JWT_PRINCIPAL_CACHE_TTL', default=60, cast=int),
+}
+
+# Cache used for the write-through device status snapshots served to ESP polls.
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at Redis or
+# Memcached when running more than one worker process.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='iotfarming'),
+    }
+}
+STATUS_CACHE_TTL = config('STATUS_CACHE_TTL', default=300, cast=int)
+
+# /api/history/ with resolution=auto picks the coarsest rollup giving at least
+# HISTORY_MIN_POINTS points; no response carries more than HISTORY_MAX_POINTS.
+HISTORY_MIN_POINTS = config('HISTORY_MIN_POINTS', default=60, cast=int)
+HISTORY_MAX_POINTS = config('HISTORY_MAX_POINTS', default=5000, cast=int)
+
+# Background jobs (dashboard/jobs.py). Every serving process flushes its own
+# liveness and anomaly state; the jobs that act on the whole database
+# (retention, offline detection, command expiry) only run where
+# RUN_SHARED_JOBS is True. With several workers, leave it True in one only.
+RUN_SHARED_JOBS = config('RUN_SHARED_JOBS', default=True, cast=bool)
+
+# Data retention, applied by `manage.py prune_data` and, when INTERVAL > 0,
+# by the shared background job (every INTERVAL seconds).
+# Rollups are kept forever unless a per-resolution day count is set.
+# ACKED_COMMANDS_DAYS applies to every finished (acked, expired, superseded) command.
+RETENTION = {
+    'READINGS_DAYS': config('RETENTION_READINGS_DAYS', default=30, cast=int),
+    'ACKED_COMMANDS_DAYS': config('RETENTION_ACKED_COMMANDS_DAYS', default=90, cast=int),
+    'ROLLUP_DAYS': {'1m': None, '1h': None, '1d': None},
+    'CHUNK_SIZE': config('RETENTION_CHUNK_SIZE', default=5000, cast=int),
+    'INTERVAL': config('RETENTION_INTERVAL', default=0, cast=int),
+}
+
+# Upper bound (seconds) an ESP long-poll on /api/status/esp/wait/ is held open.
+LONG_POLL_MAX_TIMEOUT = config('LONG_POLL_MAX_TIMEOUT', default=25, cast=float)
+
+# Auto irrigation rules engine (dashboard/rules.py). Per-device thresholds
+# live in AutoModeRule; the thresholds below apply to devices without one.
+AUTO_MODE = {
+    'RULES': [
+        'dashboard.rules.ThresholdRule',
+        'dashboard.rules.MinRunTimeRule',
+    ],
+    'ASYNC': config('AUTO_MODE_ASYNC', default=True, cast=bool),
+    'QUEUE_SIZE': 10000,
+    'DRY_THRESHOLD': 30,
+    'WET_THRESHOLD': 60,
+}
+
+# Write-behind ingest (dashboard/ingest_buffer.py). When enabled, reading
+# requests return 202 once buffered and a background thread commits them in
+# batches, one transaction per device. Set INGEST_SPOOL_PATH so acknowledged
+# readings survive a crash (each process spools to INGEST_SPOOL_PATH.<pid>).
+INGEST_WRITE_BEHIND = {
+    'ENABLED': config('INGEST_WRITE_BEHIND', default=False, cast=bool),
+    'MAX_ITEMS': config('INGEST_BUFFER_MAX_ITEMS', default=10000, cast=int),
+    'FLUSH_SIZE': config('INGEST_FLUSH_SIZE', default=500, cast=int),
+    'FLUSH_INTERVAL': config('INGEST_FLUSH_INTERVAL', default=1.0, cast=float),
+    'SPOOL_PATH': config('INGEST_SPOOL_PATH', default=None),
+    'SPOOL_FSYNC': config('INGEST_SPOOL_FSYNC', default=False, cast=bool),
+    'RETRY_AFTER': 1,
+    'MAX_ATTEMPTS': config('INGEST_MAX_ATTEMPTS', default=5, cast=int),
+}
+
+# Device liveness (dashboard/liveness.py). API-key requests mark a device as
+# seen (at most once per THROTTLE seconds, written in batches every INTERVAL
+# seconds); devices silent for GRACE_INTERVALS x Device.expected_interval are
+# flagged offline by the same job.
+LIVENESS = {
+    'GRACE_INTERVALS': config('LIVENESS_GRACE_INTERVALS', default=3, cast=int),
+    'THROTTLE': 5,
+    'INTERVAL': config('LIVENESS_INTERVAL', default=5, cast=int),
+    'BATCH_SIZE': 500,
+}
+
+# Pump command outbox (dashboard/outbox.py): a new command supersedes the
+# device's undelivered one, and a command not delivered within TTL seconds
+# expires (0 = never). Overdue commands are swept every EXPIRE_INTERVAL seconds.
+COMMAND_OUTBOX = {
+    'TTL': config('COMMAND_TTL', default=600, cast=int),
+    'EXPIRE_INTERVAL': config('COMMAND_EXPIRE_INTERVAL', default=60, cast=int),
+}
 
+# Streaming anomaly detection on incoming readings (dashboard/anomaly.py):
+# spikes off the EWMA baseline, physically impossible jumps and flat-lined
+# probes (no change at all for ANOMALY_STUCK_SECONDS). Spikes and jumps do not
+# drive auto mode unless ANOMALY_SUPPRESS_AUTO_MODE=False; stuck flags only
+# block it with ANOMALY_SUPPRESS_ON_STUCK=True. Detector state is persisted every
+# PERSIST_INTERVAL seconds.
+ANOMALY_DETECTION = {
+    'ENABLED': config('ANOMALY_DETECTION_ENABLED', default=True, cast=bool),
+    'SUPPRESS_AUTO_MODE': config('ANOMALY_SUPPRESS_AUTO_MODE', default=True, cast=bool),
+    'SUPPRESS_ON_STUCK': config('ANOMALY_SUPPRESS_ON_STUCK', default=False, cast=bool),
+    'SPIKE_Z': config('ANOMALY_SPIKE_Z', default=6.0, cast=float),
+    'STUCK_SECONDS': config('ANOMALY_STUCK_SECONDS', default=12 * 3600, cast=int),
+    'STUCK_SAMPLES': config('ANOMALY_STUCK_SAMPLES', default=40, cast=int),
+    'MAX_RATE': config('ANOMALY_MAX_RATE', default=5.0, cast=float),
+    'PERSIST_INTERVAL': config('ANOMALY_PERSIST_INTERVAL', default=30, cast=int),
+}
+
+# Moisture insights (dashboard/analytics.py): drying rate from a trailing
+# SLOPE_WINDOW_MINUTES fit, irrigation gain measured SETTLE_MINUTES after the
+# pump stops, computed over the last WINDOW_HOURS unless the request asks.
+INSIGHTS = {
+    'WINDOW_HOURS': config('INSIGHTS_WINDOW_HOURS', default=48, cast=int),
+    'SLOPE_WINDOW_MINUTES': config('INSIGHTS_SLOPE_WINDOW_MINUTES', default=60, cast=int),
+    'MIN_SLOPE_POINTS': 8,
+    'SETTLE_MINUTES': config('INSIGHTS_SETTLE_MINUTES', default=10, cast=int),
+    'LEVEL_MINUTES': 2,
+}
+
+# Request metrics (dashboard/metrics.py) served on /metrics to holders of
+# METRICS_TOKEN (disabled while it is unset), plus an optional
+# slow-request log: a METRICS_SLOW_SAMPLE_RATE share of requests record their
+# SQL, and those slower than METRICS_SLOW_REQUEST_MS are logged with it.
+METRICS = {
+    'ENABLED': config('METRICS_ENABLED', default=True, cast=bool),
+    'TOKEN': config('METRICS_TOKEN', default=None),
+    'SLOW_REQUEST_MS': config('METRICS_SLOW_REQUEST_MS', default=500, cast=int),
+    'SLOW_SAMPLE_RATE': config('METRICS_SLOW_SAMPLE_RATE', default=0.0, cast=float),
+    'SLOW_MAX_QUERIES': 50,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'plain'},
+    },
+    'loggers': {
+        'dashboard': {
+            'handlers': ['console'],
+            'level': config('LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
@@ -95,30 +259,64 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
 
-db = 'lite'
-
-if db == 'lite':
+# DB_PROFILE picks the database: 'lite' (sqlite, default) or 'postgres'.
+DB_PROFILE = config('DB_PROFILE', default='lite')
+
+if DB_PROFILE == 'lite':
+    # WAL lets readers run alongside the single writer; synchronous=NORMAL only
+    # fsyncs at checkpoints, which is safe in WAL mode. IMMEDIATE transactions
+    # take the write lock up front so concurrent writers queue on busy_timeout
+    # instead of failing with "database is locked". SQLITE_TUNING=False keeps
+    # sqlite's stock settings (e.g. for comparison runs).
+    SQLITE_PRAGMAS = [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA synchronous={config('SQLITE_SYNCHRONOUS', default='NORMAL')}",
+        f"PRAGMA cache_size=-{config('SQLITE_CACHE_SIZE_KB', default=20000, cast=int)}",
+        f"PRAGMA mmap_size={config('SQLITE_MMAP_SIZE', default=134217728, cast=int)}",
+        'PRAGMA temp_store=MEMORY',
+    ]
     DATABASES = {
         'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+            'OPTIONS': {
+                # Seconds to wait on a locked database (sqlite busy_timeout).
+                'timeout': config('SQLITE_BUSY_TIMEOUT', default=20, cast=int),
+            },
         }
-}
+    }
+    if config('SQLITE_TUNING', default=True, cast=bool):
+        DATABASES['default']['OPTIONS'].update({
+            'init_command': ';'.join(SQLITE_PRAGMAS),
+            'transaction_mode': 'IMMEDIATE',
+        })
 else:
     DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': config('DB_NAME'),
-        'USER': config('DB_USER'),
-        'PASSWORD': config('DB_PASSWORD'),
-        'HOST': 'db',  # Matches the service name in docker-compose.yml
-        'PORT': '5432',
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME'),
+            'USER': config('DB_USER'),
+            'PASSWORD': config('DB_PASSWORD'),
+            'HOST': config('DB_HOST', default='db'),  # Matches the service name in docker-compose.yml
+            'PORT': config('DB_PORT', default='5432'),
+            # Keep connections open between requests instead of reconnecting every time.
+            'CONN_MAX_AGE': config('DB_CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Server-side cap so a runaway query cannot hold a worker (milliseconds).
+                'options': f"-c statement_timeout={config('DB_STATEMENT_TIMEOUT_MS', default=5000, cast=int)}",
+            },
+        }
     }
-}
-    
-
+    if config('DB_POOL', default=False, cast=bool):
+        # psycopg 3 connection pool (pip install "psycopg[pool]"); replaces persistent connections.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+        }
 
-    
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
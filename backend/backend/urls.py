@@ -3,6 +3,7 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from dashboard.views import MetricsView
 
 
 urlpatterns = [
@@ -10,5 +11,6 @@ urlpatterns = [
     path('api/', include('dashboard.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 
 ]   + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,9 +1,13 @@
 from django.contrib import admin
-from .models import Device, SensorReading, PumpCommand, CurrentStatus
+from .models import Device, SensorReading, PumpCommand, CurrentStatus, ReadingRollup, AutoModeRule, IngestCursor, SensorHealth
 # Register your models here.
 
 
 admin.site.register(Device)
 admin.site.register(SensorReading)
 admin.site.register(PumpCommand)
-admin.site.register(CurrentStatus)
\ No newline at end of file
+admin.site.register(CurrentStatus)
+admin.site.register(ReadingRollup)
+admin.site.register(AutoModeRule)
+admin.site.register(IngestCursor)
+admin.site.register(SensorHealth)
\ No newline at end of file
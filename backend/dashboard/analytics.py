@@ -0,0 +1,301 @@
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import FloatField, Func
+from .models import SensorReading, PumpCommand, AutoModeRule
+from . import rules
+
+
+DEFAULTS = {
+    'WINDOW_HOURS': 48,          # History analysed when no range is given
+    'SLOPE_WINDOW_MINUTES': 60,  # Trailing window of the rolling drying-rate fit
+    'MIN_SLOPE_POINTS': 8,       # Fewer readings than this in the window -> no slope
+    'SETTLE_MINUTES': 10,        # Water needs this long to reach the sensor after a pump change
+    'LEVEL_MINUTES': 2,          # Moisture before/after a run is the mean over this long (damps sensor noise)
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'INSIGHTS', {})}
+
+
+class EpochSeconds(Func):
+    """
+    Timestamp as float seconds since the Unix epoch, computed by the database.
+    Rows then come back as plain floats instead of going through Django's
+    per-row datetime conversion, which would dominate a large window.
+    """
+    output_field = FloatField()
+
+    def get_db_converters(self, connection):
+        # Both backends already return a float; skip the per-row float() call.
+        return []
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # Django stores UTC text; julianday() of the Unix epoch is 2440587.5.
+        return self.as_sql(
+            compiler, connection,
+            template="((julianday(%(expressions)s) - 2440587.5) * 86400.0)", **extra_context,
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template="EXTRACT(EPOCH FROM %(expressions)s)::double precision", **extra_context,
+        )
+
+
+def _load(model, field, device_pks, start, end, **filters):
+    """
+    (device pk, hours since start, field) rows of `model` in [start, end],
+    as three arrays sorted by device, then time. One values_list query.
+    """
+    rows = list(
+        model.objects.filter(device_id__in=device_pks, timestamp__gte=start, timestamp__lte=end, **filters)
+        .order_by()
+        .annotate(epoch=EpochSeconds('timestamp'))
+        .values_list('device_id', 'epoch', field)
+    )
+    if not rows:
+        return np.empty(0, np.int64), np.empty(0), np.empty(0)
+    pks, seconds, values = zip(*rows)
+    pks = np.array(pks, dtype=np.int64)
+    hours = (np.array(seconds, dtype=np.float64) - start.timestamp()) / 3600
+    order = np.lexsort((hours, pks))
+    return pks[order], hours[order], np.array(values)[order]
+
+
+def load_readings(device_pks, start, end):
+    """
+    Readings as (device pk, hours since start, moisture) arrays.
+    """
+    pks, hours, values = _load(SensorReading, 'moisture_level', device_pks, start, end)
+    return pks, hours, values.astype(np.float64)
+
+
+def load_commands(device_pks, start, end):
+    """
+    Pump commands as (device pk, hours since start, is ON) arrays. Only
+    commands that reached the device count; superseded and expired ones never
+    switched the pump.
+    """
+    pks, hours, actions = _load(
+        PumpCommand, 'action', device_pks, start, end,
+        status__in=[PumpCommand.DELIVERED, PumpCommand.ACKED],
+    )
+    return pks, hours, actions == 'ON'
+
+
+def rolling_slope(keys, hours, values, window_start, min_points):
+    """
+    Least-squares slope (value units per hour) of every sample over the samples
+    of the same series whose key lies in [window_start, own key]. `keys` is
+    sorted and keeps series apart (see _Layout); the sums come from prefix sums,
+    so the cost is O(n) whatever the window length. NaN with fewer than
+    `min_points` samples or no spread in time.
+    """
+    lo = np.searchsorted(keys, window_start, side='left')
+    hi = np.arange(1, len(keys) + 1)
+    count = (hi - lo).astype(np.float64)
+    st, sv = _window_sum(hours, lo, hi), _window_sum(values, lo, hi)
+    stt, stv = _window_sum(hours * hours, lo, hi), _window_sum(hours * values, lo, hi)
+    denominator = count * stt - st * st
+    with np.errstate(invalid='ignore', divide='ignore'):
+        slope = (count * stv - st * sv) / denominator
+    slope[(count < min_points) | (denominator <= 1e-12)] = np.nan
+    # Prefix-sum cancellation leaves rounding noise on a flat series; a rate
+    # of 1e-14 %/h would otherwise forecast the threshold centuries out.
+    slope[np.abs(slope) < 1e-9] = 0.0
+    return slope
+
+
+def window_mean(keys, values, start, end):
+    """
+    Mean of `values` whose key lies in [start, end], for each pair of bounds.
+    NaN where the window holds no sample.
+    """
+    lo = np.searchsorted(keys, start, side='left')
+    hi = np.searchsorted(keys, end, side='right')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return _window_sum(values, lo, hi) / (hi - lo)
+
+
+def _window_sum(values, lo, hi):
+    prefix = np.concatenate(([0.0], np.cumsum(values)))
+    return prefix[hi] - prefix[lo]
+
+
+def group_median(groups, values, size):
+    """
+    Median of `values` per group index (NaNs skipped), vectorized through one
+    lexsort. Groups without values get NaN.
+    """
+    keep = ~np.isnan(values)
+    groups, values = groups[keep], values[keep]
+    values = values[np.lexsort((values, groups))]
+    groups = np.sort(groups)
+    counts = np.bincount(groups, minlength=size)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    median = np.full(size, np.nan)
+    has = counts > 0
+    low = values[starts[has] + (counts[has] - 1) // 2]
+    high = values[starts[has] + counts[has] // 2]
+    median[has] = (low + high) / 2
+    return median
+
+
+class _Layout:
+    """
+    Maps device pks to dense group indexes and series onto one sorted key axis:
+    key = group * span + hours. `span` exceeds every offset used in a search,
+    so a lookup never lands in a neighbouring device's samples.
+    """
+
+    def __init__(self, device_pks, span):
+        self.pks = np.array(sorted(device_pks), dtype=np.int64)
+        self.span = span
+
+    def groups(self, pks):
+        return np.searchsorted(self.pks, pks)
+
+    def keys(self, groups, hours):
+        return groups * self.span + hours
+
+
+def compute(devices, start, end, config=None):
+    """
+    Moisture insights for each device over [start, end] in three queries
+    (readings, commands, auto-mode thresholds) and a fixed number of NumPy
+    passes over the whole fleet:
+
+    - drying_rate: moisture lost per hour, a trailing SLOPE_WINDOW_MINUTES fit
+      at the latest reading, only over readings since the last pump change had
+      settled; typical_drying_rate is the median of that rate over the range
+    - irrigation: every ON -> OFF run, moisture gain from the level at ON to
+      the level SETTLE_MINUTES after OFF (levels are LEVEL_MINUTES means)
+    - hours_to_threshold / predicted_dry_at: when the current drying rate
+      reaches the device's dry threshold
+
+    Returns {device pk: insights dict}.
+    """
+    config = config or get_config()
+    devices = list(devices)
+    pks = [device.pk for device in devices]
+    if not pks:
+        return {}
+    slope_window = config['SLOPE_WINDOW_MINUTES'] / 60
+    settle = config['SETTLE_MINUTES'] / 60
+    level = config['LEVEL_MINUTES'] / 60
+    # Searches reach at most slope_window / level before the range and settle after it.
+    layout = _Layout(pks, (end - start).total_seconds() / 3600 + slope_window + level + settle + 1)
+    size = len(layout.pks)
+
+    r_pk, r_hours, moisture = load_readings(pks, start, end)
+    c_pk, c_hours, c_on = load_commands(pks, start, end)
+    r_group, c_group = layout.groups(r_pk), layout.groups(c_pk)
+    r_keys, c_keys = layout.keys(r_group, r_hours), layout.keys(c_group, c_hours)
+
+    # Pump state at each reading: the last command of the same device at or before it.
+    last_cmd = np.searchsorted(c_keys, r_keys, side='right') - 1
+    has_cmd = last_cmd >= 0
+    has_cmd[has_cmd] = c_group[last_cmd[has_cmd]] == r_group[has_cmd]
+    pump_on = np.zeros(len(r_keys), bool)
+    pump_on[has_cmd] = c_on[last_cmd[has_cmd]]
+    settled_from = np.full(len(r_keys), -np.inf)
+    settled_from[has_cmd] = c_hours[last_cmd[has_cmd]] + settle
+
+    # Drying rate: fit only readings after the last pump change has settled.
+    window_start = np.maximum(r_hours - slope_window, settled_from)
+    slope = rolling_slope(r_keys, r_hours, moisture, layout.keys(r_group, window_start), config['MIN_SLOPE_POINTS'])
+    slope[pump_on | (r_hours < settled_from)] = np.nan
+
+    counts = np.bincount(r_group, minlength=size)
+    has_readings = counts > 0
+    last = np.cumsum(counts) - 1
+    last_moisture = np.full(size, np.nan)
+    last_hours = np.full(size, np.nan)
+    current_slope = np.full(size, np.nan)
+    last_moisture[has_readings] = moisture[last[has_readings]]
+    last_hours[has_readings] = r_hours[last[has_readings]]
+    current_slope[has_readings] = slope[last[has_readings]]
+    typical_slope = group_median(r_group, slope, size)
+
+    # Irrigation runs: an ON immediately followed by an OFF of the same device.
+    run = c_on[:-1] & ~c_on[1:] & (c_group[:-1] == c_group[1:])
+    e_group, e_start, e_stop = c_group[:-1][run], c_hours[:-1][run], c_hours[1:][run]
+    e_settled = e_stop + settle
+    before = window_mean(r_keys, moisture, layout.keys(e_group, e_start - level), layout.keys(e_group, e_start))
+    after = window_mean(r_keys, moisture, layout.keys(e_group, e_settled - level), layout.keys(e_group, e_settled))
+    gain = after - before
+    # Runs whose settle time has not been reached yet are left out.
+    valid = ~np.isnan(gain) & (e_settled <= np.nan_to_num(last_hours[e_group], nan=-np.inf))
+    minutes = (e_stop - e_start) * 60
+
+    v_group = e_group[valid]
+    events = np.bincount(v_group, minlength=size)
+    gain_total = np.bincount(v_group, weights=gain[valid], minlength=size)
+    minutes_total = np.bincount(v_group, weights=minutes[valid], minlength=size)
+    last_gain = np.full(size, np.nan)
+    last_gain[v_group] = gain[valid]  # Later runs overwrite earlier ones
+
+    # Time to the dry threshold at the current drying rate.
+    thresholds = dict(AutoModeRule.objects.filter(device_id__in=pks).values_list('device_id', 'dry_threshold'))
+    default_threshold = rules.get_config()['DRY_THRESHOLD']
+    threshold = np.array([thresholds.get(pk, default_threshold) for pk in layout.pks.tolist()], dtype=np.float64)
+    rate = -current_slope
+    with np.errstate(invalid='ignore', divide='ignore'):
+        to_threshold = np.where(last_moisture <= threshold, 0.0, (last_moisture - threshold) / rate)
+    to_threshold[(last_moisture > threshold) & ~(rate > 0)] = np.nan
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_gain = gain_total / events
+        gain_per_minute = gain_total / minutes_total
+
+    columns = {
+        'readings': counts,
+        'moisture': last_moisture,
+        'drying_rate': rate,
+        'typical_drying_rate': -typical_slope,
+        'events': events,
+        'avg_gain': avg_gain,
+        'gain_per_minute': gain_per_minute,
+        'last_gain': last_gain,
+        'dry_threshold': threshold,
+        'hours_to_threshold': to_threshold,
+    }
+    columns = {name: _to_list(values) for name, values in columns.items()}
+    last_at = [None if hours != hours else start + timedelta(hours=hours) for hours in last_hours.tolist()]
+
+    insights = {}
+    for i, pk in enumerate(layout.pks.tolist()):
+        row = {name: values[i] for name, values in columns.items()}
+        hours = row['hours_to_threshold']
+        insights[pk] = {
+            'readings': row['readings'],
+            'moisture': row['moisture'],
+            'last_reading_at': last_at[i],
+            'drying_rate': row['drying_rate'],
+            'typical_drying_rate': row['typical_drying_rate'],
+            'irrigation': {
+                'events': row['events'],
+                'avg_gain': row['avg_gain'],
+                'gain_per_minute': row['gain_per_minute'],
+                'last_gain': row['last_gain'],
+            },
+            'dry_threshold': row['dry_threshold'],
+            'hours_to_threshold': hours,
+            'predicted_dry_at': last_at[i] + timedelta(hours=hours) if hours is not None and last_at[i] else None,
+        }
+    return insights
+
+
+def _to_list(values):
+    """
+    Array -> list of Python numbers with NaN as None, floats rounded for JSON.
+    """
+    if values.dtype.kind in 'iu':
+        return values.tolist()
+    rounded = np.round(values, 4)
+    return [None if value != value else value for value in rounded.tolist()]
+
@@ -0,0 +1,262 @@
+import logging
+import math
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from .models import SensorHealth
+from .metrics import registry
+from . import pubsub
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SUPPRESS_AUTO_MODE': True,  # Skip auto mode when the newest sample is a spike or jump
+    'SUPPRESS_ON_STUCK': False,  # Also treat a stuck sample as suspect (skips auto mode too)
+    'MIN_SAMPLES': 20,           # Warm-up before spikes are flagged
+    'EWMA_ALPHA': 0.1,           # Weight of a new sample in the moving baseline
+    'SPIKE_Z': 6.0,              # Spike: further than this many std devs from the baseline...
+    'MIN_STD': 0.5,              # ...with the std dev floored here (a quiet sensor is not a noisy one)
+    'STUCK_SECONDS': 12 * 3600,  # Stuck: the value has not changed at all for this long...
+    'STUCK_SAMPLES': 40,         # ...over at least this many samples. Readings are whole
+                                 # percents, so a slowly drying field repeats values for hours.
+    'STUCK_EPSILON': 1e-6,
+    'MAX_RATE': 5.0,             # Jump: change faster than this many % per minute...
+    'MIN_JUMP': 10.0,            # ...and larger than this many % (sample spacing jitter)
+    'PERSIST_INTERVAL': 30,      # Seconds between state writes (0 = never persist)
+    'BATCH_SIZE': 500,           # Rows per persist query
+}
+
+SPIKE = 'spike'
+JUMP = 'jump'
+STUCK = 'stuck'
+
+_FIELDS = [
+    'samples', 'mean', 'm2', 'ewma', 'ewm_var', 'last_value', 'last_timestamp', 'stuck_run',
+    'stuck_since', 'anomalies', 'last_anomaly', 'last_anomaly_at', 'suspect',
+]
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'ANOMALY_DETECTION', {})}
+
+
+class SensorState:
+    """
+    Constant-size detector state of one device. Times are epoch seconds.
+    """
+    __slots__ = (
+        'samples', 'mean', 'm2', 'ewma', 'ewm_var', 'last_value', 'last_time', 'stuck_run',
+        'stuck_since', 'anomalies', 'last_anomaly', 'last_anomaly_time', 'suspect',
+    )
+
+    def __init__(self):
+        self.samples = 0
+        self.mean = self.m2 = self.ewma = self.ewm_var = 0.0
+        self.last_value = self.last_time = None
+        self.stuck_run = 0
+        self.stuck_since = None
+        self.anomalies = 0
+        self.last_anomaly = ''
+        self.last_anomaly_time = None
+        self.suspect = False
+
+    @classmethod
+    def from_row(cls, row):
+        state = cls()
+        for field in ('samples', 'mean', 'm2', 'ewma', 'ewm_var', 'last_value', 'stuck_run',
+                      'anomalies', 'last_anomaly', 'suspect'):
+            setattr(state, field, getattr(row, field))
+        state.last_time = row.last_timestamp.timestamp() if row.last_timestamp else None
+        state.stuck_since = row.stuck_since.timestamp() if row.stuck_since else None
+        state.last_anomaly_time = row.last_anomaly_at.timestamp() if row.last_anomaly_at else None
+        return state
+
+    def to_row(self, device_pk):
+        return SensorHealth(
+            device_id=device_pk,
+            samples=self.samples,
+            mean=self.mean,
+            m2=self.m2,
+            ewma=self.ewma,
+            ewm_var=self.ewm_var,
+            last_value=self.last_value,
+            last_timestamp=_datetime(self.last_time),
+            stuck_run=self.stuck_run,
+            stuck_since=_datetime(self.stuck_since),
+            anomalies=self.anomalies,
+            last_anomaly=self.last_anomaly,
+            last_anomaly_at=_datetime(self.last_anomaly_time),
+            suspect=self.suspect,
+        )
+
+
+def _datetime(seconds):
+    return None if seconds is None else datetime.fromtimestamp(seconds, dt_timezone.utc)
+
+
+class AnomalyDetector:
+    """
+    Online detector for broken moisture probes, O(1) time and memory per
+    sample and device. Flags per sample:
+
+    - spike: far from the EWMA baseline, measured in EW standard deviations
+      (seeded from the Welford variance during warm-up)
+    - jump: a change no soil can make, faster than MAX_RATE %/min and larger than MIN_JUMP
+    - stuck: the exact same value for STUCK_SECONDS and at least STUCK_SAMPLES
+      samples (flat-lined probe). A stuck probe still reads a plausible
+      value, so unless SUPPRESS_ON_STUCK is set it does not make a sample suspect.
+
+    Flagged values are clipped before they update the baseline, so a single
+    glitch does not drag it along while a real level shift is still learned.
+    State lives in memory and is written to SensorHealth every PERSIST_INTERVAL
+    seconds; each process keeps its own copy.
+    """
+
+    def __init__(self, config=None):
+        self.config = config = config or get_config()
+        self.min_samples = config['MIN_SAMPLES']
+        self.alpha = config['EWMA_ALPHA']
+        self.spike_z = config['SPIKE_Z']
+        self.min_std = config['MIN_STD']
+        self.stuck_seconds = config['STUCK_SECONDS']
+        self.stuck_samples = config['STUCK_SAMPLES']
+        self.stuck_epsilon = config['STUCK_EPSILON']
+        self.max_rate = config['MAX_RATE'] / 60  # per second
+        self.min_jump = config['MIN_JUMP']
+        self.suspect_kinds = {SPIKE, JUMP, STUCK} if config['SUPPRESS_ON_STUCK'] else {SPIKE, JUMP}
+        self._states = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    def state_for(self, device_pk):
+        state = self._states.get(device_pk)
+        if state is None:
+            row = SensorHealth.objects.filter(device_id=device_pk).first()
+            state = SensorState.from_row(row) if row else SensorState()
+            with self._lock:
+                state = self._states.setdefault(device_pk, state)
+        return state
+
+    def observe(self, state, value, when):
+        """
+        Feed one sample (value, epoch seconds) into `state`. Returns the tuple
+        of anomaly kinds, empty for a normal sample.
+        """
+        kinds = ()
+        last = state.last_value
+        if last is not None:
+            change = abs(value - last)
+            if change <= self.stuck_epsilon:
+                state.stuck_run += 1
+                if state.stuck_since is None:
+                    state.stuck_since = state.last_time
+                if state.stuck_run + 1 >= self.stuck_samples and when - state.stuck_since >= self.stuck_seconds:
+                    kinds += (STUCK,)
+            else:
+                state.stuck_run = 0
+                state.stuck_since = when
+            elapsed = abs(when - state.last_time)
+            if change > self.min_jump and change > self.max_rate * elapsed:
+                kinds += (JUMP,)
+        else:
+            state.stuck_since = when
+
+        # Baseline: EWMA with an exponentially weighted variance.
+        if state.samples == 0:
+            state.ewma = value
+        deviation = value - state.ewma
+        limit = self.spike_z * max(math.sqrt(state.ewm_var), self.min_std)
+        if state.samples >= self.min_samples and abs(deviation) > limit:
+            kinds += (SPIKE,)
+            deviation = math.copysign(limit, deviation)
+        step = self.alpha * deviation
+        state.ewma += step
+        state.ewm_var = (1 - self.alpha) * (state.ewm_var + deviation * step)
+
+        if not kinds:
+            # Welford over accepted samples; during warm-up it seeds the EW variance.
+            state.samples += 1
+            delta = value - state.mean
+            state.mean += delta / state.samples
+            state.m2 += delta * (value - state.mean)
+            if state.samples < self.min_samples and state.samples > 1:
+                state.ewm_var = state.m2 / (state.samples - 1)
+        else:
+            state.anomalies += 1
+            state.last_anomaly = ','.join(kinds)
+            state.last_anomaly_time = when
+
+        state.last_value = value
+        state.last_time = when
+        state.suspect = any(kind in self.suspect_kinds for kind in kinds)
+        return kinds
+
+    def check(self, device_pk, readings):
+        """
+        Run a batch of SensorReadings of one device through the detector in
+        time order. Returns [(reading, kinds)] for the flagged ones and whether
+        the newest reading is suspect (a spike or jump, or stuck with SUPPRESS_ON_STUCK).
+        """
+        state = self.state_for(device_pk)
+        flagged = []
+        ordered = sorted(readings, key=lambda reading: reading.timestamp)
+        with self._lock:
+            was_suspect = state.suspect
+            for reading in ordered:
+                kinds = self.observe(state, reading.moisture_level, reading.timestamp.timestamp())
+                if kinds:
+                    flagged.append((reading, kinds))
+            self._dirty.add(device_pk)
+            suspect = state.suspect
+
+        for reading, kinds in flagged:
+            for kind in kinds:
+                registry.inc('dashboard_sensor_anomalies_total', (('kind', kind),))
+        if flagged:
+            pubsub.publish(device_pk, 'anomaly', [
+                {'moisture_level': reading.moisture_level, 'timestamp': reading.timestamp.isoformat(), 'kinds': list(kinds)}
+                for reading, kinds in flagged
+            ])
+        if suspect and not was_suspect:
+            reading, kinds = flagged[-1]  # The newest reading, since it is suspect
+            logger.warning("Device %s sensor suspect (%s) at %s%%", device_pk, ', '.join(kinds), reading.moisture_level)
+        return flagged, suspect
+
+    def flush(self):
+        """
+        Persist the state of devices seen since the last flush (one upsert per batch).
+        Returns how many devices were written.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            rows = [self._states[pk].to_row(pk) for pk in dirty]
+        for i in range(0, len(rows), self.config['BATCH_SIZE']):
+            SensorHealth.objects.bulk_create(
+                rows[i:i + self.config['BATCH_SIZE']],
+                update_conflicts=True,
+                unique_fields=['device'],
+                update_fields=_FIELDS + ['updated_at'],
+            )
+        return len(rows)
+
+    def forget(self, device_pk):
+        with self._lock:
+            self._states.pop(device_pk, None)
+            self._dirty.discard(device_pk)
+
+
+detector = AnomalyDetector()
+
+registry.describe('dashboard_sensor_anomalies_total', 'counter', 'Moisture samples flagged by the anomaly detector, by kind.')
+registry.describe('dashboard_auto_mode_suppressed_total', 'counter', 'Auto mode evaluations skipped because the sample was suspect.')
+registry.gauge(
+    'dashboard_anomaly_tracked_devices', 'Devices with anomaly detector state in this process.',
+    lambda: len(detector._states),
+)
+
+
+def run_scheduled():
+    detector.flush()
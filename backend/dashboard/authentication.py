@@ -1,15 +1,233 @@
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
 from rest_framework import authentication, exceptions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
 from .models import Device
+from . import liveness
+
+
+class TTLCache:
+    """
+    Bounded in-process LRU with a TTL per entry. Values are handed out as
+    shallow copies: views may hang related objects off an instance, so a
+    cached instance is never shared between requests.
+    """
+
+    def __init__(self, max_size=1024, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Returns a copy of the cached value, or None on a cache miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return self.copy_value(value)
+
+    def copy_value(self, value):
+        return copy.copy(value)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, key=None, where=None):
+        """
+        Drop `key`, and every entry whose value matches the `where` predicate.
+        """
+        with self._lock:
+            if key is not None:
+                self._entries.pop(key, None)
+            if where is not None:
+                for stale in [k for k, (value, _) in self._entries.items() if where(value)]:
+                    del self._entries[stale]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class APIKeyCache(TTLCache):
+    """
+    api_key -> Device. Unknown keys are cached as misses (shorter TTL) so a
+    flood of bad keys does not turn into a flood of queries. Misses live in
+    their own, smaller LRU: guessing random keys only evicts other misses,
+    never a real device's entry. Entries are dropped through the Device
+    signals in signals.py; the TTL bounds staleness across workers.
+    """
+    MISSING = object()
+
+    def __init__(self, max_size=1024, ttl=300, negative_ttl=30, negative_max_size=256):
+        super().__init__(max_size, ttl)
+        self.negative_ttl = negative_ttl
+        self._misses = TTLCache(negative_max_size, negative_ttl)
+
+    def get(self, api_key):
+        """
+        Returns a Device, MISSING for a cached invalid key, or None on a cache miss.
+        """
+        device = super().get(api_key)
+        if device is None and self._misses.get(api_key) is not None:
+            return self.MISSING
+        return device
+
+    def set(self, api_key, device):
+        if device is self.MISSING:
+            self._misses.set(api_key, True)
+        else:
+            self._misses.discard(api_key)
+            super().set(api_key, device)
+
+    def invalidate(self, api_key=None, device_pk=None):
+        where = None
+        if device_pk is not None:
+            where = lambda device: device.pk == device_pk  # noqa: E731
+        self.discard(api_key, where)
+        if api_key is not None:
+            self._misses.discard(api_key)
+
+    def clear(self):
+        super().clear()
+        self._misses.clear()
+
+
+Principal = namedtuple('Principal', ['user', 'device'])
+
+
+class PrincipalCache(TTLCache):
+    """
+    user id -> Principal(User, active Device or None) for JWT requests, so a
+    dashboard poll resolves both without a query. Dropped through the User
+    and Device signals in signals.py; the short TTL bounds staleness across
+    workers.
+    """
+
+    def copy_value(self, principal):
+        return Principal(copy.copy(principal.user), copy.copy(principal.device))
+
+    def invalidate(self, user_pk=None, device_pk=None):
+        where = None
+        if device_pk is not None:
+            where = lambda principal: principal.device is not None and principal.device.pk == device_pk  # noqa: E731
+        self.discard(user_pk, where)
+
+
+_cache_settings = getattr(settings, 'DEVICE_API_KEY_CACHE', {})
+api_key_cache = APIKeyCache(
+    max_size=_cache_settings.get('MAX_SIZE', 1024),
+    ttl=_cache_settings.get('TTL', 300),
+    negative_ttl=_cache_settings.get('NEGATIVE_TTL', 30),
+    negative_max_size=_cache_settings.get('NEGATIVE_MAX_SIZE', 256),
+)
+
+_principal_settings = getattr(settings, 'JWT_PRINCIPAL_CACHE', {})
+principal_cache = PrincipalCache(
+    max_size=_principal_settings.get('MAX_SIZE', 1024),
+    ttl=_principal_settings.get('TTL', 60),
+)
+
+
+def resolve_principal(user_pk):
+    """
+    Principal for a user pk, or None if the user does not exist. On a cache
+    miss the active device and its owner come back in one joined query; only
+    users without an active device cost a second one.
+    """
+    principal = principal_cache.get(user_pk)
+    if principal is not None:
+        return principal
+
+    device = Device.objects.select_related('user').filter(user_id=user_pk, is_active=True).order_by('pk').first()
+    if device is not None:
+        principal = Principal(device.user, device)
+    else:
+        user = User.objects.filter(pk=user_pk).first()
+        if user is None:
+            return None
+        principal = Principal(user, None)
+    principal_cache.set(user_pk, principal)
+    return principal_cache.copy_value(principal)
+
+
+def active_device_of(user):
+    """
+    The user's active device, or None. Free for users authenticated by
+    CachedJWTAuthentication, which resolves it together with the user;
+    otherwise looked up through the principal cache once per request.
+    """
+    if not hasattr(user, '_active_device'):
+        principal = resolve_principal(user.pk)
+        user._active_device = principal.device if principal else None
+    return user._active_device
+
 
 class DeviceAPIKeyAuthentication(authentication.BaseAuthentication):
     def authenticate(self, request):
         api_key = request.headers.get('X-API-KEY')
         if not api_key:
             return None  # No header, fallback to default auth
-        
-        try:
-            device = Device.objects.get(api_key=api_key)
-        except Device.DoesNotExist:
+
+        device = api_key_cache.get(api_key)
+        if device is None:
+            device = Device.objects.filter(api_key=api_key, is_active=True).first()
+            api_key_cache.set(api_key, device or APIKeyCache.MISSING)
+            if device is not None:
+                device = copy.copy(device)
+
+        if device is APIKeyCache.MISSING or device is None:
             raise exceptions.AuthenticationFailed('Invalid API Key')
 
+        liveness.tracker.touch(device)
         return (device, None)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    simplejwt authentication that takes the token's user, and that user's
+    active device, from principal_cache instead of querying on every request.
+    The device travels on the request's own copy of the user (see
+    active_device_of).
+    """
+
+    def get_user(self, validated_token):
+        try:
+            # Tokens carry the id as a string; cache keys and signals use the pk.
+            user_pk = User._meta.pk.to_python(validated_token[jwt_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError) as e:
+            raise InvalidToken('Token contained no recognizable user identification') from e
+
+        principal = resolve_principal(user_pk)
+        if principal is None:
+            raise exceptions.AuthenticationFailed('User not found', code='user_not_found')
+        user = principal.user
+        if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise exceptions.AuthenticationFailed('User is inactive', code='user_inactive')
+        if jwt_settings.CHECK_REVOKE_TOKEN and (
+            validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+        ):
+            raise exceptions.AuthenticationFailed("The user's password has been changed.", code='password_changed')
+
+        user._active_device = principal.device
+        return user
@@ -0,0 +1,111 @@
+import threading
+
+from django.db import transaction
+from .models import IngestCursor
+
+
+# Bits in the window bitmap. 63 keeps it inside a signed BIGINT column.
+WINDOW = 63
+FULL_MASK = (1 << WINDOW) - 1
+# The firmware restarts its counter at 0 on every boot, so seq 0 always opens a
+# fresh window, however close it is to the newest one. A sequence number this
+# far behind the newest one is also taken as a restart rather than a replay.
+RESTART_GAP = 10_000
+
+
+class SequenceWindow:
+    """
+    Sliding window over the last WINDOW sequence numbers of one device.
+    """
+    __slots__ = ('high', 'mask')
+
+    def __init__(self, high=-1, mask=0):
+        self.high = high
+        self.mask = mask
+
+    def seen(self, seq):
+        if self.high < 0 or seq > self.high or self._is_restart(seq):
+            return False
+        distance = self.high - seq
+        if distance >= WINDOW:
+            return True
+        return bool(self.mask & (1 << distance))
+
+    def mark(self, seq):
+        """
+        Record seq as accepted. Returns False if it was a duplicate.
+        """
+        if self.seen(seq):
+            return False
+        if self.high < 0 or self._is_restart(seq):
+            # First sequence number, or the device restarted its counter.
+            self.high, self.mask = seq, 1
+        elif seq > self.high:
+            shift = seq - self.high
+            self.mask = ((self.mask << shift) | 1) & FULL_MASK if shift < WINDOW else 1
+            self.high = seq
+        else:
+            self.mask |= 1 << (self.high - seq)
+        return True
+
+    def _is_restart(self, seq):
+        return seq == 0 or self.high - seq > RESTART_GAP
+
+    def copy(self):
+        return SequenceWindow(self.high, self.mask)
+
+
+class DedupRegistry:
+    """
+    In-memory windows per device, backed by IngestCursor rows.
+    The memory copy is a fast path that turns known replays into no-ops without
+    touching the DB; the DB row (locked inside the ingest transaction) is the
+    authority, so several worker processes still agree.
+    """
+
+    def __init__(self):
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def is_known_duplicate(self, device_id, seq):
+        with self._lock:
+            window = self._windows.get(device_id)
+            return window is not None and window.seen(seq)
+
+    def claim(self, device, samples):
+        """
+        Keep only samples whose 'seq' has not been accepted before; samples
+        without a seq are always kept. Must run inside the ingest transaction.
+        """
+        sequenced = [sample for sample in samples if sample.get('seq') is not None]
+        if not sequenced:
+            return samples
+
+        cursor, _ = IngestCursor.objects.select_for_update().get_or_create(device=device)
+        window = SequenceWindow(cursor.high_seq, cursor.window)
+        accepted = [
+            sample for sample in samples
+            if sample.get('seq') is None or window.mark(sample['seq'])
+        ]
+
+        if (window.high, window.mask) != (cursor.high_seq, cursor.window):
+            cursor.high_seq, cursor.window = window.high, window.mask
+            cursor.save(update_fields=['high_seq', 'window', 'updated_at'])
+
+        # Only remember what actually committed, or a rolled-back retry would look like a duplicate.
+        transaction.on_commit(lambda: self._remember(device.pk, window.copy()))
+        return accepted
+
+    def _remember(self, device_id, window):
+        with self._lock:
+            self._windows[device_id] = window
+
+    def forget(self, device_id=None):
+        with self._lock:
+            if device_id is None:
+                self._windows.clear()
+            else:
+                self._windows.pop(device_id, None)
+
+
+registry = DedupRegistry()
@@ -0,0 +1,107 @@
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .models import SensorReading, PumpCommand
+
+
+# kind -> (model, exported fields after device_id)
+EXPORTS = {
+    'readings': (SensorReading, ['timestamp', 'moisture_level']),
+    'commands': (PumpCommand, ['timestamp', 'action', 'triggered_by', 'status']),
+}
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Rows encoded per yielded chunk; keeps per-chunk overhead low without buffering much.
+ROWS_PER_CHUNK = 500
+
+
+def export_rows(kind, devices, start=None, end=None):
+    """
+    (device_id, *fields) tuples in device/time order, read with a chunked
+    iterator over values_list so no model instances are built and memory
+    stays flat however many rows match.
+    """
+    model, fields = EXPORTS[kind]
+    names = {device.pk: device.device_id for device in devices}
+    queryset = model.objects.filter(device_id__in=names)
+    if start is not None:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end is not None:
+        queryset = queryset.filter(timestamp__lte=end)
+    queryset = queryset.order_by('device_id', 'timestamp').values_list('device_id', *fields)
+
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    for device_pk, *values in queryset.iterator(chunk_size=chunk_size):
+        yield (names[device_pk], *values)
+
+
+class _Line:
+    """
+    File-like object for csv.writer that hands back the formatted line.
+    """
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(kind, rows):
+    _, fields = EXPORTS[kind]
+    writer = csv.writer(_Line())
+    chunk = [writer.writerow(['device_id', *fields])]
+    for device_id, timestamp, *values in rows:
+        chunk.append(writer.writerow([device_id, timestamp.isoformat(), *values]))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ''.join(chunk).encode()
+            chunk = []
+    if chunk:
+        yield ''.join(chunk).encode()
+
+
+def encode_ndjson(kind, rows):
+    _, fields = EXPORTS[kind]
+    keys = ['device_id', *fields]
+    chunk = []
+    for device_id, timestamp, *values in rows:
+        chunk.append(json.dumps(dict(zip(keys, (device_id, timestamp.isoformat(), *values)))))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield ('\n'.join(chunk) + '\n').encode()
+            chunk = []
+    if chunk:
+        yield ('\n'.join(chunk) + '\n').encode()
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Compress a byte stream on the fly (gzip container, one compressor per response).
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def iterate_in_thread(iterator):
+    """
+    Async view of a blocking iterator, one chunk per hop to the sync thread.
+    Under ASGI Django would otherwise read a sync iterator into a list first.
+    """
+    done = object()
+    get_next = sync_to_async(next, thread_sensitive=True)
+    while True:
+        chunk = await get_next(iterator, done)
+        if chunk is done:
+            return
+        yield chunk
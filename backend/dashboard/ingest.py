@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.utils import timezone
+from .models import SensorReading, CurrentStatus
+from .serializer import SensorReadingSerializer
+from .rules import get_engine
+from .metrics import registry
+from . import status_cache, rollups, pubsub, dedup, anomaly
+
+
+def record_readings(device, samples):
+    """
+    Store a batch of samples for one device.
+    `samples` is a list of dicts with 'moisture' and optional 'timestamp' and 'seq'.
+    Samples whose seq was already accepted are dropped (retries after a timeout).
+    All rows go in with a single bulk_create; CurrentStatus and auto mode are
+    evaluated once, against the newest sample of the batch. Auto mode is
+    skipped when the anomaly detector flags that sample (if configured).
+    Returns the created SensorReading objects in input order.
+    """
+    readings, current_status = store_readings(device, samples)
+    if readings:
+        after_store(device, readings, current_status)
+    return readings
+
+
+def store_readings(device, samples):
+    """
+    The transactional half of record_readings: deduplication, the insert,
+    rollups and CurrentStatus. Returns (readings, current_status). Touches
+    nothing outside the DB, so a call that raised can simply be retried.
+    """
+    # Replays this process already knows about never reach the DB.
+    samples = [
+        sample for sample in samples
+        if sample.get('seq') is None or not dedup.registry.is_known_duplicate(device.pk, sample['seq'])
+    ]
+    if not samples:
+        return [], None
+
+    now = timezone.now()
+    with transaction.atomic():
+        samples = dedup.registry.claim(device, samples)
+        if not samples:
+            return [], None
+
+        readings = SensorReading.objects.bulk_create([
+            SensorReading(
+                device=device,
+                moisture_level=sample['moisture'],
+                timestamp=sample.get('timestamp') or now,
+            )
+            for sample in samples
+        ])
+        rollups.apply_readings(device, readings)
+        latest = sorted(readings, key=lambda reading: reading.timestamp, reverse=True)[:10]
+        pubsub.publish(device.pk, 'readings', SensorReadingSerializer(latest, many=True).data)
+        newest = _newest(readings)
+
+        current_status, _ = CurrentStatus.objects.get_or_create(device=device)
+        current_status.current_moisture = newest.moisture_level
+        current_status.last_updated = now
+        current_status.save()
+
+    return readings, current_status
+
+
+def after_store(device, readings, current_status):
+    """
+    The in-process half of record_readings, run once per committed batch:
+    status cache, anomaly detection and auto mode.
+    """
+    newest = _newest(readings)
+    status_cache.set_snapshot(device.pk, current_status, newest.timestamp)
+
+    suspect = False
+    if anomaly.detector.config['ENABLED']:
+        _, suspect = anomaly.detector.check(device.pk, readings)
+    if current_status.auto_mode:
+        if suspect and anomaly.detector.config['SUPPRESS_AUTO_MODE']:
+            registry.inc('dashboard_auto_mode_suppressed_total', ())
+        else:
+            # Decided off the request thread by the rules engine.
+            get_engine().submit(device.pk, newest.moisture_level, newest.timestamp)
+
+
+def _newest(readings):
+    # Later samples win timestamp ties (e.g. several buffered requests stamped together).
+    return max(reversed(readings), key=lambda reading: reading.timestamp)
@@ -0,0 +1,312 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Device
+from .metrics import registry
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'ENABLED': False,
+    'MAX_ITEMS': 10000,      # Samples held before new requests get 429
+    'FLUSH_SIZE': 500,       # Flush as soon as this many samples are waiting...
+    'FLUSH_INTERVAL': 1.0,   # ...or after this many seconds
+    'SPOOL_PATH': None,      # Append-only file (one per process) that survives a crash between ack and flush
+    'SPOOL_FSYNC': False,    # fsync every append (survives power loss, costs an fsync per request)
+    'RETRY_AFTER': 1,        # Seconds suggested to clients in the 429 Retry-After header
+    'MAX_ATTEMPTS': 5,       # Failed flushes before a device's buffered samples are dropped
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'INGEST_WRITE_BEHIND', {})}
+
+
+class BufferFull(Exception):
+    pass
+
+
+class WriteBehindBuffer:
+    """
+    Bounded in-process buffer of accepted readings. Requests return once their
+    samples are buffered (and spooled, if configured); a background flusher
+    commits what is waiting, one transaction per device, through
+    store_readings, so the commit cost is paid per batch instead of per reading.
+    A device whose samples keep failing is retried MAX_ATTEMPTS times and then
+    dropped, so one bad device cannot stall everyone else's ingest.
+
+    With SPOOL_PATH set, each process appends to its own SPOOL_PATH.<pid>, held
+    under an exclusive flock (POSIX) for the life of the process. A spool whose
+    lock is free belongs to a process that is gone; the next process to start
+    adopts and replays it.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self._pending = []  # [(device, samples)]
+        self._count = 0
+        self._failures = {}  # device pk -> consecutive failed flushes
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # One flush at a time, so a spool rewrite never drops another flush's batch.
+        self._flush_lock = threading.Lock()
+        self._spool = None
+        self._spool_path = None
+        self._recovered = []
+        if self.config['SPOOL_PATH']:
+            base = str(self.config['SPOOL_PATH'])
+            self._spool_path = f'{base}.{os.getpid()}'
+            self._recovered = self._adopt_spools(base)
+            self._rewrite_spool()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='dashboard-ingest-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+        return self
+
+    @property
+    def size(self):
+        return self._count
+
+    def submit(self, device, samples):
+        """
+        Buffer samples for a device. Raises BufferFull when MAX_ITEMS would be exceeded.
+        """
+        now = timezone.now()
+        samples = [{**sample, 'timestamp': sample.get('timestamp') or now} for sample in samples]
+        with self._lock:
+            if self._count + len(samples) > self.config['MAX_ITEMS']:
+                raise BufferFull()
+            if self._spool is not None:
+                self._spool.write(self._spool_line(device.pk, samples))
+                self._spool.flush()
+                if self.config['SPOOL_FSYNC']:
+                    os.fsync(self._spool.fileno())
+            self._pending.append((device, samples))
+            self._count += len(samples)
+            if self._count >= self.config['FLUSH_SIZE']:
+                self._wakeup.notify()
+
+    def flush(self):
+        """
+        Commit everything buffered so far. Returns the number of samples written.
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending, self._count = self._pending, [], 0
+        if not batch:
+            return 0
+
+        from .ingest import store_readings, after_store
+
+        by_device = defaultdict(list)
+        devices = {}
+        for device, samples in batch:
+            by_device[device.pk].extend(samples)
+            devices[device.pk] = device
+
+        written = 0
+        retry = []
+        for device_id, samples in by_device.items():
+            device = devices[device_id]
+            try:
+                readings, current_status = store_readings(device, samples)
+            except Exception:
+                failures = self._failures.get(device_id, 0) + 1
+                if failures < self.config['MAX_ATTEMPTS']:
+                    logger.exception("Error flushing %d readings of device %s, will retry", len(samples), device_id)
+                    self._failures[device_id] = failures
+                    retry.append((device, samples))
+                else:
+                    logger.exception(
+                        "Dropping %d readings of device %s after %d failed flushes: %s",
+                        len(samples), device_id, failures, self._spool_line(device_id, samples).strip(),
+                    )
+                    self._failures.pop(device_id, None)
+                    registry.inc('dashboard_ingest_dropped_total', (), len(samples))
+                continue
+
+            self._failures.pop(device_id, None)
+            written += len(samples)
+            if readings:
+                # Committed: from here on a failure must not put the samples back.
+                try:
+                    after_store(device, readings, current_status)
+                except Exception:
+                    logger.exception("Error after storing readings of device %s", device_id)
+
+        if retry:
+            with self._lock:
+                self._pending[:0] = retry
+                self._count += sum(len(samples) for _, samples in retry)
+        if self._spool is not None:
+            self._rewrite_spool()
+        return written
+
+    # ---- SPOOL ----
+
+    def _spool_line(self, device_id, samples):
+        return json.dumps({
+            'device': device_id,
+            'samples': [{**sample, 'timestamp': sample['timestamp'].isoformat()} for sample in samples],
+        }) + '\n'
+
+    def _rewrite_spool(self):
+        """
+        The spool only needs what is still pending; rewrite it with exactly
+        that (bounded by MAX_ITEMS) so it never grows without limit. The new
+        file is locked before it replaces the old one, so no other process
+        can ever mistake it for an orphan.
+        """
+        with self._lock:
+            temp_path = self._spool_path + '.tmp'
+            temp = open(temp_path, 'w', encoding='utf-8')
+            _lock_file(temp)
+            for device_id, samples in self._recovered:
+                temp.write(self._spool_line(device_id, samples))
+            for device, samples in self._pending:
+                temp.write(self._spool_line(device.pk, samples))
+            temp.flush()
+            os.fsync(temp.fileno())
+            os.replace(temp_path, self._spool_path)
+            if self._spool is not None:
+                self._spool.close()
+            self._spool = temp
+
+    def _adopt_spools(self, base):
+        """
+        Samples that processes which are gone acknowledged but may not have
+        committed: every spool under `base` whose lock can be taken. Each one is
+        read and deleted; the caller rewrites its own spool with the entries
+        before anything else, so they stay on disk throughout.
+        """
+        entries = []
+        suffix = re.compile(r'\.\d+(\.tmp)?$')
+        paths = [path for path in glob.glob(glob.escape(base) + '.*') if suffix.fullmatch(path[len(base):])]
+        # The bare path is the shared spool written before per-process spools.
+        for path in sorted(paths) + [base]:
+            if path == self._spool_path or not os.path.exists(path):
+                continue
+            try:
+                orphan = open(path, encoding='utf-8')
+            except FileNotFoundError:
+                continue  # Adopted by another process meanwhile
+            with orphan:
+                if not _lock_file(orphan, blocking=False):
+                    continue  # Its process is still running
+                if not os.path.exists(path) or os.stat(path).st_ino != os.fstat(orphan.fileno()).st_ino:
+                    continue  # Replaced or adopted between open and lock
+                if not path.endswith('.tmp'):
+                    entries.extend(self._read_spool(orphan))
+                os.unlink(path)
+        return entries
+
+    def _read_spool(self, spool):
+        entries = []
+        for line in spool:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue  # Torn last line from a crash mid-write
+            samples = [
+                {**sample, 'timestamp': parse_datetime(sample['timestamp'])}
+                for sample in entry['samples']
+            ]
+            entries.append((entry['device'], samples))
+        return entries
+
+    def _requeue_recovered(self):
+        """
+        Put spooled samples back in front of the queue. Samples carrying a seq
+        are deduplicated, so a spool that was partly committed does not double up.
+        """
+        devices = Device.objects.in_bulk({device_id for device_id, _ in self._recovered})
+        recovered = [
+            (devices[device_id], samples)
+            for device_id, samples in self._recovered if device_id in devices
+        ]
+        with self._lock:
+            self._recovered = []
+            self._pending[:0] = recovered
+            self._count += sum(len(samples) for _, samples in recovered)
+        return len(recovered)
+
+    def _run(self):
+        if self._recovered:
+            close_old_connections()
+            try:
+                logger.info("Recovered %d spooled ingest requests", self._requeue_recovered())
+            except Exception:
+                logger.exception("Error recovering ingest spool")
+
+        interval = self.config['FLUSH_INTERVAL']
+        while True:
+            deadline = time.monotonic() + interval
+            with self._lock:
+                while self._count < self.config['FLUSH_SIZE']:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+            close_old_connections()
+            self.flush()
+            close_old_connections()
+
+
+def _lock_file(handle, blocking=True):
+    """
+    Exclusive flock on an open file, held until it is closed. Returns False
+    if `blocking` is off and another process holds it.
+    """
+    import fcntl  # POSIX only, and only needed when a spool is configured
+
+    try:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+    except BlockingIOError:
+        return False
+    return True
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """
+    The process-wide buffer, or None when write-behind is disabled.
+    """
+    global _buffer
+    if _buffer is None:
+        if not get_config()['ENABLED']:
+            return None
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = WriteBehindBuffer().start()
+    return _buffer
+
+
+registry.describe(
+    'dashboard_ingest_dropped_total', 'counter', 'Buffered readings dropped after repeated failed flushes.',
+)
+registry.gauge(
+    'dashboard_ingest_buffer_size', 'Readings accepted but not yet written (write-behind ingest).',
+    lambda: _buffer.size if _buffer is not None else 0,
+)
@@ -0,0 +1,73 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(threading.Thread):
+    """
+    Daemon thread that calls `func` every `interval` seconds until stopped.
+    Errors are logged and the job keeps running.
+    """
+
+    def __init__(self, name, interval, func):
+        super().__init__(name=f'dashboard-{name}', daemon=True)
+        self.interval = interval
+        self.func = func
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            close_old_connections()
+            try:
+                self.func()
+            except Exception:
+                logger.exception("Error in periodic job %s", self.name)
+            finally:
+                close_old_connections()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def start_job(name, interval, func):
+    """
+    Start a named job once per process; later calls with the same name are no-ops.
+    """
+    with _jobs_lock:
+        if name in _jobs or not interval:
+            return _jobs.get(name)
+        job = PeriodicJob(name, interval, func)
+        job.start()
+        _jobs[name] = job
+        return job
+
+
+def start_background_jobs():
+    """
+    Called from the WSGI/ASGI entry points so only serving processes run jobs,
+    never migrate or other management commands.
+
+    Liveness and anomaly flushes write this process's in-memory state, so
+    every worker runs them. Retention, offline detection and command expiry
+    act on the whole database; they only start where RUN_SHARED_JOBS is True,
+    which should be exactly one process per deployment.
+    """
+    from . import retention, liveness, anomaly, outbox
+
+    start_job('liveness', liveness.get_config()['INTERVAL'], liveness.run_scheduled)
+    start_job('anomaly', anomaly.get_config()['PERSIST_INTERVAL'], anomaly.run_scheduled)
+
+    if not getattr(settings, 'RUN_SHARED_JOBS', True):
+        return
+    start_job('retention', retention.get_policy()['INTERVAL'], retention.run_scheduled)
+    start_job('offline', liveness.get_config()['INTERVAL'], liveness.detect_offline)
+    start_job('outbox', outbox.get_config()['EXPIRE_INTERVAL'], outbox.run_scheduled)
@@ -0,0 +1,125 @@
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from .models import Device
+from . import pubsub
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'GRACE_INTERVALS': 3,   # Offline after missing this many expected check-ins
+    'THROTTLE': 5,          # Seconds between recorded touches per device
+    'INTERVAL': 5,          # Seconds between flush + offline detection runs (0 = off)
+    'BATCH_SIZE': 500,      # Rows per bulk UPDATE
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LIVENESS', {})}
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _publish(device_id, online, last_seen):
+    pubsub.publish(device_id, 'liveness', {'is_online': online, 'last_seen': last_seen.isoformat() if last_seen else None})
+
+
+class LivenessTracker:
+    """
+    Collects "device was seen" marks from authenticated requests in memory and
+    writes them in bulk. A device is marked at most once per THROTTLE seconds,
+    so a fleet polling every few seconds costs one batched UPDATE per flush
+    instead of a write per request.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self._pending = {}   # device pk -> (seen at, expected interval)
+        self._written = {}   # device pk -> last recorded time
+        self._lock = threading.Lock()
+
+    def touch(self, device, now=None):
+        now = now or timezone.now()
+        written = self._written.get(device.pk)
+        if written is not None and (now - written).total_seconds() < self.config['THROTTLE']:
+            return
+        with self._lock:
+            self._pending[device.pk] = (now, device.expected_interval)
+
+    def flush(self):
+        """
+        Persist pending marks. Returns how many devices were written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        grace = self.config['GRACE_INTERVALS']
+        for batch in _chunks(pending.items(), self.config['BATCH_SIZE']):
+            ids = [pk for pk, _ in batch]
+            came_online = set(
+                Device.objects.filter(pk__in=ids, is_online=False).values_list('pk', flat=True)
+            )
+            Device.objects.bulk_update([
+                Device(
+                    pk=pk,
+                    last_seen=seen,
+                    stale_at=seen + timedelta(seconds=interval * grace),
+                    is_online=True,
+                )
+                for pk, (seen, interval) in batch
+            ], ['last_seen', 'stale_at', 'is_online'])
+            for pk, (seen, _) in batch:
+                self._written[pk] = seen
+                if pk in came_online:
+                    _publish(pk, True, seen)
+        return len(pending)
+
+
+def detect_offline(now=None, batch_size=None):
+    """
+    Flag online devices whose stale_at has passed. Walks the partial
+    device_stale_idx, so the cost depends on how many devices just went
+    silent, not on the size of the fleet. Returns the number flagged.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or get_config()['BATCH_SIZE']
+    flagged = 0
+    while True:
+        stale = dict(
+            Device.objects.filter(is_online=True, stale_at__lt=now)
+            .order_by('stale_at')
+            .values_list('pk', 'last_seen')[:batch_size]
+        )
+        if stale:
+            # Re-check the deadline: a flush may have moved it since the read.
+            updated = Device.objects.filter(pk__in=stale, is_online=True, stale_at__lt=now).update(is_online=False)
+            if updated:
+                flagged += updated
+                offline = stale if updated == len(stale) else dict(
+                    Device.objects.filter(pk__in=stale, is_online=False).values_list('pk', 'last_seen')
+                )
+                for pk, last_seen in offline.items():
+                    _publish(pk, False, last_seen)
+        if len(stale) < batch_size:
+            break
+
+    if flagged:
+        logger.info("Marked %d devices offline", flagged)
+    return flagged
+
+
+tracker = LivenessTracker()
+
+
+def run_scheduled():
+    tracker.flush()
@@ -0,0 +1,84 @@
+from datetime import timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDay, TruncHour, TruncMinute
+from django.utils.dateparse import parse_datetime
+from dashboard.models import Device, SensorReading, ReadingRollup
+from dashboard.rollups import bucket_start
+
+
+TRUNCATE = {
+    '1m': TruncMinute,
+    '1h': TruncHour,
+    '1d': TruncDay,
+}
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the 1m/1h/1d reading rollups from raw SensorReading rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--device", help="Only backfill this device_id.")
+        parser.add_argument(
+            "--since",
+            help="ISO datetime; only rebuild buckets from this point on (rounded down to the day).",
+        )
+        parser.add_argument("--batch-size", type=int, default=2_000, help="Rollup rows per upsert.")
+
+    def handle(self, *args, **options):
+        readings = SensorReading.objects.all()
+
+        if options["device"]:
+            device = Device.objects.filter(device_id=options["device"]).first()
+            if device is None:
+                raise CommandError(f"Unknown device {options['device']}")
+            readings = readings.filter(device=device)
+
+        if options["since"]:
+            since = parse_datetime(options["since"])
+            if since is None or since.tzinfo is None:
+                raise CommandError("--since must be an ISO datetime with a timezone, e.g. 2025-01-01T00:00:00Z")
+            # Whole days only, so no bucket is rebuilt from a partial set of rows.
+            readings = readings.filter(timestamp__gte=bucket_start(since, '1d'))
+
+        for resolution, trunc in TRUNCATE.items():
+            rows = (
+                readings.order_by()
+                .annotate(bucket=trunc('timestamp', tzinfo=dt_timezone.utc))
+                .values('device_id', 'bucket')
+                .annotate(
+                    count=Count('id'),
+                    total=Sum('moisture_level'),
+                    low=Min('moisture_level'),
+                    high=Max('moisture_level'),
+                )
+            )
+            written = 0
+            batch = []
+            for row in rows.iterator(chunk_size=options["batch_size"]):
+                batch.append(ReadingRollup(
+                    device_id=row['device_id'],
+                    resolution=resolution,
+                    bucket_start=row['bucket'],
+                    count=row['count'],
+                    total=row['total'],
+                    min_moisture=row['low'],
+                    max_moisture=row['high'],
+                ))
+                if len(batch) >= options["batch_size"]:
+                    written += self.upsert(batch)
+                    batch = []
+            if batch:
+                written += self.upsert(batch)
+            self.stdout.write(self.style.SUCCESS(f"📊 {resolution}: wrote {written} buckets"))
+
+        self.stdout.write(self.style.SUCCESS("✅ Rollup backfill complete!"))
+
+    def upsert(self, batch):
+        ReadingRollup.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['device', 'resolution', 'bucket_start'],
+            update_fields=['count', 'total', 'min_moisture', 'max_moisture'],
+        )
+        return len(batch)
@@ -0,0 +1,110 @@
+import secrets
+import statistics
+import threading
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection, connections
+from dashboard.models import Device, CurrentStatus
+from dashboard.ingest import record_readings
+
+
+BENCH_USERNAME = "bench_ingest"
+BENCH_PREFIX = "BENCH_INGEST_"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures reading-ingest throughput against the configured database profile: "
+        "concurrent workers push readings through the same path as ReadingView."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--devices", type=int, default=20, help="Benchmark devices to create.")
+        parser.add_argument("--readings", type=int, default=100, help="Requests per device.")
+        parser.add_argument("--batch", type=int, default=1, help="Samples per request (1 = /api/readings/).")
+        parser.add_argument("--workers", type=int, default=8, help="Concurrent worker threads.")
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark devices afterwards.")
+
+    def handle(self, *args, **options):
+        self.describe_profile()
+        devices = self.seed(options["devices"])
+
+        timings, errors = [], []
+        lock = threading.Lock()
+        workers = [
+            threading.Thread(
+                target=self.worker,
+                args=(devices[i::options["workers"]], options, timings, errors, lock),
+            )
+            for i in range(options["workers"])
+        ]
+
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+
+        requests = len(timings)
+        timings.sort()
+        p50 = statistics.median(timings) * 1000 if timings else 0
+        p99 = timings[min(requests - 1, int(requests * 0.99))] * 1000 if timings else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"⚡ {requests} requests ({requests * options['batch']} readings) in {elapsed:.2f}s · "
+            f"{requests * options['batch'] / elapsed:.0f} readings/s · "
+            f"p50 {p50:.2f} ms · p99 {p99:.2f} ms"
+        ))
+        if errors:
+            self.stdout.write(self.style.ERROR(f"❌ {len(errors)} failed requests, e.g. {errors[0]}"))
+
+        if not options["keep"]:
+            User.objects.filter(username=BENCH_USERNAME).delete()
+
+    def describe_profile(self):
+        settings_dict = connection.settings_dict
+        details = [connection.vendor, str(settings_dict["NAME"])]
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                for pragma in ("journal_mode", "synchronous", "busy_timeout", "cache_size", "mmap_size"):
+                    cursor.execute(f"PRAGMA {pragma}")
+                    details.append(f"{pragma}={cursor.fetchone()[0]}")
+        else:
+            details.append(f"CONN_MAX_AGE={settings_dict['CONN_MAX_AGE']}")
+            details.append(f"pool={'pool' in settings_dict['OPTIONS']}")
+        self.stdout.write(self.style.NOTICE(f"🗄️  {' · '.join(details)}"))
+
+    def seed(self, count):
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create_user(username=BENCH_USERNAME, password=secrets.token_hex(8))
+        devices = Device.objects.bulk_create([
+            Device(
+                user=user,
+                name=f"Ingest Benchmark {i}",
+                device_id=f"{BENCH_PREFIX}{i:05d}",
+                api_key=secrets.token_hex(32),
+            )
+            for i in range(count)
+        ])
+        CurrentStatus.objects.bulk_create([CurrentStatus(device=device) for device in devices])
+        return devices
+
+    def worker(self, devices, options, timings, errors, lock):
+        local_timings, local_errors = [], []
+        samples = [{"moisture": 40.0 + i % 20} for i in range(options["batch"])]
+        try:
+            for _ in range(options["readings"]):
+                for device in devices:
+                    start = time.perf_counter()
+                    try:
+                        record_readings(device, samples)
+                    except Exception as e:
+                        local_errors.append(e)
+                        continue
+                    local_timings.append(time.perf_counter() - start)
+        finally:
+            connections.close_all()
+        with lock:
+            timings.extend(local_timings)
+            errors.extend(local_errors)
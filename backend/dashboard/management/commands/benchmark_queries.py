@@ -0,0 +1,179 @@
+import random
+import secrets
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+from dashboard.models import Device, SensorReading, PumpCommand, CurrentStatus
+
+
+BENCH_USERNAME = "bench"
+BENCH_PREFIX = "BENCH_"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seeds a large synthetic dataset and prints EXPLAIN plans plus p50/p99 timings "
+        "for every query issued by StatusView, StatusViewEsp and ReadingView."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--devices", type=int, default=10, help="Benchmark devices to create.")
+        parser.add_argument(
+            "--readings", type=int, default=100_000, help="Sensor readings per device (default: 100k)."
+        )
+        parser.add_argument("--commands", type=int, default=5_000, help="Pump commands per device.")
+        parser.add_argument("--iterations", type=int, default=200, help="Timed runs per query.")
+        parser.add_argument("--batch-size", type=int, default=5_000, help="Rows per bulk_create.")
+        parser.add_argument(
+            "--skip-seed", action="store_true", help="Reuse benchmark rows from a previous run."
+        )
+        parser.add_argument(
+            "--cleanup", action="store_true", help="Delete the benchmark user and its devices, then exit."
+        )
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            User.objects.filter(username=BENCH_USERNAME).delete()
+            self.stdout.write(self.style.SUCCESS("✅ Removed benchmark data."))
+            return
+
+        if not options["skip_seed"]:
+            self.seed(options)
+
+        user = User.objects.get(username=BENCH_USERNAME)
+        device = user.devices.order_by("id").first()
+        if device is None:
+            self.stderr.write("No benchmark devices found; run without --skip-seed first.")
+            return
+
+        self.stdout.write(self.style.NOTICE(
+            f"📐 {SensorReading.objects.filter(device__user=user).count()} readings, "
+            f"{PumpCommand.objects.filter(device__user=user).count()} commands across "
+            f"{user.devices.count()} benchmark devices"
+        ))
+
+        for view, label, queryset in self.read_queries(user, device):
+            self.report(f"{view} · {label}", queryset, options["iterations"])
+
+        self.report_writes(device, options["iterations"])
+
+    # ---- SEEDING ----
+
+    def seed(self, options):
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create_user(username=BENCH_USERNAME, password=secrets.token_hex(8))
+        now = timezone.now()
+
+        devices = Device.objects.bulk_create([
+            Device(
+                user=user,
+                name=f"Benchmark Device {i}",
+                device_id=f"{BENCH_PREFIX}{i:05d}",
+                api_key=secrets.token_hex(32),
+            )
+            for i in range(options["devices"])
+        ])
+        CurrentStatus.objects.bulk_create([CurrentStatus(device=device) for device in devices])
+
+        batch_size = options["batch_size"]
+        for device in devices:
+            start = time.perf_counter()
+            self.bulk_insert(SensorReading, (
+                SensorReading(
+                    device=device,
+                    moisture_level=random.uniform(20.0, 80.0),
+                    timestamp=now - timedelta(seconds=15 * j),
+                )
+                for j in range(options["readings"])
+            ), batch_size)
+            self.bulk_insert(PumpCommand, (
+                PumpCommand(
+                    device=device,
+                    action=random.choice(["ON", "OFF"]),
+                    triggered_by=random.choice(["manual", "auto"]),
+                    timestamp=now - timedelta(minutes=10 * j),
+                    # Only the most recent one is still waiting on the ESP.
+                    status=PumpCommand.QUEUED if j == 0 else PumpCommand.ACKED,
+                )
+                for j in range(options["commands"])
+            ), batch_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"🌱 Seeded {device.device_id} in {time.perf_counter() - start:.1f}s"
+            ))
+
+    def bulk_insert(self, model, rows, batch_size):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+
+    # ---- QUERIES ----
+
+    def read_queries(self, user, device):
+        """
+        The read queries each view issues, in request order.
+        """
+        return [
+            ("StatusView", "active device for user",
+             Device.objects.filter(user=user, is_active=True)[:1]),
+            ("StatusView", "current status",
+             CurrentStatus.objects.filter(device=device)),
+            ("StatusView", "latest reading",
+             device.readings.order_by("-timestamp")[:1]),
+            ("StatusView", "history (10)",
+             device.readings.order_by("-timestamp")[:10]),
+            ("StatusView", "actions (10)",
+             device.commands.order_by("-timestamp")[:10]),
+            ("StatusView", "live command",
+             device.commands.filter(status__in=PumpCommand.LIVE)[:1]),
+            ("StatusViewEsp", "device by api key",
+             Device.objects.filter(api_key=device.api_key, is_active=True)[:1]),
+            ("StatusViewEsp", "latest reading",
+             device.readings.order_by("-timestamp")[:1]),
+            ("ReadingView", "current status",
+             CurrentStatus.objects.filter(device=device)),
+            ("ReadingView", "ack commands lookup",
+             PumpCommand.objects.filter(id__in=list(device.commands.values_list("id", flat=True)[:5]),
+                                        device=device)),
+        ]
+
+    def report(self, label, queryset, iterations):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n▶ {label}"))
+        self.stdout.write(queryset.explain())
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            list(queryset.all())
+            timings.append(time.perf_counter() - start)
+        self.print_timings(timings)
+
+    def report_writes(self, device, iterations):
+        """
+        ReadingView's writes, timed inside a transaction that is rolled back.
+        """
+        self.stdout.write(self.style.MIGRATE_HEADING("\n▶ ReadingView · insert reading + status update"))
+        timings = []
+        with transaction.atomic():
+            for _ in range(iterations):
+                start = time.perf_counter()
+                SensorReading.objects.create(device=device, moisture_level=50.0)
+                CurrentStatus.objects.filter(device=device).update(
+                    current_moisture=50.0, last_updated=timezone.now()
+                )
+                timings.append(time.perf_counter() - start)
+            transaction.set_rollback(True)
+        self.print_timings(timings)
+
+    def print_timings(self, timings):
+        timings.sort()
+        p50 = statistics.median(timings) * 1000
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+        self.stdout.write(self.style.SUCCESS(f"  p50 {p50:.3f} ms · p99 {p99:.3f} ms · n={len(timings)}"))
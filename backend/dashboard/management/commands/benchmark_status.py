@@ -0,0 +1,129 @@
+import secrets
+import statistics
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.test import Client
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import AccessToken
+from dashboard.models import Device, SensorReading, PumpCommand, CurrentStatus
+from dashboard.renderers import FastJSONRenderer, orjson
+from dashboard.serializer import SensorReadingSerializer, PumpCommandSerializer
+from dashboard.status_builder import reading_rows, command_rows, READING_FIELDS, COMMAND_FIELDS
+
+
+BENCH_USERNAME = "bench_status"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures requests/s of the status poll endpoints in-process (full middleware, "
+        "auth and rendering, no network), and the history/actions payload built through "
+        "DRF serializers + JSONRenderer versus values() rows + the orjson renderer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Timed requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=100, help="Untimed requests per endpoint first.")
+        parser.add_argument("--keep", action="store_true", help="Keep the benchmark device afterwards.")
+
+    def handle(self, *args, **options):
+        user, device = self.seed()
+        jwt = Client(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        esp = Client(HTTP_X_API_KEY=device.api_key)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("▶ Endpoints"))
+        for label, client, path in (
+            ("/api/status/ (JWT)", jwt, "/api/status/"),
+            ("/api/status/ (API key)", esp, "/api/status/"),
+            ("/api/status/esp/ (API key)", esp, "/api/status/esp/"),
+        ):
+            self.endpoint(label, client, path, options)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n▶ History + actions payload, 10 + 10 rows (orjson {'installed' if orjson else 'missing'})"
+        ))
+        readings = SensorReading.objects.filter(device=device).order_by("-timestamp")[:10]
+        commands = PumpCommand.objects.filter(device=device).order_by("-timestamp")[:10]
+        instances = list(readings), list(commands)
+        tuples = list(readings.values_list(*READING_FIELDS)), list(commands.values_list(*COMMAND_FIELDS))
+        cases = (
+            ("DRF serializers + JSONRenderer", lambda fetched: JSONRenderer().render({
+                "history": SensorReadingSerializer(fetched[0], many=True).data,
+                "actions": PumpCommandSerializer(fetched[1], many=True).data,
+            }), lambda: (list(readings), list(commands)), instances),
+            ("values() rows + FastJSONRenderer", lambda fetched: FastJSONRenderer().render({
+                "history": reading_rows(fetched[0]),
+                "actions": command_rows(fetched[1]),
+            }), lambda: (list(readings.values_list(*READING_FIELDS)), list(commands.values_list(*COMMAND_FIELDS))), tuples),
+        )
+        self.stdout.write(f"  {'':<34} {'serialize + render':>20} {'with the queries':>18}")
+        baseline = None
+        for label, render, fetch, fetched in cases:
+            alone = self.payload(options, lambda: render(fetched))
+            total = self.payload(options, lambda: render(fetch()))
+            baseline = baseline or (alone, total)
+            self.stdout.write(
+                f"  {label:<34} {alone * 1e6:>10,.0f} µs {baseline[0] / alone:>5.1f}x "
+                f"{total * 1e6:>10,.0f} µs {baseline[1] / total:>5.1f}x"
+            )
+
+        if not options["keep"]:
+            User.objects.filter(username=BENCH_USERNAME).delete()
+
+    def seed(self):
+        User.objects.filter(username=BENCH_USERNAME).delete()
+        user = User.objects.create_user(username=BENCH_USERNAME, password=secrets.token_hex(8))
+        device = Device.objects.create(
+            user=user, device_id=f"BENCH_STATUS_{secrets.token_hex(4)}", api_key=secrets.token_hex(32)
+        )
+        now = timezone.now()
+        SensorReading.objects.bulk_create(
+            SensorReading(device=device, moisture_level=40 + i % 20 * 0.37, timestamp=now - timedelta(seconds=15 * i))
+            for i in range(200)
+        )
+        PumpCommand.objects.bulk_create(
+            PumpCommand(
+                device=device,
+                action="ON" if i % 2 else "OFF",
+                triggered_by="auto",
+                timestamp=now - timedelta(minutes=10 * i),
+                status=PumpCommand.QUEUED if i == 0 else PumpCommand.ACKED,
+            )
+            for i in range(20)
+        )
+        CurrentStatus.objects.create(device=device, current_moisture=42.5, auto_mode=True)
+        return user, device
+
+    def payload(self, options, build):
+        """
+        Median seconds per call of `build`.
+        """
+        for _ in range(options["warmup"]):
+            build()
+        timings = []
+        for _ in range(options["requests"]):
+            began = time.perf_counter()
+            build()
+            timings.append(time.perf_counter() - began)
+        return statistics.median(timings)
+
+    def endpoint(self, label, client, path, options):
+        for _ in range(options["warmup"]):
+            client.get(path)
+        timings = []
+        started = time.perf_counter()
+        for _ in range(options["requests"]):
+            began = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - started
+        if response.status_code != 200:
+            self.stdout.write(self.style.ERROR(f"  ❌ {label}: HTTP {response.status_code}"))
+            return
+        self.stdout.write(
+            f"  {label:<28} {len(timings) / elapsed:>8,.0f} req/s · "
+            f"p50 {statistics.median(timings) * 1000:.3f} ms · {len(response.content):,} bytes"
+        )
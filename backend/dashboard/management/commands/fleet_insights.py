@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from dashboard.models import Device
+from dashboard import analytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Computes moisture insights (drying rate, irrigation gain, time to the dry threshold) "
+        "for every device and lists the ones that will need water first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=int, help="History to analyse (default: INSIGHTS WINDOW_HOURS).")
+        parser.add_argument("--chunk", type=int, default=200, help="Devices analysed per pass (bounds memory).")
+        parser.add_argument("--top", type=int, default=10, help="Devices to list, soonest to dry first.")
+
+    def handle(self, *args, **options):
+        config = analytics.get_config()
+        end = timezone.now()
+        start = end - timedelta(hours=options["hours"] or config["WINDOW_HOURS"])
+        devices = list(Device.objects.order_by("id").only("id", "device_id"))
+
+        started = time.perf_counter()
+        insights = {}
+        for i in range(0, len(devices), options["chunk"]):
+            insights.update(analytics.compute(devices[i:i + options["chunk"]], start, end, config))
+        elapsed = time.perf_counter() - started
+
+        readings = sum(entry["readings"] for entry in insights.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(devices)} devices · {readings} readings analysed in {elapsed:.2f}s "
+            f"({readings / elapsed if elapsed else 0:,.0f} readings/s)"
+        ))
+
+        names = {device.id: device.device_id for device in devices}
+        due = sorted(
+            (entry["hours_to_threshold"], pk) for pk, entry in insights.items()
+            if entry["hours_to_threshold"] is not None
+        )
+        if not due:
+            self.stdout.write("No device is drying towards its threshold.")
+            return
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n💧 Next to need water"))
+        for hours, pk in due[:options["top"]]:
+            entry = insights[pk]
+            self.stdout.write(
+                f"  {names[pk]:<20} {entry['moisture']:6.1f}% · drying {entry['drying_rate']:.2f}%/h · "
+                f"threshold {entry['dry_threshold']:.0f}% in {hours:.1f}h · "
+                f"{entry['irrigation']['events']} runs, avg gain {entry['irrigation']['avg_gain'] or 0:.1f}%"
+            )
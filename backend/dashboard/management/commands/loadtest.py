@@ -0,0 +1,270 @@
+import asyncio
+import json
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import AccessToken
+from dashboard.models import Device, CurrentStatus
+
+
+LOAD_PREFIX = "LOAD_"
+
+
+class EndpointStats:
+    """
+    Latencies and outcomes for one endpoint.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+
+    def record(self, status, latency):
+        self.statuses[status] += 1
+        self.latencies.append(latency)
+
+    @property
+    def requests(self):
+        return sum(self.statuses.values()) + sum(self.errors.values())
+
+    @property
+    def failures(self):
+        # 2xx and 304 are successes; 204 is a long-poll timeout, not an error.
+        failed = sum(count for status, count in self.statuses.items() if status >= 400)
+        return failed + sum(self.errors.values())
+
+    def percentile(self, fraction):
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+
+async def http_request(host, port, method, path, headers, body=b"", timeout=30):
+    """
+    Minimal HTTP/1.1 client on asyncio streams. Opens a fresh connection per
+    request and closes it afterwards, like the firmware's HTTPClient begin()/end().
+    Returns (status, body).
+    """
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        head = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        if body:
+            head.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), timeout)
+    finally:
+        writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    if not status_line.startswith(b"HTTP/"):
+        raise ConnectionError("Malformed response")
+    return int(status_line.split()[1]), rest.partition(b"\r\n\r\n")[2]
+
+
+class Command(BaseCommand):
+    help = (
+        "Simulates a fleet of ESP32 devices plus dashboard users against the API and reports "
+        "throughput, latency percentiles and error rates per endpoint. Runs fully offline: "
+        "without --url it starts Django's development server on a free local port."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--devices", type=int, default=100, help="Simulated ESP32 devices.")
+        parser.add_argument("--users", type=int, default=10, help="Dashboard users polling /api/status/.")
+        parser.add_argument("--duration", type=float, default=60, help="Test length in seconds.")
+        parser.add_argument("--interval", type=float, default=15, help="Seconds between device readings (firmware: 15).")
+        parser.add_argument("--poll-interval", type=float, default=5, help="Seconds between dashboard polls.")
+        parser.add_argument(
+            "--esp-status", choices=["esp", "wait"], default="esp",
+            help="Status call after each reading: /api/status/esp/ or the long-poll /api/status/esp/wait/.",
+        )
+        parser.add_argument("--long-poll-timeout", type=int, default=10, help="Long-poll timeout (firmware: 10).")
+        parser.add_argument("--connections", type=int, default=200, help="Max concurrent open connections.")
+        parser.add_argument("--url", help="Target an already running server instead of starting one.")
+        parser.add_argument("--keep", action="store_true", help="Keep the provisioned devices afterwards.")
+        parser.add_argument("--cleanup", action="store_true", help="Delete load-test users and devices, then exit.")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            self.cleanup()
+            self.stdout.write(self.style.SUCCESS("✅ Removed load-test data."))
+            return
+
+        users, devices = self.provision(options["devices"], options["users"])
+        server = None
+        try:
+            if options["url"]:
+                target = urlsplit(options["url"])
+                host, port = target.hostname, target.port or 80
+            else:
+                host, port = "127.0.0.1", self.free_port()
+                server = self.start_server(host, port)
+
+            self.stdout.write(self.style.NOTICE(
+                f"🚜 {len(devices)} devices · {len(users)} dashboard users · "
+                f"{options['duration']:.0f}s against http://{host}:{port}"
+            ))
+            stats, elapsed = asyncio.run(self.run(host, port, users, devices, options))
+            self.report(stats, elapsed)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+            if not options["keep"]:
+                self.cleanup()
+
+    # ---- PROVISIONING ----
+
+    def provision(self, device_count, user_count):
+        """
+        Bulk-create dashboard users and devices (a few queries regardless of N).
+        Devices are spread round-robin over the users.
+        """
+        self.cleanup()
+        users = User.objects.bulk_create([
+            User(username=f"{LOAD_PREFIX.lower()}user{i:04d}", password="!")
+            for i in range(max(user_count, 1))
+        ])
+        users = list(User.objects.filter(username__startswith=LOAD_PREFIX.lower()).order_by("id"))
+        devices = Device.objects.bulk_create([
+            Device(
+                user=users[i % len(users)],
+                name=f"Load Test Device {i}",
+                device_id=f"{LOAD_PREFIX}{i:06d}",
+                api_key=secrets.token_hex(32),
+            )
+            for i in range(device_count)
+        ])
+        devices = list(Device.objects.filter(device_id__startswith=LOAD_PREFIX).order_by("id"))
+        CurrentStatus.objects.bulk_create([CurrentStatus(device=device) for device in devices])
+        return users[:user_count], devices
+
+    def cleanup(self):
+        Device.objects.filter(device_id__startswith=LOAD_PREFIX).delete()
+        User.objects.filter(username__startswith=LOAD_PREFIX.lower()).delete()
+
+    # ---- SERVER ----
+
+    def free_port(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def start_server(self, host, port):
+        """
+        Run the development server in its own process so it does not share a GIL with the load generator.
+        """
+        server = subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), "runserver", "--noreload", f"{host}:{port}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("Development server exited during start-up.")
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError("Development server did not start within 30s.")
+
+    # ---- LOAD ----
+
+    async def run(self, host, port, users, devices, options):
+        stats = defaultdict(EndpointStats)
+        limit = asyncio.Semaphore(options["connections"])
+        deadline = time.monotonic() + options["duration"]
+
+        async def call(label, method, path, headers, body=b"", timeout=30):
+            async with limit:
+                start = time.perf_counter()
+                try:
+                    status, payload = await http_request(host, port, method, path, headers, body, timeout)
+                except (OSError, asyncio.TimeoutError, ConnectionError) as e:
+                    stats[label].errors[type(e).__name__] += 1
+                    return None, None
+                stats[label].record(status, time.perf_counter() - start)
+                return status, payload
+
+        tasks = [self.device_loop(call, device, deadline, options) for device in devices]
+        tasks += [self.dashboard_loop(call, user, deadline, options) for user in users]
+        start = time.perf_counter()
+        await asyncio.gather(*tasks)
+        return stats, time.perf_counter() - start
+
+    async def device_loop(self, call, device, deadline, options):
+        """
+        The firmware loop: every interval POST a reading, then fetch status.
+        """
+        headers = {"X-API-KEY": device.api_key}
+        json_headers = {**headers, "Content-Type": "application/json"}
+        interval = options["interval"]
+        seq, moisture, since = 0, random.uniform(30, 70), None
+        # Devices boot at different times; spread the first reading over one interval.
+        await asyncio.sleep(random.uniform(0, interval))
+
+        while time.monotonic() < deadline:
+            tick = time.monotonic()
+            moisture = min(100.0, max(0.0, moisture + random.uniform(-2, 2)))
+            body = json.dumps({"device_id": device.device_id, "moisture": round(moisture, 2), "seq": seq}).encode()
+            seq += 1
+            status, _ = await call("POST /api/readings/", "POST", "/api/readings/", json_headers, body)
+
+            if status is not None and status < 300:
+                if options["esp_status"] == "esp":
+                    await call("GET /api/status/esp/", "GET", "/api/status/esp/", headers)
+                else:
+                    path = "/api/status/esp/wait/"
+                    if since is not None:
+                        path += f"?since={since}&timeout={options['long_poll_timeout']}"
+                    status, payload = await call(
+                        "GET /api/status/esp/wait/", "GET", path, headers,
+                        timeout=options["long_poll_timeout"] + 5,
+                    )
+                    if status == 200:
+                        command = json.loads(payload or b"{}").get("command")
+                        since = command["id"] if command else (since if since is not None else 0)
+
+            await asyncio.sleep(max(0.0, interval - (time.monotonic() - tick)))
+
+    async def dashboard_loop(self, call, user, deadline, options):
+        headers = {"Authorization": f"Bearer {AccessToken.for_user(user)}"}
+        await asyncio.sleep(random.uniform(0, options["poll_interval"]))
+        while time.monotonic() < deadline:
+            tick = time.monotonic()
+            await call("GET /api/status/", "GET", "/api/status/", headers)
+            await asyncio.sleep(max(0.0, options["poll_interval"] - (time.monotonic() - tick)))
+
+    # ---- REPORT ----
+
+    def report(self, stats, elapsed):
+        for label in sorted(stats):
+            endpoint = stats[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n▶ {label}"))
+            if endpoint.latencies:
+                self.stdout.write(
+                    f"  {endpoint.requests} requests · {endpoint.requests / elapsed:.1f} req/s · "
+                    f"p50 {statistics.median(endpoint.latencies) * 1000:.1f} ms · "
+                    f"p95 {endpoint.percentile(0.95):.1f} ms · p99 {endpoint.percentile(0.99):.1f} ms"
+                )
+            breakdown = ", ".join(
+                [f"{status}×{count}" for status, count in sorted(endpoint.statuses.items())]
+                + [f"{name}×{count}" for name, count in endpoint.errors.items()]
+            )
+            style = self.style.ERROR if endpoint.failures else self.style.SUCCESS
+            self.stdout.write(style(
+                f"  errors {endpoint.failures / endpoint.requests:.1%} · {breakdown}"
+            ))
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from dashboard import retention
+
+
+class Command(BaseCommand):
+    help = (
+        "Applies the RETENTION policy: deletes old raw readings and finished pump "
+        "commands (acked, expired, superseded) in bounded chunks, then optionally runs VACUUM / ANALYZE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readings-days", type=int, help="Override RETENTION['READINGS_DAYS'].")
+        parser.add_argument("--commands-days", type=int, help="Override RETENTION['ACKED_COMMANDS_DAYS'].")
+        parser.add_argument("--chunk-size", type=int, help="Override RETENTION['CHUNK_SIZE'].")
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted.")
+        parser.add_argument("--vacuum", action="store_true", help="Run VACUUM afterwards to return space to the OS.")
+        parser.add_argument("--analyze", action="store_true", help="Run ANALYZE afterwards to refresh planner stats.")
+
+    def handle(self, *args, **options):
+        size_before = retention.database_size()
+
+        report = retention.prune(
+            dry_run=options["dry_run"],
+            READINGS_DAYS=options["readings_days"],
+            ACKED_COMMANDS_DAYS=options["commands_days"],
+            CHUNK_SIZE=options["chunk_size"],
+        )
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        for label, rows in report:
+            self.stdout.write(self.style.SUCCESS(f"🧹 {verb} {rows} {label}"))
+
+        if options["dry_run"]:
+            return
+
+        if options["vacuum"]:
+            self.stdout.write(self.style.NOTICE("🗜️ Running VACUUM..."))
+            retention.vacuum()
+        if options["analyze"]:
+            self.stdout.write(self.style.NOTICE("📈 Running ANALYZE..."))
+            retention.analyze()
+
+        size_after = retention.database_size()
+        if size_before is not None and size_after is not None:
+            freed = size_before - size_after
+            self.stdout.write(self.style.SUCCESS(
+                f"💾 Database size {size_before / 1e6:.2f} MB → {size_after / 1e6:.2f} MB "
+                f"({max(freed, 0) / 1e6:.2f} MB freed)"
+            ))
+            if freed == 0 and not options["vacuum"] and sum(rows for _, rows in report):
+                self.stdout.write("   Deleted pages are reused by new rows; pass --vacuum to shrink the file.")
@@ -1,9 +1,15 @@
+import math
 import random
 import secrets
+import time
 from datetime import datetime, timedelta
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
+from django.db import connection, transaction
 from django.utils import timezone
+from dashboard.rules import get_config as get_auto_mode_config
 from dashboard.models import Device, SensorReading, PumpCommand, CurrentStatus  # replace 'yourapp' with your app name
 
 
@@ -16,6 +22,12 @@ class Command(BaseCommand):
             action="store_true",
             help="Deletes existing data before seeding new data.",
         )
+        # Bulk mode: large synthetic datasets for reproducing production load.
+        parser.add_argument("--devices", type=int, help="Bulk mode: number of devices to generate.")
+        parser.add_argument("--days", type=float, default=30, help="Bulk mode: days of history per device.")
+        parser.add_argument("--interval", type=int, default=15, help="Bulk mode: seconds between readings.")
+        parser.add_argument("--batch-size", type=int, default=5_000, help="Bulk mode: rows per insert batch.")
+        parser.add_argument("--random-seed", type=int, help="Bulk mode: make the generated data reproducible.")
 
     def handle(self, *args, **options):
         if options["fresh"]:
@@ -27,6 +39,10 @@ class Command(BaseCommand):
             User.objects.exclude(is_superuser=True).delete()
             self.stdout.write(self.style.SUCCESS("✅ Cleared old data."))
 
+        if options["devices"]:
+            self.seed_bulk(options)
+            return
+
         self.stdout.write(self.style.NOTICE("🌱 Starting database seeding..."))
 
         # ---- SUPERUSER ----
@@ -91,6 +107,7 @@ class Command(BaseCommand):
                     action=action,
                     triggered_by=random.choice(["manual", "auto"]),
                     timestamp=timezone.now() - timedelta(hours=j),
+                    status=PumpCommand.ACKED,
                 )
             self.stdout.write(self.style.SUCCESS(f"⚙️ Added pump commands for {device.device_id}"))
 
@@ -110,3 +127,157 @@ class Command(BaseCommand):
             self.stdout.write(self.style.SUCCESS(f"🟢 Updated CurrentStatus for {device.device_id}"))
 
         self.stdout.write(self.style.SUCCESS("🌾 Seeding complete!"))
+
+    # ---- BULK MODE ----
+
+    def seed_bulk(self, options):
+        """
+        One owner + device per simulated field. Rows are generated lazily and
+        written in fixed-size batches, so memory stays flat whatever the size.
+        """
+        rng = random.Random(options["random_seed"])
+        count, interval, batch_size = options["devices"], options["interval"], options["batch_size"]
+        end = timezone.now().replace(microsecond=0)
+        start = end - timedelta(days=options["days"])
+        steps = int((end - start).total_seconds() // interval)
+
+        self.stdout.write(self.style.NOTICE(
+            f"🌱 Bulk seeding {count} devices × {steps} readings ({options['days']:g} days every {interval}s)..."
+        ))
+
+        offset = User.objects.filter(username__startswith="bulk").count()
+        password = make_password("test1234")  # Hash once; PBKDF2 per user would dominate
+        users = User.objects.bulk_create([
+            User(username=f"bulk{offset + i:05d}", email=f"bulk{offset + i:05d}@example.com", password=password)
+            for i in range(count)
+        ], batch_size=batch_size)
+        users = User.objects.filter(username__in=[user.username for user in users]).order_by("id")
+        Device.objects.bulk_create([
+            Device(
+                user=user,
+                name=f"Synthetic Field {offset + i}",
+                device_id=f"SIM_{offset + i:05d}",
+                api_key=secrets.token_hex(32),
+            )
+            for i, user in enumerate(users)
+        ], batch_size=batch_size)
+        devices = Device.objects.filter(user__in=users).order_by("id")
+
+        thresholds = get_auto_mode_config()
+        total = 0
+        for device in devices.iterator():
+            began = time.perf_counter()
+            field = FieldSimulation(rng, thresholds["DRY_THRESHOLD"], thresholds["WET_THRESHOLD"])
+            rows = field.run(device.pk, start, interval, steps)
+            written = self.insert_readings(rows, batch_size)
+            PumpCommand.objects.bulk_create(
+                [PumpCommand(device=device, **command) for command in field.commands],
+                batch_size=batch_size,
+            )
+            CurrentStatus.objects.create(
+                device=device,
+                current_moisture=field.reported,
+                pump_status=field.pump_on,
+                auto_mode=True,
+            )
+            total += written
+            elapsed = time.perf_counter() - began
+            self.stdout.write(self.style.SUCCESS(
+                f"📊 {device.device_id}: {written} readings, {len(field.commands)} pump commands "
+                f"in {elapsed:.1f}s ({written / elapsed:.0f} rows/s)"
+            ))
+
+        self.stdout.write(self.style.NOTICE("🧮 Building rollups..."))
+        call_command("backfill_rollups", since=start.isoformat(), stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f"🌾 Bulk seeding complete: {total} readings."))
+
+    def insert_readings(self, rows, batch_size):
+        """
+        Plain executemany of (device_id, moisture, timestamp) tuples: skips model
+        instances and bulk_create's per-batch overhead (sqlite's variable limit
+        would otherwise cap batches at ~300 rows). One transaction per batch.
+        """
+        table = SensorReading._meta.db_table
+        sql = f"INSERT INTO {table} (device_id, moisture_level, timestamp) VALUES (%s, %s, %s)"
+        adapt = connection.ops.adapt_datetimefield_value
+        written = 0
+        batch = []
+        for device_id, moisture, timestamp in rows:
+            batch.append((device_id, moisture, adapt(timestamp)))
+            if len(batch) >= batch_size:
+                written += self.flush_batch(sql, batch)
+                batch = []
+        if batch:
+            written += self.flush_batch(sql, batch)
+        return written
+
+    def flush_batch(self, sql, batch):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+        return len(batch)
+
+
+class FieldSimulation:
+    """
+    Soil moisture of one irrigated field. Evaporation follows the sun (peaks
+    early afternoon, close to zero at night), the odd rain shower wets the
+    soil, and the pump runs whenever auto mode would switch it: ON below the
+    dry threshold, OFF above the wet threshold.
+    """
+    PEAK_DRYING = 2.5    # % per hour at the hottest point of the day
+    NIGHT_DRYING = 0.15  # % per hour overnight
+    PUMP_RATE = 25.0     # % per hour while irrigating
+    RAIN_CHANCE = 0.15   # chance of a shower per day
+    NOISE = 0.4          # sensor noise (standard deviation, %)
+
+    def __init__(self, rng, dry_threshold, wet_threshold):
+        self.rng = rng
+        self.dry = dry_threshold
+        self.wet = wet_threshold
+        self.moisture = rng.uniform(dry_threshold + 5, wet_threshold)
+        self.reported = self.moisture
+        self.pump_on = False
+        self.commands = []
+        # Fields differ a little in soil and exposure.
+        self.drying = self.PEAK_DRYING * rng.uniform(0.7, 1.3)
+
+    def run(self, device_id, start, interval, steps):
+        """
+        Yield (device_id, moisture, timestamp) rows; pump commands collect in self.commands.
+        """
+        hours = interval / 3600
+        rain_per_step = self.RAIN_CHANCE * interval / 86400
+        rain_left = 0.0
+        for step in range(steps):
+            timestamp = start + timedelta(seconds=step * interval)
+            hour = timestamp.hour + timestamp.minute / 60
+            sun = max(0.0, math.sin(math.pi * (hour - 6) / 14))  # 06:00 - 20:00, peak ~13:00
+            change = -(self.NIGHT_DRYING + self.drying * sun) * hours
+
+            if rain_left <= 0 and self.rng.random() < rain_per_step:
+                rain_left = self.rng.uniform(5, 25)  # % of moisture the shower adds
+            if rain_left > 0:
+                shower = min(rain_left, 15 * hours)
+                rain_left -= shower
+                change += shower
+            if self.pump_on:
+                change += self.PUMP_RATE * hours
+
+            self.moisture = min(100.0, max(0.0, self.moisture + change))
+            self.reported = round(min(100.0, max(0.0, self.moisture + self.rng.gauss(0, self.NOISE))), 2)
+
+            if not self.pump_on and self.reported < self.dry:
+                self.switch(True, timestamp)
+            elif self.pump_on and self.reported > self.wet:
+                self.switch(False, timestamp)
+
+            yield device_id, self.reported, timestamp
+
+    def switch(self, on, timestamp):
+        self.pump_on = on
+        self.commands.append({
+            "action": "ON" if on else "OFF",
+            "triggered_by": "auto",
+            "timestamp": timestamp,
+            "status": PumpCommand.ACKED,
+        })
@@ -0,0 +1,216 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'TOKEN': None,               # /metrics requires "Authorization: Bearer <token>"; disabled while unset
+    'SLOW_REQUEST_MS': 500,      # Requests at least this slow are logged with their SQL...
+    'SLOW_SAMPLE_RATE': 0.0,     # ...if they were picked for SQL capture (0 = slow log off)
+    'SLOW_MAX_QUERIES': 50,      # Statements kept per captured request
+}
+
+# Latency buckets in seconds, Prometheus style.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'METRICS', {})}
+
+
+class _Shard:
+    """
+    The counters and histograms written by one thread. Only the owning thread
+    writes to it, so the hot path needs no lock.
+    """
+    __slots__ = ('thread', 'counters', 'histograms')
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}    # (name, labels) -> value
+        self.histograms = {}  # (name, labels) -> [per-bucket counts..., +Inf count, sum, count]
+
+    def merge(self, other):
+        for key, value in list(other.counters.items()):
+            self.counters[key] = self.counters.get(key, 0) + value
+        for key, values in list(other.histograms.items()):
+            mine = self.histograms.setdefault(key, [0] * len(values))
+            for i, value in enumerate(list(values)):
+                mine[i] += value
+
+
+class Registry:
+    """
+    Per-thread shards merged at scrape time. Shards of finished threads (e.g.
+    the development server's thread-per-request) are folded into a retired
+    shard so memory stays bounded.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard(None)
+        self._lock = threading.Lock()  # Taken on a thread's first write and on scrape only
+        self._help = {}
+        self._gauges = {}
+
+    def describe(self, name, kind, help_text):
+        self._help[name] = (kind, help_text)
+
+    def gauge(self, name, help_text, func):
+        """
+        Register a gauge whose value is read from `func()` at scrape time.
+        """
+        self.describe(name, 'gauge', help_text)
+        self._gauges[name] = func
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard(threading.current_thread())
+            with self._lock:
+                self._retire_dead()
+                self._shards.append(shard)
+        return shard
+
+    def inc(self, name, labels, value=1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            entry = histograms[key] = [0] * (len(BUCKETS) + 3)
+        entry[bisect_left(BUCKETS, value)] += 1
+        entry[-2] += value
+        entry[-1] += 1
+
+    def _retire_dead(self):
+        alive = []
+        for shard in self._shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                self._retired.merge(shard)
+        self._shards = alive
+
+    def collect(self):
+        with self._lock:
+            self._retire_dead()
+            total = _Shard(None)
+            total.merge(self._retired)
+            for shard in self._shards:
+                total.merge(shard)
+        return total
+
+    def clear(self):
+        with self._lock:
+            self._shards = []
+            self._retired = _Shard(None)
+            self._local = threading.local()
+
+    def render(self):
+        """
+        Everything collected so far in the Prometheus text exposition format.
+        """
+        total = self.collect()
+        families = {}
+        for (name, labels), value in sorted(total.counters.items(), key=_series_order):
+            families.setdefault(name, []).append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), entry in sorted(total.histograms.items(), key=_series_order):
+            lines = families.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), entry):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(entry[-2])}")
+            lines.append(f"{name}_count{_labels(labels)} {entry[-1]}")
+        for name, func in self._gauges.items():
+            try:
+                families[name] = [f"{name} {_number(func())}"]
+            except Exception:
+                continue
+
+        output = []
+        for name in sorted(families):
+            kind, help_text = self._help.get(name, ('untyped', ''))
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {kind}")
+            output.extend(families[name])
+        return '\n'.join(output) + '\n'
+
+
+def _series_order(item):
+    return repr(item[0])
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+
+registry.describe('http_requests_total', 'counter', 'Requests by view, method, status and auth method.')
+registry.describe('http_request_duration_seconds', 'histogram', 'Time until the response is returned, by view.')
+registry.describe('http_request_db_queries_total', 'counter', 'Database queries issued while serving requests.')
+registry.describe('http_request_db_seconds_total', 'counter', 'Time spent in database queries while serving requests.')
+registry.describe('http_request_bytes_total', 'counter', 'Request body bytes received.')
+registry.describe('http_response_bytes_total', 'counter', 'Response body bytes sent (non-streaming responses).')
+
+
+# ---- PER-REQUEST DB ACCOUNTING ----
+
+class RequestStats:
+    """
+    DB work of the request in flight. Lives in a ContextVar, so queries run via
+    sync_to_async from async views are counted too.
+    """
+    __slots__ = ('queries', 'db_time', 'sql')
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.db_time = 0.0
+        self.sql = [] if capture_sql else None
+
+
+current_request = ContextVar('dashboard_metrics_request', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Connection execute wrapper; installed on every new DB connection.
+    """
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        stats.queries += 1
+        stats.db_time += elapsed
+        if stats.sql is not None and len(stats.sql) < get_config()['SLOW_MAX_QUERIES']:
+            stats.sql.append((elapsed, sql))
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,117 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.contrib.auth.models import User
+from django.utils.functional import LazyObject
+from .metrics import registry, get_config, current_request, RequestStats
+from .models import Device
+
+
+logger = logging.getLogger('dashboard.slow_requests')
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    # One series for the whole admin instead of one per admin page.
+    return 'admin' if match.namespace == 'admin' else match.view_name
+
+
+def auth_method(request):
+    """
+    How the request authenticated. DRF stores the resolved user on the request;
+    views that authenticate by hand (the async ones) fall back to what the
+    client sent. The session user is never loaded just to label a metric.
+    """
+    user = request.__dict__.get('user')
+    if isinstance(user, LazyObject):
+        user = None
+    if isinstance(user, Device):
+        return 'api_key'
+    if isinstance(user, User) and user.is_authenticated:
+        return 'jwt' if request.headers.get('Authorization', '').startswith('Bearer ') else 'session'
+    if 'X-Api-Key' in request.headers:
+        return 'api_key'
+    if request.headers.get('Authorization', '').startswith('Bearer ') or 'token' in request.GET:
+        return 'jwt'
+    return 'anonymous'
+
+
+class MetricsMiddleware:
+    """
+    Records latency, DB queries/time, bytes in/out and auth method per view
+    into dashboard.metrics (served on /metrics). Optionally captures the SQL of
+    a sample of requests and logs the ones slower than SLOW_REQUEST_MS.
+    For streaming responses the latency is time until the stream starts.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        config = get_config()
+        if not config['ENABLED']:
+            return self.get_response(request)
+        stats, token, start = self._begin(config)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self._finish(request, response, stats, start, config)
+        return response
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+        stats, token, start = self._begin(config)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        self._finish(request, response, stats, start, config)
+        return response
+
+    def _begin(self, config):
+        rate = config['SLOW_SAMPLE_RATE']
+        stats = RequestStats(capture_sql=rate > 0 and random.random() < rate)
+        return stats, current_request.set(stats), time.perf_counter()
+
+    def _finish(self, request, response, stats, start, config):
+        elapsed = time.perf_counter() - start
+        view = view_label(request)
+        labels = (('view', view),)
+
+        registry.inc('http_requests_total', (
+            ('view', view),
+            ('method', request.method),
+            ('status', response.status_code),
+            ('auth', auth_method(request)),
+        ))
+        registry.observe('http_request_duration_seconds', labels, elapsed)
+        if stats.queries:
+            registry.inc('http_request_db_queries_total', labels, stats.queries)
+            registry.inc('http_request_db_seconds_total', labels, stats.db_time)
+        bytes_in = int(request.META.get('CONTENT_LENGTH') or 0)
+        if bytes_in:
+            registry.inc('http_request_bytes_total', labels, bytes_in)
+        if not response.streaming:
+            registry.inc('http_response_bytes_total', labels, len(response.content))
+
+        if stats.sql is not None and elapsed * 1000 >= config['SLOW_REQUEST_MS']:
+            statements = '\n'.join(f"  {seconds * 1000:8.2f} ms  {sql}" for seconds, sql in stats.sql)
+            logger.warning(
+                "Slow request %s %s (%s) -> %s in %.0f ms, %d queries / %.0f ms DB\n%s",
+                request.method, request.path, view, response.status_code,
+                elapsed * 1000, stats.queries, stats.db_time * 1000, statements,
+            )
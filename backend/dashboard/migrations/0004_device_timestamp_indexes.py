@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-16 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0003_currentstatus_auto_mode_pumpcommand_acknowledged_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pumpcommand",
+            index=models.Index(
+                fields=["device", "-timestamp"], name="command_device_ts_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pumpcommand",
+            index=models.Index(
+                condition=models.Q(("acknowledged", False)),
+                fields=["device", "-timestamp"],
+                name="command_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="sensorreading",
+            index=models.Index(
+                fields=["device", "-timestamp"], name="reading_device_ts_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-16 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0004_device_timestamp_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReadingRollup",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "resolution",
+                    models.CharField(
+                        choices=[("1m", "1 minute"), ("1h", "1 hour"), ("1d", "1 day")],
+                        max_length=2,
+                    ),
+                ),
+                ("bucket_start", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "total",
+                    models.FloatField(
+                        default=0,
+                        help_text="Sum of moisture values, avg = total / count",
+                    ),
+                ),
+                ("min_moisture", models.FloatField()),
+                ("max_moisture", models.FloatField()),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="rollups",
+                        to="dashboard.device",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Reading Rollup",
+                "verbose_name_plural": "Reading Rollups",
+                "ordering": ["bucket_start"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("device", "resolution", "bucket_start"),
+                        name="rollup_bucket_unique",
+                    )
+                ],
+            },
+        ),
+    ]
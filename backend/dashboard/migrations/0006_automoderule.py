@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-16 20:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0005_readingrollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AutoModeRule",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "dry_threshold",
+                    models.FloatField(
+                        default=30, help_text="Pump ON below this moisture %"
+                    ),
+                ),
+                (
+                    "wet_threshold",
+                    models.FloatField(
+                        default=60, help_text="Pump OFF above this moisture %"
+                    ),
+                ),
+                ("min_on_seconds", models.PositiveIntegerField(default=0)),
+                ("min_off_seconds", models.PositiveIntegerField(default=0)),
+                (
+                    "device",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="auto_mode_rule",
+                        to="dashboard.device",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Auto Mode Rule",
+                "verbose_name_plural": "Auto Mode Rules",
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-16 20:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0006_automoderule"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngestCursor",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("high_seq", models.BigIntegerField(default=-1)),
+                ("window", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "device",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ingest_cursor",
+                        to="dashboard.device",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Ingest Cursor",
+                "verbose_name_plural": "Ingest Cursors",
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-16 20:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0007_ingestcursor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="device",
+            name="expected_interval",
+            field=models.PositiveIntegerField(
+                default=15,
+                help_text="Seconds between check-ins, as configured in the firmware",
+            ),
+        ),
+        migrations.AddField(
+            model_name="device",
+            name="is_online",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="device",
+            name="last_seen",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="device",
+            name="stale_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Considered offline if not seen again by then",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="device",
+            index=models.Index(
+                condition=models.Q(("is_online", True)),
+                fields=["stale_at"],
+                name="device_stale_idx",
+            ),
+        ),
+    ]
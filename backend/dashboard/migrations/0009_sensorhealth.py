@@ -0,0 +1,70 @@
+# Generated by Django 5.2.7 on 2026-10-16 21:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0008_device_liveness"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SensorHealth",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("samples", models.BigIntegerField(default=0)),
+                ("mean", models.FloatField(default=0)),
+                (
+                    "m2",
+                    models.FloatField(
+                        default=0,
+                        help_text="Welford sum of squared deviations, variance = m2 / (samples - 1)",
+                    ),
+                ),
+                ("ewma", models.FloatField(default=0)),
+                ("ewm_var", models.FloatField(default=0)),
+                ("last_value", models.FloatField(blank=True, null=True)),
+                ("last_timestamp", models.DateTimeField(blank=True, null=True)),
+                (
+                    "stuck_run",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="Consecutive samples equal to the previous one",
+                    ),
+                ),
+                ("anomalies", models.PositiveIntegerField(default=0)),
+                ("last_anomaly", models.CharField(blank=True, max_length=20)),
+                ("last_anomaly_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "suspect",
+                    models.BooleanField(
+                        default=False, help_text="The latest sample was flagged"
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "device",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="sensor_health",
+                        to="dashboard.device",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Sensor Health",
+                "verbose_name_plural": "Sensor Health",
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-16 21:12
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def status_from_acknowledged(apps, schema_editor):
+    """
+    Acknowledged commands become acked. Of the unacknowledged backlog, each
+    device's newest command stays queued so the device still receives it;
+    anything with a newer command after it is superseded.
+    """
+    PumpCommand = apps.get_model("dashboard", "PumpCommand")
+    PumpCommand.objects.filter(acknowledged=True).update(status="acked")
+    newer = PumpCommand.objects.filter(device=OuterRef("device"), id__gt=OuterRef("id"))
+    PumpCommand.objects.filter(Exists(newer), acknowledged=False).update(status="superseded")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0009_sensorhealth"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pumpcommand",
+            name="acked_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="pumpcommand",
+            name="delivered_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="pumpcommand",
+            name="expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Not delivered after this; empty = never expires",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="pumpcommand",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("queued", "Queued"),
+                    ("delivered", "Delivered"),
+                    ("acked", "Acknowledged"),
+                    ("expired", "Expired"),
+                    ("superseded", "Superseded"),
+                ],
+                default="queued",
+                max_length=10,
+            ),
+        ),
+        migrations.RunPython(status_from_acknowledged, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="pumpcommand",
+            name="command_pending_idx",
+        ),
+        migrations.RemoveField(
+            model_name="pumpcommand",
+            name="acknowledged",
+        ),
+        migrations.AddConstraint(
+            model_name="pumpcommand",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["queued", "delivered"])),
+                fields=("device",),
+                name="command_one_live_per_device",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0010_command_outbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sensorhealth",
+            name="stuck_since",
+            field=models.DateTimeField(
+                blank=True, help_text="When the current value was first read", null=True
+            ),
+        ),
+        migrations.AlterField(
+            model_name="sensorhealth",
+            name="suspect",
+            field=models.BooleanField(
+                default=False, help_text="The latest sample was a spike or jump"
+            ),
+        ),
+    ]
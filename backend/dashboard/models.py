@@ -17,10 +17,19 @@ class Device(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Liveness, kept up to date in batches by dashboard.liveness.
+    expected_interval = models.PositiveIntegerField(default=15, help_text='Seconds between check-ins, as configured in the firmware')
+    last_seen = models.DateTimeField(null=True, blank=True)
+    stale_at = models.DateTimeField(null=True, blank=True, help_text='Considered offline if not seen again by then')
+    is_online = models.BooleanField(default=False)
 
     class Meta:
         verbose_name = 'Device'
         verbose_name_plural = 'Devices'
+        indexes = [
+            # The offline detector only walks online devices whose deadline has passed.
+            models.Index(fields=['stale_at'], name='device_stale_idx', condition=models.Q(is_online=True)),
+        ]
 
     def __str__(self):
         return f"({self.device_id})"
@@ -39,6 +48,10 @@ class SensorReading(models.Model):
         verbose_name = 'Sensor Reading'
         verbose_name_plural = 'Sensor Readings'
         ordering = ['-timestamp']  
+        indexes = [
+            # Latest reading / last-N history per device without a sort step.
+            models.Index(fields=['device', '-timestamp'], name='reading_device_ts_idx'),
+        ]
 
     def __str__(self):
         return f"{self.device.name}: {self.moisture_level}% at {self.timestamp}"
@@ -48,21 +61,51 @@ class PumpCommand(models.Model):
     """
     Logs pump control commands (ON/OFF) for action history in the dashboard.
     Can be triggered manually via app or automatically via backend logic.
+    Doubles as the device's outbox (see dashboard.outbox): at most one command
+    per device is live (queued or delivered) at a time.
     """
     ACTION_CHOICES = [
         ('ON', 'Turn Pump ON'),
         ('OFF', 'Turn Pump OFF'),
     ]
+    QUEUED = 'queued'
+    DELIVERED = 'delivered'
+    ACKED = 'acked'
+    EXPIRED = 'expired'
+    SUPERSEDED = 'superseded'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (DELIVERED, 'Delivered'),
+        (ACKED, 'Acknowledged'),
+        (EXPIRED, 'Expired'),
+        (SUPERSEDED, 'Superseded'),
+    ]
+    LIVE = [QUEUED, DELIVERED]
+
     device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='commands')
     action = models.CharField(max_length=3, choices=ACTION_CHOICES)
     triggered_by = models.CharField(max_length=20, default='manual', help_text='manual, auto, or api')
     timestamp = models.DateTimeField(default=timezone.now)
-    acknowledged = models.BooleanField(default=False)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    expires_at = models.DateTimeField(null=True, blank=True, help_text='Not delivered after this; empty = never expires')
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    acked_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
         verbose_name = 'Pump Command'
         verbose_name_plural = 'Pump Commands'
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['device', '-timestamp'], name='command_device_ts_idx'),
+        ]
+        constraints = [
+            # Coalescing keeps one live command per device; its index is the device's cursor lookup.
+            models.UniqueConstraint(
+                fields=['device'],
+                condition=models.Q(status__in=['queued', 'delivered']),
+                name='command_one_live_per_device',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.device.name}: {self.get_action_display()} at {self.timestamp}"
@@ -84,4 +127,109 @@ class CurrentStatus(models.Model):
         verbose_name_plural = 'Current Statuses'
 
     def __str__(self):
-        return f"{self.device.name} Status: Moisture {self.current_moisture}%, Pump {self.pump_status} and {self.auto_mode}"
\ No newline at end of file
+        return f"{self.device.name} Status: Moisture {self.current_moisture}%, Pump {self.pump_status} and {self.auto_mode}"
+
+class ReadingRollup(models.Model):
+    """
+    Pre-aggregated moisture per device and time bucket (1 minute, 1 hour, 1 day).
+    Maintained incrementally as readings arrive so long-range charts never scan raw rows.
+    """
+    RESOLUTION_CHOICES = [
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+    device = models.ForeignKey(Device, on_delete=models.CASCADE, related_name='rollups')
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+    total = models.FloatField(default=0, help_text='Sum of moisture values, avg = total / count')
+    min_moisture = models.FloatField()
+    max_moisture = models.FloatField()
+
+    class Meta:
+        verbose_name = 'Reading Rollup'
+        verbose_name_plural = 'Reading Rollups'
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['device', 'resolution', 'bucket_start'], name='rollup_bucket_unique'),
+        ]
+
+    @property
+    def avg_moisture(self):
+        return self.total / self.count if self.count else None
+
+    def __str__(self):
+        return f"{self.device.name}: {self.resolution} bucket at {self.bucket_start}"
+
+
+class AutoModeRule(models.Model):
+    """
+    Per-device auto irrigation settings used by the rules engine.
+    The pump turns ON below dry_threshold and OFF above wet_threshold; the gap
+    between them is the hysteresis band. min_on/min_off stop the pump from
+    switching again too soon after the last change.
+    Devices without a row use the defaults.
+    """
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, related_name='auto_mode_rule')
+    dry_threshold = models.FloatField(default=30, help_text='Pump ON below this moisture %')
+    wet_threshold = models.FloatField(default=60, help_text='Pump OFF above this moisture %')
+    min_on_seconds = models.PositiveIntegerField(default=0)
+    min_off_seconds = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Auto Mode Rule'
+        verbose_name_plural = 'Auto Mode Rules'
+
+    def __str__(self):
+        return f"{self.device.name}: ON < {self.dry_threshold}%, OFF > {self.wet_threshold}%"
+
+
+class IngestCursor(models.Model):
+    """
+    Per-device deduplication window over ingest sequence numbers.
+    high_seq is the highest sequence number accepted; bit i of window is set
+    when high_seq - i has been accepted too (see dedup.py).
+    """
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, related_name='ingest_cursor')
+    high_seq = models.BigIntegerField(default=-1)
+    window = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Ingest Cursor'
+        verbose_name_plural = 'Ingest Cursors'
+
+    def __str__(self):
+        return f"{self.device.name}: seq {self.high_seq}"
+
+
+class SensorHealth(models.Model):
+    """
+    Persisted state of the streaming anomaly detector (see anomaly.py) so it
+    survives restarts: Welford mean/variance of accepted samples, the EWMA
+    baseline and the run of identical values (and since when). Written in batches, so it may
+    lag the in-memory state by one persist interval.
+    """
+    device = models.OneToOneField(Device, on_delete=models.CASCADE, related_name='sensor_health')
+    samples = models.BigIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    m2 = models.FloatField(default=0, help_text='Welford sum of squared deviations, variance = m2 / (samples - 1)')
+    ewma = models.FloatField(default=0)
+    ewm_var = models.FloatField(default=0)
+    last_value = models.FloatField(null=True, blank=True)
+    last_timestamp = models.DateTimeField(null=True, blank=True)
+    stuck_run = models.PositiveIntegerField(default=0, help_text='Consecutive samples equal to the previous one')
+    stuck_since = models.DateTimeField(null=True, blank=True, help_text='When the current value was first read')
+    anomalies = models.PositiveIntegerField(default=0)
+    last_anomaly = models.CharField(max_length=20, blank=True)
+    last_anomaly_at = models.DateTimeField(null=True, blank=True)
+    suspect = models.BooleanField(default=False, help_text='The latest sample was a spike or jump')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Sensor Health'
+        verbose_name_plural = 'Sensor Health'
+
+    def __str__(self):
+        return f"{self.device.name}: {'suspect' if self.suspect else 'ok'} ({self.anomalies} anomalies)"
@@ -0,0 +1,136 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import Device, PumpCommand
+from .serializer import PumpCommandSerializer
+from .metrics import registry
+from . import pubsub
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'TTL': 600,             # Seconds a command may wait for delivery (0 = never expires)
+    'EXPIRE_INTERVAL': 60,  # Seconds between expiry sweeps (0 = off; polls still expire lazily)
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'COMMAND_OUTBOX', {})}
+
+
+def _count(status, rows):
+    if rows:
+        registry.inc('dashboard_pump_commands_total', (('status', status),), rows)
+
+
+def enqueue(device_id, action, triggered_by, ttl=None):
+    """
+    Queue a pump command, superseding whatever the device has not executed
+    yet: a burst of ON/OFF/ON leaves only the final intent live.
+    Publishes the command as an 'action' event once committed.
+    """
+    ttl = get_config()['TTL'] if ttl is None else ttl
+    now = timezone.now()
+    with transaction.atomic():
+        # Serializes enqueues per device so a concurrent one cannot slip in
+        # between the supersede and the insert.
+        list(Device.objects.select_for_update().filter(pk=device_id).values_list('pk', flat=True))
+        superseded = PumpCommand.objects.filter(
+            device_id=device_id, status__in=PumpCommand.LIVE
+        ).update(status=PumpCommand.SUPERSEDED)
+        command = PumpCommand.objects.create(
+            device_id=device_id,
+            action=action,
+            triggered_by=triggered_by,
+            timestamp=now,
+            expires_at=now + timedelta(seconds=ttl) if ttl else None,
+        )
+        pubsub.publish(device_id, 'action', PumpCommandSerializer(command).data)
+    _count(PumpCommand.SUPERSEDED, superseded)
+    _count(PumpCommand.QUEUED, 1)
+    return command
+
+
+def next_command(device, after=None, now=None):
+    """
+    The device's effective command for a poll with cursor `after` (id of the
+    last command it executed), or None. A live command at or before the cursor
+    is acked, a newer one is marked delivered, an overdue one expires.
+    One indexed lookup, since a device has at most one live command; a write
+    only on a state change.
+    """
+    now = now or timezone.now()
+    command = PumpCommand.objects.filter(device=device, status__in=PumpCommand.LIVE).first()
+    if command is None:
+        return None
+
+    if after is not None and command.id <= after:
+        _transition(command, PumpCommand.ACKED, acked_at=now)
+        return None
+    if command.expires_at is not None and command.expires_at <= now:
+        _transition(command, PumpCommand.EXPIRED)
+        return None
+    if command.status == PumpCommand.QUEUED:
+        _transition(command, PumpCommand.DELIVERED, delivered_at=now)
+    return command
+
+
+def _transition(command, status, **fields):
+    # Conditional on the state we read, so a concurrent supersede wins.
+    rows = PumpCommand.objects.filter(pk=command.pk, status=command.status).update(status=status, **fields)
+    if rows:
+        command.status = status
+        for name, value in fields.items():
+            setattr(command, name, value)
+        _count(status, rows)
+    return rows
+
+
+def acknowledge(device, command_ids):
+    """
+    Mark the given live commands of this device as executed by the ESP.
+    """
+    if not command_ids:
+        return 0
+    rows = PumpCommand.objects.filter(
+        id__in=command_ids, device=device, status__in=PumpCommand.LIVE
+    ).update(status=PumpCommand.ACKED, acked_at=timezone.now())
+    _count(PumpCommand.ACKED, rows)
+    return rows
+
+
+def live_commands(now=None):
+    """
+    Live commands that have not expired: each device's pending set, at most one row.
+    """
+    now = now or timezone.now()
+    return PumpCommand.objects.filter(
+        Q(expires_at__isnull=True) | Q(expires_at__gt=now), status__in=PumpCommand.LIVE
+    )
+
+
+def expire_overdue(now=None):
+    """
+    Expire live commands past their TTL. Only walks live rows (one per device
+    at most) through the partial unique index.
+    """
+    now = now or timezone.now()
+    rows = PumpCommand.objects.filter(status__in=PumpCommand.LIVE, expires_at__lte=now).update(
+        status=PumpCommand.EXPIRED
+    )
+    _count(PumpCommand.EXPIRED, rows)
+    if rows:
+        logger.info("Expired %s undelivered pump commands", rows)
+    return rows
+
+
+registry.describe('dashboard_pump_commands_total', 'counter', 'Pump command outbox transitions, by new status.')
+
+
+def run_scheduled():
+    expire_overdue()
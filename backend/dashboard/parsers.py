@@ -0,0 +1,81 @@
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class TelemetryFrame:
+    """
+    A decoded binary telemetry frame. Values are already range-checked by the
+    parser, so views can store them without running a serializer.
+    """
+    __slots__ = ('seq', 'readings')
+
+    def __init__(self, seq, readings):
+        self.seq = seq
+        self.readings = readings
+
+
+class TelemetryFrameParser(BaseParser):
+    """
+    Fixed-layout little-endian frame for constrained devices:
+
+        header  2s  magic b'AG'
+                B   version (1)
+                B   sample count (1-255)
+                I   device sequence number of the first sample (the
+                    following samples are seq + 1, seq + 2, ...)
+                I   base timestamp, unix seconds (0 = use server receive time)
+        sample  H   seconds after the base timestamp
+                H   moisture in hundredths of a percent (0-10000)
+
+    One sample is 16 bytes on the wire; each extra sample adds 4.
+    """
+    media_type = 'application/vnd.agri.telemetry'
+
+    MAGIC = b'AG'
+    VERSION = 1
+    HEADER = struct.Struct('<2sBBII')
+    SAMPLE = struct.Struct('<HH')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        payload = stream.read() if stream is not None else b''
+        if len(payload) < self.HEADER.size:
+            raise ParseError('Telemetry frame too short')
+
+        magic, version, count, seq, base_ts = self.HEADER.unpack_from(payload)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ParseError('Unsupported telemetry frame')
+        if count == 0 or len(payload) != self.HEADER.size + count * self.SAMPLE.size:
+            raise ParseError('Telemetry frame length does not match its sample count')
+
+        base = (
+            datetime.fromtimestamp(base_ts, tz=dt_timezone.utc) if base_ts
+            else timezone.now()
+        )
+        readings = []
+        samples = self.SAMPLE.iter_unpack(memoryview(payload)[self.HEADER.size:])
+        for index, (offset, centi) in enumerate(samples):
+            if centi > 10000:
+                raise ParseError('Moisture out of range (0-100%)')
+            readings.append({
+                'moisture': centi / 100,
+                'timestamp': base + timedelta(seconds=offset),
+                'seq': seq + index,
+            })
+
+        return TelemetryFrame(seq, readings)
+
+
+def encode_frame(seq, samples, base_ts=0):
+    """
+    Build a frame from (seconds_offset, moisture_percent) pairs.
+    Mirrors what the firmware sends; used by tooling and benchmarks.
+    """
+    parser = TelemetryFrameParser
+    samples = list(samples)
+    return parser.HEADER.pack(parser.MAGIC, parser.VERSION, len(samples), seq, base_ts) + b''.join(
+        parser.SAMPLE.pack(offset, round(moisture * 100)) for offset, moisture in samples
+    )
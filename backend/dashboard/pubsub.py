@@ -0,0 +1,95 @@
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+from .metrics import registry
+
+
+class Subscription:
+    """
+    One listener on a device channel, bound to the event loop that created it.
+    Holds at most `maxsize` pending events; a slow consumer loses the oldest ones
+    rather than blocking publishers.
+    """
+
+    def __init__(self, broker, device_id, maxsize=100):
+        self.broker = broker
+        self.device_id = device_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """
+        Next event, or None if `timeout` seconds pass without one.
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class Broker:
+    """
+    In-process pub/sub with one channel per device.
+    Publishing is thread-safe and never blocks: sync views running in worker
+    threads hand events to each subscriber's event loop. Events only reach
+    subscribers in the same process; run a single ASGI worker for streaming
+    or put a shared broker (e.g. Redis) behind the same interface.
+    """
+
+    def __init__(self):
+        self._channels = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, device_id, maxsize=100):
+        subscription = Subscription(self, device_id, maxsize)
+        with self._lock:
+            self._channels[device_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            channel = self._channels.get(subscription.device_id)
+            if channel is None:
+                return
+            channel.discard(subscription)
+            if not channel:
+                del self._channels[subscription.device_id]
+
+    def subscriber_count(self, device_id=None):
+        with self._lock:
+            if device_id is not None:
+                return len(self._channels.get(device_id, ()))
+            return sum(len(channel) for channel in self._channels.values())
+
+    def publish(self, device_id, event):
+        with self._lock:
+            subscribers = list(self._channels.get(device_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._put, event)
+            except RuntimeError:
+                # The subscriber's loop is gone (worker shut down).
+                self.unsubscribe(subscription)
+
+
+broker = Broker()
+
+
+def publish(device_id, event_type, data):
+    """
+    Publish an event once the surrounding transaction (if any) commits,
+    so listeners never see state that could still be rolled back.
+    """
+    event = {'type': event_type, 'data': data}
+    transaction.on_commit(lambda: broker.publish(device_id, event))
+registry.gauge('dashboard_stream_subscribers', 'Open status stream / long-poll subscriptions.', broker.subscriber_count)
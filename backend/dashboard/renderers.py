@@ -0,0 +1,31 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # Falls back to DRF's json-based renderer.
+    orjson = None
+
+
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson when it is installed. Output matches DRF's
+    compact rendering for what our views return (UTC datetimes end in 'Z',
+    non-string keys stringified, U+2028/U+2029 escaped); types orjson does
+    not know (Decimal, lazy strings, ...) go through DRF's encoder. Indented
+    responses (browsable API, an `indent` media type parameter) and
+    environments without orjson use the stock renderer.
+    """
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=_default, option=self.options)
+        # Valid JSON but not valid JavaScript; DRF escapes them too.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,113 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from .models import SensorReading, PumpCommand, ReadingRollup
+from .rollups import bucket_start
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'READINGS_DAYS': 30,
+    'ACKED_COMMANDS_DAYS': 90,
+    # Per-resolution rollup retention in days; None keeps a resolution forever.
+    'ROLLUP_DAYS': {'1m': None, '1h': None, '1d': None},
+    'CHUNK_SIZE': 5000,
+    'INTERVAL': 0,
+}
+
+
+def get_policy(**overrides):
+    policy = {**DEFAULTS, **getattr(settings, 'RETENTION', {})}
+    policy.update({key: value for key, value in overrides.items() if value is not None})
+    return policy
+
+
+def delete_in_chunks(queryset, chunk_size, dry_run=False):
+    """
+    Delete matching rows chunk_size primary keys at a time.
+    Each chunk commits on its own so no single statement holds the write lock for long.
+    """
+    if dry_run:
+        return queryset.count()
+
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.order_by().values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return deleted
+        count, _ = model.objects.filter(pk__in=ids).delete()
+        deleted += count
+
+
+def database_size():
+    """
+    Size of the database in bytes, or None when the backend is not supported.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('PRAGMA page_count')
+            page_count = cursor.fetchone()[0]
+            cursor.execute('PRAGMA page_size')
+            return page_count * cursor.fetchone()[0]
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_database_size(current_database())')
+            return cursor.fetchone()[0]
+    return None
+
+
+def prune(now=None, dry_run=False, **overrides):
+    """
+    Apply the retention policy once.
+    Returns a list of (label, rows) for every table that was considered.
+    """
+    policy = get_policy(**overrides)
+    now = now or timezone.now()
+    chunk_size = policy['CHUNK_SIZE']
+    report = []
+
+    if policy['READINGS_DAYS'] is not None:
+        # Cut on a day boundary so day rollups are never rebuilt from a partial day.
+        cutoff = bucket_start(now - timedelta(days=policy['READINGS_DAYS']), '1d')
+        rows = delete_in_chunks(SensorReading.objects.filter(timestamp__lt=cutoff), chunk_size, dry_run)
+        report.append(('sensor readings', rows))
+
+    if policy['ACKED_COMMANDS_DAYS'] is not None:
+        cutoff = now - timedelta(days=policy['ACKED_COMMANDS_DAYS'])
+        # Acked, expired and superseded; live commands are never pruned.
+        queryset = PumpCommand.objects.filter(timestamp__lt=cutoff).exclude(status__in=PumpCommand.LIVE)
+        report.append(('finished pump commands', delete_in_chunks(queryset, chunk_size, dry_run)))
+
+    for resolution, days in policy['ROLLUP_DAYS'].items():
+        if days is None:
+            continue
+        cutoff = now - timedelta(days=days)
+        queryset = ReadingRollup.objects.filter(resolution=resolution, bucket_start__lt=cutoff)
+        report.append((f'{resolution} rollups', delete_in_chunks(queryset, chunk_size, dry_run)))
+
+    return report
+
+
+def vacuum():
+    with connection.cursor() as cursor:
+        cursor.execute('VACUUM')
+
+
+def analyze():
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def run_scheduled():
+    """
+    Entry point for the periodic in-process job (see jobs.py).
+    """
+    report = prune()
+    total = sum(rows for _, rows in report)
+    if total:
+        logger.info("Retention pruned %d rows: %s", total, report)
@@ -0,0 +1,119 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Min, Sum
+from django.db.models.functions import Greatest, Least
+from .models import ReadingRollup
+
+
+# Finest first. Buckets are aligned on UTC boundaries.
+RESOLUTIONS = {
+    '1m': timedelta(minutes=1),
+    '1h': timedelta(hours=1),
+    '1d': timedelta(days=1),
+}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def bucket_start(timestamp, resolution):
+    """
+    Floor a timestamp to the start of its bucket at the given resolution.
+    """
+    step = RESOLUTIONS[resolution]
+    return _EPOCH + ((timestamp - _EPOCH) // step) * step
+
+
+def _aggregate(readings):
+    """
+    Fold readings into {(resolution, bucket_start): [count, total, min, max]}.
+    """
+    buckets = {}
+    for reading in readings:
+        value = reading.moisture_level
+        for resolution in RESOLUTIONS:
+            key = (resolution, bucket_start(reading.timestamp, resolution))
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [1, value, value, value]
+            else:
+                bucket[0] += 1
+                bucket[1] += value
+                bucket[2] = min(bucket[2], value)
+                bucket[3] = max(bucket[3], value)
+    return buckets
+
+
+def _merge_bucket(device, resolution, start, count, total, low, high):
+    return ReadingRollup.objects.filter(
+        device=device, resolution=resolution, bucket_start=start
+    ).update(
+        count=F('count') + count,
+        total=F('total') + total,
+        min_moisture=Least('min_moisture', low),
+        max_moisture=Greatest('max_moisture', high),
+    )
+
+
+def apply_readings(device, readings):
+    """
+    Fold newly stored readings into the rollup tables of their device.
+    Costs one UPDATE per touched bucket (an INSERT the first time a bucket is seen),
+    so a batch spread over one minute touches three rows.
+    """
+    for (resolution, start), (count, total, low, high) in _aggregate(readings).items():
+        if _merge_bucket(device, resolution, start, count, total, low, high):
+            continue
+        try:
+            with transaction.atomic():
+                ReadingRollup.objects.create(
+                    device=device,
+                    resolution=resolution,
+                    bucket_start=start,
+                    count=count,
+                    total=total,
+                    min_moisture=low,
+                    max_moisture=high,
+                )
+        except IntegrityError:
+            # Another request created the bucket first; merge into it instead.
+            _merge_bucket(device, resolution, start, count, total, low, high)
+
+
+def choose_resolution(start, end, min_points):
+    """
+    Coarsest rollup that still yields at least `min_points` buckets over [start, end];
+    'raw' when even minute buckets would be too sparse.
+    """
+    span = end - start
+    for resolution in reversed(list(RESOLUTIONS)):
+        if span / RESOLUTIONS[resolution] >= min_points:
+            return resolution
+    return 'raw'
+
+
+def summarize(device_ids, start, resolution='1h'):
+    """
+    min/avg/max/count per device since `start`, in one grouped query over the
+    rollup buckets. The window starts at the bucket containing `start`.
+    Devices without readings are missing from the result.
+    """
+    rows = (
+        ReadingRollup.objects.filter(
+            device_id__in=device_ids,
+            resolution=resolution,
+            bucket_start__gte=bucket_start(start, resolution),
+        )
+        .order_by()
+        .values('device_id')
+        .annotate(count=Sum('count'), total=Sum('total'), low=Min('min_moisture'), high=Max('max_moisture'))
+    )
+    return {
+        row['device_id']: {
+            'min': row['low'],
+            'avg': row['total'] / row['count'] if row['count'] else None,
+            'max': row['high'],
+            'count': row['count'],
+        }
+        for row in rows
+    }
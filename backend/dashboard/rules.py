@@ -0,0 +1,219 @@
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import PumpCommand, CurrentStatus
+from .metrics import registry
+from . import status_cache, outbox
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'RULES': [
+        'dashboard.rules.ThresholdRule',
+        'dashboard.rules.MinRunTimeRule',
+    ],
+    # False evaluates inline on the request thread (handy for tests and debugging).
+    'ASYNC': True,
+    'QUEUE_SIZE': 10000,
+    'DRY_THRESHOLD': 30,
+    'WET_THRESHOLD': 60,
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'AUTO_MODE', {})}
+
+
+@dataclass
+class RuleContext:
+    """
+    Everything a rule may look at for one sample. Pure data, no DB access.
+    """
+    moisture: float
+    timestamp: datetime
+    pump_on: bool
+    last_change: datetime = None
+    dry_threshold: float = 30
+    wet_threshold: float = 60
+    min_on_seconds: int = 0
+    min_off_seconds: int = 0
+
+
+class ThresholdRule:
+    """
+    ON below the dry threshold, OFF above the wet threshold, nothing in between.
+    """
+
+    def evaluate(self, context, proposed):
+        if context.moisture < context.dry_threshold and not context.pump_on:
+            return 'ON'
+        if context.moisture > context.wet_threshold and context.pump_on:
+            return 'OFF'
+        return proposed
+
+
+class MinRunTimeRule:
+    """
+    Veto a switch while the pump is still inside its min-on / min-off window.
+    """
+
+    def evaluate(self, context, proposed):
+        if proposed is None or context.last_change is None:
+            return proposed
+        held = (context.timestamp - context.last_change).total_seconds()
+        minimum = context.min_on_seconds if context.pump_on else context.min_off_seconds
+        return None if held < minimum else proposed
+
+
+def load_rules(paths=None):
+    return [import_string(path)() for path in (paths or get_config()['RULES'])]
+
+
+def decide(rules, context):
+    """
+    Run the rule chain; each rule may propose, keep or veto an action.
+    Returns 'ON', 'OFF' or None.
+    """
+    proposed = None
+    for rule in rules:
+        proposed = rule.evaluate(context, proposed)
+    return proposed
+
+
+class RulesEngine:
+    """
+    Consumes (device, moisture, timestamp) samples from an in-process queue on a
+    background thread and issues PumpCommands, keeping auto mode off the ingest
+    request. Samples that pile up for the same device are coalesced to the newest.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.rules = load_rules(self.config['RULES'])
+        self.queue = queue.Queue(maxsize=self.config['QUEUE_SIZE'])
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, device_id, moisture, timestamp):
+        if not self.config['ASYNC']:
+            return self.evaluate(device_id, moisture, timestamp)
+
+        self._ensure_started()
+        try:
+            self.queue.put_nowait((device_id, moisture, timestamp))
+        except queue.Full:
+            logger.warning("Auto mode queue full, dropped sample for device %s", device_id)
+        return None
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dashboard-rules', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            newest = self.next_batch()
+            close_old_connections()
+            for device_id, (moisture, timestamp) in newest.items():
+                try:
+                    self.evaluate(device_id, moisture, timestamp)
+                except Exception:
+                    logger.exception("Error in auto mode for device %s", device_id)
+            close_old_connections()
+
+    def next_batch(self):
+        """
+        Block for one sample, then coalesce whatever else is already waiting:
+        device_id -> (moisture, timestamp) of its newest sample.
+        """
+        device_id, moisture, timestamp = self.queue.get()
+        newest = {device_id: (moisture, timestamp)}
+        while True:
+            try:
+                device_id, moisture, timestamp = self.queue.get_nowait()
+            except queue.Empty:
+                return newest
+            newest[device_id] = (moisture, timestamp)
+
+    def context_for(self, current_status, moisture, timestamp):
+        rule = getattr(current_status.device, 'auto_mode_rule', None)
+        context = RuleContext(
+            moisture=moisture,
+            timestamp=timestamp,
+            pump_on=current_status.pump_status,
+            dry_threshold=rule.dry_threshold if rule else self.config['DRY_THRESHOLD'],
+            wet_threshold=rule.wet_threshold if rule else self.config['WET_THRESHOLD'],
+            min_on_seconds=rule.min_on_seconds if rule else 0,
+            min_off_seconds=rule.min_off_seconds if rule else 0,
+        )
+        if context.min_on_seconds or context.min_off_seconds:
+            context.last_change = (
+                PumpCommand.objects.filter(device_id=current_status.device_id)
+                .order_by('-timestamp')
+                .values_list('timestamp', flat=True)
+                .first()
+            )
+        return context
+
+    def evaluate(self, device_id, moisture, timestamp):
+        """
+        Decide for one sample and apply the decision. Returns the issued command, if any.
+        """
+        current_status = (
+            CurrentStatus.objects.select_related('device__auto_mode_rule')
+            .filter(device_id=device_id)
+            .first()
+        )
+        if current_status is None or not current_status.auto_mode:
+            return None
+
+        action = decide(self.rules, self.context_for(current_status, moisture, timestamp))
+        if action is None:
+            return None
+        return self.apply(current_status, action, moisture)
+
+    def apply(self, current_status, action, moisture):
+        pump_on = action == 'ON'
+        with transaction.atomic():
+            # Only switch if nobody (e.g. a manual toggle) changed the pump meanwhile.
+            switched = CurrentStatus.objects.filter(
+                pk=current_status.pk, pump_status=not pump_on
+            ).update(pump_status=pump_on, last_updated=timezone.now())
+            if not switched:
+                return None
+            command = outbox.enqueue(current_status.device_id, action, 'auto')
+
+        status_cache.update_snapshot(current_status.device_id, motor_status=pump_on)
+        logger.info("Auto-triggered pump %s at moisture %s%%", action, moisture)
+        return command
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = RulesEngine()
+    return _engine
+
+
+registry.gauge(
+    'dashboard_auto_mode_queue_size', 'Samples waiting for the auto mode rules engine.',
+    lambda: _engine.queue.qsize() if _engine is not None else 0,
+)
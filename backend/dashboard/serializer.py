@@ -60,8 +60,8 @@ class PumpCommandSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PumpCommand
-        fields = ['id', 'action', 'action_display', 'triggered_by', 'timestamp']
-        read_only_fields = ['id', 'timestamp']
+        fields = ['id', 'action', 'action_display', 'triggered_by', 'timestamp', 'status', 'expires_at']
+        read_only_fields = ['id', 'timestamp', 'status', 'expires_at']
 
 
 class CurrentStatusSerializer(serializers.ModelSerializer):
@@ -91,12 +91,49 @@ class ReadingInputSerializer(serializers.Serializer):
     """
     # device_id = serializers.CharField(max_length=50)  # Removed: Redundant with API key auth
     moisture = serializers.FloatField(min_value=0, max_value=100)
+    seq = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text='Per-device increasing sequence number; retries with a seen seq are ignored'
+    )
     ack_command_ids = serializers.ListField(
         child=serializers.IntegerField(), 
         required=False, 
         help_text='IDs of commands to acknowledge after execution'
     )
 
+
+class NextCommandQuerySerializer(serializers.Serializer):
+    """
+    For ESP GET /api/commands/next/ - outbox cursor.
+    """
+    after = serializers.IntegerField(
+        min_value=0,
+        required=False,
+        help_text='ID of the last command the device executed; acknowledges it'
+    )
+
+
+class ReadingSampleSerializer(serializers.Serializer):
+    """
+    One timestamped sample inside a batch upload.
+    """
+    moisture = serializers.FloatField(min_value=0, max_value=100)
+    timestamp = serializers.DateTimeField(required=False)
+    seq = serializers.IntegerField(min_value=0, required=False)
+
+
+class ReadingBatchInputSerializer(serializers.Serializer):
+    """
+    For ESP POST /api/readings/batch/ - N buffered samples in one request.
+    """
+    readings = ReadingSampleSerializer(many=True, allow_empty=False, max_length=500)
+    ack_command_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        required=False,
+        help_text='IDs of commands to acknowledge after execution'
+    )
+
 class PumpUpdateSerializer(serializers.Serializer):
     """
     For /api/update/ POST - pump toggle.
@@ -109,3 +146,44 @@ class AutoModeSerializer(serializers.Serializer):
     """
     enabled = serializers.BooleanField()
 
+
+class HistoryQuerySerializer(serializers.Serializer):
+    """
+    Query params for GET /api/history/.
+    """
+    to = serializers.DateTimeField(required=False)
+    resolution = serializers.ChoiceField(choices=['auto', 'raw', '1m', '1h', '1d'], default='auto')
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['from'] = serializers.DateTimeField(required=False)  # 'from' is a Python keyword
+        return fields
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """
+    Query params for GET /api/export/<kind>.<format>.
+    """
+    device = serializers.CharField(required=False)  # device_id; all of the user's devices if omitted
+    to = serializers.DateTimeField(required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields['from'] = serializers.DateTimeField(required=False)  # 'from' is a Python keyword
+        return fields
+
+
+class FleetQuerySerializer(serializers.Serializer):
+    """
+    Query params for GET /api/fleet/ (keyset pagination on device id).
+    """
+    after = serializers.IntegerField(required=False, min_value=0)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=200, default=50)
+
+
+class InsightsQuerySerializer(serializers.Serializer):
+    """
+    Query params for GET /api/insights/.
+    """
+    device = serializers.CharField(required=False)  # device_id; all of the user's devices if omitted
+    hours = serializers.IntegerField(required=False, min_value=1, max_value=24 * 30)
@@ -0,0 +1,32 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Device
+from .authentication import api_key_cache, principal_cache
+from .anomaly import detector
+
+
+@receiver(post_save, sender=Device)
+def invalidate_device_api_key_on_save(sender, instance, **kwargs):
+    # Covers key rotation and deactivation: drop the new key and any entry
+    # still pointing at this device under its old key.
+    api_key_cache.invalidate(api_key=instance.api_key, device_pk=instance.pk)
+
+
+@receiver(post_delete, sender=Device)
+def invalidate_device_api_key_on_delete(sender, instance, **kwargs):
+    api_key_cache.invalidate(api_key=instance.api_key, device_pk=instance.pk)
+    # Otherwise the next persist would upsert state for a missing device.
+    detector.forget(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Device)
+def invalidate_device_principal(sender, instance, **kwargs):
+    # A new, deactivated or re-assigned device changes which device the owner
+    # (old and new) resolves to.
+    principal_cache.invalidate(user_pk=instance.user_id, device_pk=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_principal(sender, instance, **kwargs):
+    principal_cache.invalidate(user_pk=instance.pk)
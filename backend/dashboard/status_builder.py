@@ -0,0 +1,161 @@
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from .models import Device, SensorReading, PumpCommand, CurrentStatus
+from .outbox import live_commands
+
+
+HISTORY_SIZE = 10
+ACTIONS_SIZE = 10
+
+# Payloads are built from values_list tuples in the field order of
+# SensorReadingSerializer / PumpCommandSerializer, without model instances.
+ACTION_LABELS = dict(PumpCommand.ACTION_CHOICES)
+READING_FIELDS = ('id', 'moisture_level', 'timestamp')
+COMMAND_FIELDS = ('id', 'action', 'triggered_by', 'timestamp', 'status', 'expires_at')
+STATUS_FIELDS = {
+    'current_moisture': 'current_status__current_moisture',
+    'pump_status': 'current_status__pump_status',
+    'auto_mode': 'current_status__auto_mode',
+    'last_updated': 'current_status__last_updated',
+    'is_online': 'is_online',
+    'last_seen': 'last_seen',
+}
+
+
+def reading_rows(rows):
+    """
+    SensorReadingSerializer output for READING_FIELDS tuples. Timestamps are
+    converted to the current time zone like DateTimeField does; the renderer
+    formats them.
+    """
+    localtime = timezone.localtime
+    return [
+        {'id': pk, 'moisture_level': moisture, 'timestamp': localtime(timestamp)}
+        for pk, moisture, timestamp in rows
+    ]
+
+
+def command_rows(rows):
+    """
+    PumpCommandSerializer output for COMMAND_FIELDS tuples, with the action
+    label looked up instead of calling get_action_display() per row.
+    """
+    localtime = timezone.localtime
+    return [
+        {
+            'id': pk,
+            'action': action,
+            'action_display': ACTION_LABELS.get(action, action),
+            'triggered_by': triggered_by,
+            'timestamp': localtime(timestamp),
+            'status': status,
+            'expires_at': localtime(expires_at) if expires_at is not None else None,
+        }
+        for pk, action, triggered_by, timestamp, status, expires_at in rows
+    ]
+
+
+def load_status(device, history=True, actions=False, pending=False, liveness=True, history_size=HISTORY_SIZE):
+    """
+    Status payload for a device: one query for device + CurrentStatus (with the
+    latest reading joined in when no history is asked for), plus one per list.
+    Returns None if the device no longer exists. Read paths never write.
+    """
+    queryset = Device.objects.filter(pk=device.pk)
+    fields = list(STATUS_FIELDS.values())
+    if not history:
+        latest = SensorReading.objects.filter(device=OuterRef('pk')).order_by('-timestamp')
+        queryset = queryset.annotate(
+            latest_moisture=Subquery(latest.values('moisture_level')[:1]),
+            last_reading_at=Subquery(latest.values('timestamp')[:1]),
+        )
+        fields += ['latest_moisture', 'last_reading_at']
+    row = queryset.values_list(*fields).first()
+    if row is None:
+        return None
+    current = dict(zip(STATUS_FIELDS, row))
+    if current['last_updated'] is None:
+        # No CurrentStatus yet: the defaults of an unsaved one.
+        current.update(current_moisture=0.0, pump_status=False, auto_mode=False, last_updated=timezone.now())
+
+    if history:
+        latest = list(
+            SensorReading.objects.filter(device_id=device.pk).order_by('-timestamp')[:history_size]
+            .values_list(*READING_FIELDS)
+        )
+        latest_moisture, last_reading_at = (latest[0][1], latest[0][2]) if latest else (None, None)
+    else:
+        latest_moisture, last_reading_at = row[-2:]
+
+    data = {
+        'soil_moisture': latest_moisture if last_reading_at else current['current_moisture'],
+        'motor_status': current['pump_status'],
+        'is_auto_mode': current['auto_mode'],
+        'timestamp': last_reading_at or current['last_updated'],
+    }
+    if liveness:
+        data['is_online'] = current['is_online']
+        data['last_seen'] = current['last_seen']
+    if history:
+        data['history'] = reading_rows(latest)
+    if actions:
+        data['actions'] = command_rows(
+            PumpCommand.objects.filter(device_id=device.pk).order_by('-timestamp')[:ACTIONS_SIZE]
+            .values_list(*COMMAND_FIELDS)
+        )
+    if pending:
+        # The outbox keeps at most one live command per device.
+        data['pending_commands'] = command_rows(live_commands().filter(device_id=device.pk).values_list(*COMMAND_FIELDS))
+    return data
+
+
+def current_status_of(device):
+    """
+    The device's CurrentStatus, or an unsaved default one. Read paths never write.
+    """
+    try:
+        return device.current_status
+    except CurrentStatus.DoesNotExist:
+        return CurrentStatus(device=device)
+
+
+def fleet_queryset(user, after=None):
+    """
+    All of a user's devices in id order, each with its CurrentStatus and the
+    newest reading's value/time annotated in: a single query for the page.
+    """
+    latest = SensorReading.objects.filter(device=OuterRef('pk')).order_by('-timestamp')
+    queryset = (
+        Device.objects.filter(user=user)
+        .select_related('current_status')
+        .annotate(
+            latest_moisture=Subquery(latest.values('moisture_level')[:1]),
+            last_reading_at=Subquery(latest.values('timestamp')[:1]),
+        )
+        .order_by('id')
+    )
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    return queryset
+
+
+def build_fleet_entry(device, stats, now):
+    """
+    Fleet row for a device loaded through fleet_queryset; `stats` is its
+    rollups.summarize entry (or None).
+    """
+    current_status = current_status_of(device)
+    return {
+        'id': device.id,
+        'device_id': device.device_id,
+        'name': device.name,
+        'is_active': device.is_active,
+        'soil_moisture': device.latest_moisture if device.last_reading_at else current_status.current_moisture,
+        'motor_status': current_status.pump_status,
+        'is_auto_mode': current_status.auto_mode,
+        'is_online': device.is_online,
+        'last_reading_at': device.last_reading_at,
+        'last_seen': device.last_seen,
+        'last_seen_seconds': (now - device.last_seen).total_seconds() if device.last_seen else None,
+        'moisture_24h': stats,
+    }
@@ -0,0 +1,80 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from . import pubsub, status_builder
+
+
+def _key(device_id):
+    return f'dashboard:status:{device_id}'
+
+
+def _etag(data):
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return '"%s"' % hashlib.md5(payload).hexdigest()
+
+
+def _store(device_id, data):
+    entry = {'data': data, 'etag': _etag(data)}
+    cache.set(_key(device_id), entry, getattr(settings, 'STATUS_CACHE_TTL', 300))
+    return entry
+
+
+def build_snapshot(current_status, latest_timestamp=None):
+    """
+    The ESP poll payload served by StatusViewEsp.
+    """
+    return {
+        'soil_moisture': current_status.current_moisture,
+        'motor_status': current_status.pump_status,
+        'is_auto_mode': current_status.auto_mode,
+        'timestamp': latest_timestamp or current_status.last_updated,
+    }
+
+
+def get_snapshot(device_id):
+    """
+    Returns {'data': ..., 'etag': ...} or None on a miss.
+    """
+    return cache.get(_key(device_id))
+
+
+def get_or_build_snapshot(device):
+    """
+    Read-through: serve the cached snapshot or rebuild it from the DB on a miss.
+    """
+    entry = get_snapshot(device.pk)
+    if entry is None:
+        data = status_builder.load_status(device, history=False, liveness=False)
+        if data is None:
+            data = build_snapshot(status_builder.current_status_of(device))
+        entry = _store(device.pk, data)
+    return entry
+
+
+def set_snapshot(device_id, current_status, latest_timestamp=None):
+    """
+    Write-through after a reading: the caller holds the full device state.
+    Subscribers of the device channel get the new snapshot.
+    """
+    entry = _store(device_id, build_snapshot(current_status, latest_timestamp))
+    pubsub.publish(device_id, 'status', entry['data'])
+    return entry
+
+
+def update_snapshot(device_id, **fields):
+    """
+    Merge changed fields into a cached snapshot (pump / auto-mode toggles)
+    and publish them as a delta. A missing entry is left alone; the next
+    poll rebuilds it from the DB.
+    """
+    pubsub.publish(device_id, 'status', fields)
+    entry = get_snapshot(device_id)
+    if entry is None:
+        return None
+    return _store(device_id, {**entry['data'], **fields})
+
+
+def invalidate(device_id):
+    cache.delete(_key(device_id))
@@ -1,3 +1,1166 @@
-from django.test import TestCase
+import fcntl
+import gzip
+import itertools
+import json
+import os
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .anomaly import JUMP, SPIKE, STUCK, AnomalyDetector, SensorState
+from .authentication import APIKeyCache, api_key_cache, principal_cache
+from .models import Device, SensorReading, PumpCommand, CurrentStatus, AutoModeRule, ReadingRollup
+from .serializer import SensorReadingSerializer, PumpCommandSerializer
+from .parsers import TelemetryFrameParser, encode_frame
+from .rollups import apply_readings, bucket_start, choose_resolution
+from .rules import RuleContext, RulesEngine, decide, get_config, load_rules
+from .dedup import RESTART_GAP, SequenceWindow
+from .ingest_buffer import WriteBehindBuffer
+from . import analytics, anomaly, dedup, ingest, ingest_buffer, jobs, liveness, outbox, retention
+
+
+class StatusQueryBudgetTests(TestCase):
+    """
+    Query-count budgets for the status endpoints. Both views must stay at a
+    fixed number of queries no matter how many readings/commands exist, and
+    must never write on the read path.
+    """
+    # Cold caches: auth lookup + device/status + history + commands.
+    STATUS_JWT_BUDGET = 4
+    # Warm principal cache: no auth queries left.
+    STATUS_JWT_WARM_BUDGET = 3
+    STATUS_API_KEY_BUDGET = 4
+    # Cold caches: auth lookup + device/status with the latest reading joined in. Warm: nothing.
+    STATUS_ESP_BUDGET = 2
+    STATUS_ESP_WARM_BUDGET = 0
+    # Warm API-key cache: the live-command lookup, plus one write when its state changes.
+    NEXT_COMMAND_BUDGET = 1
+
+    def setUp(self):
+        cache.clear()
+        api_key_cache.clear()
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='farmer', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_T01', api_key='test-key')
+        CurrentStatus.objects.create(device=self.device, current_moisture=42)
+        SensorReading.objects.bulk_create(
+            SensorReading(device=self.device, moisture_level=i) for i in range(30)
+        )
+        PumpCommand.objects.bulk_create(
+            PumpCommand(
+                device=self.device,
+                action='ON' if i % 2 else 'OFF',
+                status=PumpCommand.QUEUED if i == 29 else PumpCommand.ACKED,
+            )
+            for i in range(30)
+        )
+
+        self.jwt_client = APIClient()
+        self.jwt_client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.device_client = APIClient()
+        self.device_client.credentials(HTTP_X_API_KEY='test-key')
+
+    def test_status_view_jwt_budget(self):
+        with self.assertNumQueries(self.STATUS_JWT_BUDGET):
+            response = self.jwt_client.get('/api/status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['history']), 10)
+        self.assertEqual(len(response.data['actions']), 10)
+        self.assertEqual(response.data['soil_moisture'], response.data['history'][0]['moisture_level'])
+
+    def test_status_view_jwt_warm_budget(self):
+        self.jwt_client.get('/api/status/')
+        with self.assertNumQueries(self.STATUS_JWT_WARM_BUDGET):
+            response = self.jwt_client.get('/api/status/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_principal_cache_follows_device_changes(self):
+        self.jwt_client.get('/api/status/')
+        self.device.is_active = False
+        self.device.save()
+        self.assertEqual(self.jwt_client.get('/api/status/').status_code, 404)
+
+    def test_status_view_api_key_budget(self):
+        with self.assertNumQueries(self.STATUS_API_KEY_BUDGET):
+            response = self.device_client.get('/api/status/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['pending_commands']), 1)
+        self.assertEqual(response.data['actions'], [])
+
+    def test_next_command_budget(self):
+        # A burst of toggles coalesces to one live command.
+        for action in ['ON', 'OFF'] * 10:
+            outbox.enqueue(self.device.pk, action, 'manual')
+        self.assertEqual(self.device.commands.filter(status__in=PumpCommand.LIVE).count(), 1)
+
+        response = self.device_client.get('/api/commands/next/')
+        self.assertEqual(response.data['action'], 'OFF')
+        self.assertEqual(response.data['status'], PumpCommand.DELIVERED)
+        with self.assertNumQueries(self.NEXT_COMMAND_BUDGET + 1):
+            acked = self.device_client.get('/api/commands/next/', {'after': response.data['id']})
+        self.assertEqual(acked.status_code, 204)
+        with self.assertNumQueries(self.NEXT_COMMAND_BUDGET):
+            idle = self.device_client.get('/api/commands/next/', {'after': response.data['id']})
+        self.assertEqual(idle.status_code, 204)
+
+    def test_status_esp_budget(self):
+        with self.assertNumQueries(self.STATUS_ESP_BUDGET):
+            response = self.device_client.get('/api/status/esp/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(self.STATUS_ESP_WARM_BUDGET):
+            self.device_client.get('/api/status/esp/')
+
+    def test_status_esp_conditional_get(self):
+        first = self.device_client.get('/api/status/esp/')
+        etag = first['ETag']
+        with self.assertNumQueries(self.STATUS_ESP_WARM_BUDGET):
+            unchanged = self.device_client.get('/api/status/esp/', headers={'If-None-Match': etag})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.content, b'')
+        self.assertEqual(unchanged['ETag'], etag)
+
+        self.device_client.post('/api/readings/', {'moisture': 12}, format='json')
+        changed = self.device_client.get('/api/status/esp/', headers={'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+        self.assertEqual(changed.data['soil_moisture'], 12)
+
+    def test_status_payload_matches_serializers(self):
+        # The values()-based payload must stay byte-identical to the serializers it replaces.
+        response = self.jwt_client.get('/api/status/')
+        readings = self.device.readings.order_by('-timestamp')[:10]
+        commands = self.device.commands.order_by('-timestamp')[:10]
+        render = JSONRenderer().render
+        self.assertEqual(render(response.data['history']), render(SensorReadingSerializer(readings, many=True).data))
+        self.assertEqual(render(response.data['actions']), render(PumpCommandSerializer(commands, many=True).data))
+
+    def test_budget_independent_of_history_size(self):
+        SensorReading.objects.bulk_create(
+            SensorReading(device=self.device, moisture_level=50) for _ in range(200)
+        )
+        with self.assertNumQueries(self.STATUS_JWT_BUDGET):
+            self.jwt_client.get('/api/status/')
+
+    def test_read_path_does_not_write(self):
+        CurrentStatus.objects.all().delete()
+        response = self.jwt_client.get('/api/status/')
+        self.assertEqual(response.status_code, 200)
+        self.device_client.get('/api/status/esp/')
+        self.assertFalse(CurrentStatus.objects.exists())
+
+
+class FleetQueryBudgetTests(TestCase):
+    """
+    The fleet endpoint costs the same number of queries for 2 devices or 30.
+    """
+    # Auth lookup + devices (status and latest reading joined in) + 24h rollup stats.
+    FLEET_BUDGET = 3
+
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='grower', password='test1234')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def add_devices(self, count):
+        start = Device.objects.count()
+        for i in range(start, start + count):
+            device = Device.objects.create(user=self.user, device_id=f'ESP32_F{i:02d}', api_key=f'fleet-{i}')
+            CurrentStatus.objects.create(device=device, current_moisture=40)
+            readings = SensorReading.objects.bulk_create(
+                SensorReading(device=device, moisture_level=30 + j) for j in range(5)
+            )
+            apply_readings(device, readings)
+
+    def test_budget_independent_of_device_count(self):
+        self.add_devices(2)
+        with self.assertNumQueries(self.FLEET_BUDGET):
+            response = self.client.get('/api/fleet/')
+        self.assertEqual(len(response.data['devices']), 2)
+
+        self.add_devices(28)
+        with self.assertNumQueries(self.FLEET_BUDGET):
+            response = self.client.get('/api/fleet/')
+        self.assertEqual(len(response.data['devices']), 30)
+        entry = response.data['devices'][0]
+        self.assertEqual(entry['moisture_24h'], {'min': 30, 'avg': 32, 'max': 34, 'count': 5})
+        self.assertIsNotNone(entry['last_reading_at'])
+
+    def test_keyset_pagination(self):
+        self.add_devices(5)
+        first = self.client.get('/api/fleet/', {'limit': 3}).data
+        self.assertEqual(len(first['devices']), 3)
+        second = self.client.get('/api/fleet/', {'limit': 3, 'after': first['next']}).data
+        self.assertEqual(len(second['devices']), 2)
+        self.assertIsNone(second['next'])
+        ids = [d['id'] for d in first['devices'] + second['devices']]
+        self.assertEqual(ids, sorted(set(ids)))
+
+
+class APIKeyCacheTests(TestCase):
+    def test_unknown_keys_do_not_evict_devices(self):
+        keys = APIKeyCache(max_size=4, negative_max_size=2)
+        device = Device(pk=1, device_id='ESP32_K01', api_key='real-key')
+        keys.set('real-key', device)
+        for i in range(50):
+            keys.set(f'guess-{i}', APIKeyCache.MISSING)
+
+        self.assertEqual(keys.get('real-key').pk, 1)
+        self.assertIs(keys.get('guess-49'), APIKeyCache.MISSING)
+        self.assertIsNone(keys.get('guess-0'))
+
+    def test_invalidate_drops_cached_miss(self):
+        keys = APIKeyCache()
+        keys.set('new-key', APIKeyCache.MISSING)
+        keys.invalidate(api_key='new-key', device_pk=7)
+        self.assertIsNone(keys.get('new-key'))
+
+
+class StatusStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='streamer', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_S01', api_key='stream-key')
+        CurrentStatus.objects.create(device=self.device, current_moisture=55)
+        self.token = str(AccessToken.for_user(self.user))
+
+    def test_wsgi_answers_503(self):
+        # The endless stream would be drained into memory under WSGI.
+        response = self.client.get('/api/status/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 503)
+
+    async def test_asgi_streams_snapshot(self):
+        response = await AsyncClient().get('/api/status/stream/', {'token': self.token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        try:
+            first = (await anext(events)).decode()
+        finally:
+            await events.aclose()
+        self.assertTrue(first.startswith('event: status\n'))
+        self.assertIn('"soil_moisture": 55', first)
+
+
+class StatusWaitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        api_key_cache.clear()
+        self.user = User.objects.create_user(username='poller', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_W01', api_key='wait-key')
+        CurrentStatus.objects.create(device=self.device, current_moisture=50, pump_status=False)
+        self.acked = PumpCommand.objects.create(device=self.device, action='OFF', status=PumpCommand.ACKED)
+
+    def wait(self, **params):
+        return AsyncClient().get('/api/status/esp/wait/', params, headers={'X-API-KEY': 'wait-key'})
+
+    async def test_rechecks_db_after_timeout(self):
+        # Created by "another worker": straight into the DB, never published in-process.
+        command = await PumpCommand.objects.acreate(device=self.device, action='ON')
+        response = await self.wait(since=self.acked.id, timeout=0.05)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['command']['id'], command.id)
+        self.assertTrue(response.json()['motor_status'])
+
+    async def test_times_out_with_204(self):
+        response = await self.wait(since=self.acked.id, timeout=0.05)
+        self.assertEqual(response.status_code, 204)
+
+    async def test_first_poll_ignores_dead_commands(self):
+        await PumpCommand.objects.acreate(device=self.device, action='ON', status=PumpCommand.EXPIRED)
+        response = await self.wait()
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['command'])
+        self.assertFalse(response.json()['motor_status'])
+
+
+class RuleChainTests(SimpleTestCase):
+    def setUp(self):
+        self.rules = load_rules()
+        self.now = timezone.now()
+
+    def decide_at(self, moisture, pump_on, **fields):
+        return decide(self.rules, RuleContext(moisture=moisture, timestamp=self.now, pump_on=pump_on, **fields))
+
+    def test_hysteresis(self):
+        self.assertEqual(self.decide_at(20, pump_on=False), 'ON')
+        self.assertIsNone(self.decide_at(20, pump_on=True))
+        # Inside the band the pump keeps whatever state it is in.
+        self.assertIsNone(self.decide_at(45, pump_on=True))
+        self.assertIsNone(self.decide_at(45, pump_on=False))
+        self.assertEqual(self.decide_at(70, pump_on=True), 'OFF')
+        self.assertIsNone(self.decide_at(70, pump_on=False))
+
+    def test_min_on_and_min_off(self):
+        recent = self.now - timedelta(seconds=30)
+        self.assertIsNone(self.decide_at(70, pump_on=True, last_change=recent, min_on_seconds=60))
+        self.assertEqual(self.decide_at(70, pump_on=True, last_change=recent, min_on_seconds=10), 'OFF')
+        self.assertIsNone(self.decide_at(20, pump_on=False, last_change=recent, min_off_seconds=60))
+        self.assertEqual(self.decide_at(20, pump_on=False, last_change=recent, min_on_seconds=60), 'ON')
+
+
+class RulesEngineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='irrigator', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_R01', api_key='rules-key')
+        self.status = CurrentStatus.objects.create(device=self.device, current_moisture=50, auto_mode=True)
+        self.engine = RulesEngine({**get_config(), 'ASYNC': False})
+
+    def test_dry_sample_switches_pump_on_once(self):
+        command = self.engine.submit(self.device.pk, 20, timezone.now())
+        self.assertEqual(command.action, 'ON')
+        self.assertEqual(command.triggered_by, 'auto')
+        self.assertTrue(CurrentStatus.objects.get(pk=self.status.pk).pump_status)
+        self.assertIsNone(self.engine.submit(self.device.pk, 19, timezone.now()))
+        self.assertEqual(self.device.commands.filter(status__in=PumpCommand.LIVE).count(), 1)
+
+    def test_skips_devices_without_auto_mode(self):
+        CurrentStatus.objects.filter(pk=self.status.pk).update(auto_mode=False)
+        self.assertIsNone(self.engine.submit(self.device.pk, 20, timezone.now()))
+        self.assertFalse(self.device.commands.exists())
+
+    def test_per_device_thresholds_and_min_on(self):
+        AutoModeRule.objects.create(device=self.device, dry_threshold=40, wet_threshold=50, min_on_seconds=600)
+        start = timezone.now()
+        self.assertEqual(self.engine.submit(self.device.pk, 35, start).action, 'ON')
+        # Wet, but the pump has only run for a minute.
+        self.assertIsNone(self.engine.submit(self.device.pk, 55, start + timedelta(minutes=1)))
+        self.assertEqual(self.engine.submit(self.device.pk, 55, start + timedelta(minutes=11)).action, 'OFF')
+
+    def test_apply_loses_to_concurrent_toggle(self):
+        current_status = CurrentStatus.objects.select_related('device').get(pk=self.status.pk)
+        # A manual toggle lands between the decision and the write.
+        CurrentStatus.objects.filter(pk=self.status.pk).update(pump_status=True)
+        self.assertIsNone(self.engine.apply(current_status, 'ON', 20))
+        self.assertFalse(self.device.commands.exists())
+
+    def test_apply_supersedes_undelivered_command(self):
+        manual = outbox.enqueue(self.device.pk, 'OFF', 'manual')
+        command = self.engine.apply(self.status, 'ON', 20)
+        self.assertEqual(list(self.device.commands.filter(status__in=PumpCommand.LIVE)), [command])
+        manual.refresh_from_db()
+        self.assertEqual(manual.status, PumpCommand.SUPERSEDED)
+
+    def test_queue_coalesces_per_device(self):
+        engine = RulesEngine()
+        now = timezone.now()
+        for i, moisture in enumerate([50, 40, 20]):
+            engine.queue.put((self.device.pk, moisture, now + timedelta(seconds=i)))
+        engine.queue.put((999, 70, now))
+        batch = engine.next_batch()
+        self.assertEqual(batch, {self.device.pk: (20, now + timedelta(seconds=2)), 999: (70, now)})
+        self.assertTrue(engine.queue.empty())
+
+
+class ReplayRulesCommandTests(TestCase):
+    def test_replays_without_writes(self):
+        user = User.objects.create_user(username='replayer', password='test1234')
+        device = Device.objects.create(user=user, device_id='ESP32_R02', api_key='replay-key')
+        start = timezone.now() - timedelta(hours=1)
+        SensorReading.objects.bulk_create(
+            SensorReading(device=device, moisture_level=level, timestamp=start + timedelta(minutes=i))
+            for i, level in enumerate([50, 25, 40, 65, 45, 20])
+        )
+        out = StringIO()
+        call_command('replay_rules', stdout=out)
+        self.assertIn('Replayed 6 readings across 1 devices: 2 pump ON, 1 pump OFF', out.getvalue())
+        self.assertFalse(PumpCommand.objects.exists())
+
+
+class TelemetryFrameParserTests(SimpleTestCase):
+    def parse(self, payload):
+        return TelemetryFrameParser().parse(BytesIO(payload))
+
+    def test_valid_frame(self):
+        frame = self.parse(encode_frame(7, [(0, 41.5), (15, 100), (30, 0)], base_ts=1_700_000_000))
+        self.assertEqual(frame.seq, 7)
+        self.assertEqual([r['moisture'] for r in frame.readings], [41.5, 100, 0])
+        self.assertEqual([r['seq'] for r in frame.readings], [7, 8, 9])
+        self.assertEqual(frame.readings[1]['timestamp'].timestamp(), 1_700_000_015)
+
+    def test_zero_base_uses_receive_time(self):
+        before = timezone.now()
+        frame = self.parse(encode_frame(0, [(5, 30)]))
+        self.assertGreaterEqual(frame.readings[0]['timestamp'], before + timedelta(seconds=5))
+
+    def test_short_frame(self):
+        with self.assertRaisesMessage(ParseError, 'too short'):
+            self.parse(b'AG\x01')
+
+    def test_truncated_frame(self):
+        payload = encode_frame(0, [(0, 30), (15, 31)])
+        with self.assertRaisesMessage(ParseError, 'does not match'):
+            self.parse(payload[:-2])
+        with self.assertRaisesMessage(ParseError, 'does not match'):
+            self.parse(payload + b'\x00')
+
+    def test_empty_frame(self):
+        with self.assertRaisesMessage(ParseError, 'does not match'):
+            self.parse(encode_frame(0, []))
+
+    def test_bad_magic_or_version(self):
+        payload = encode_frame(0, [(0, 30)])
+        with self.assertRaisesMessage(ParseError, 'Unsupported'):
+            self.parse(payload[:2] + b'\x02' + payload[3:])
+        with self.assertRaisesMessage(ParseError, 'Unsupported'):
+            self.parse(b'XX' + payload[2:])
+
+    def test_moisture_out_of_range(self):
+        with self.assertRaisesMessage(ParseError, 'out of range'):
+            self.parse(encode_frame(0, [(0, 30), (15, 100.01)]))
+
+
+class ReadingBatchViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        api_key_cache.clear()
+        self.user = User.objects.create_user(username='batcher', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_B01', api_key='batch-key')
+        CurrentStatus.objects.create(device=self.device)
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_API_KEY='batch-key')
+
+    def post_frame(self, payload):
+        return self.client.post('/api/readings/batch/', payload, content_type=TelemetryFrameParser.media_type)
+
+    def test_binary_frame(self):
+        response = self.post_frame(encode_frame(100, [(0, 30), (15, 31.25)], base_ts=1_700_000_000))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            list(self.device.readings.order_by('timestamp').values_list('moisture_level', flat=True)),
+            [30, 31.25],
+        )
+
+    def test_bad_frame_is_rejected(self):
+        response = self.post_frame(encode_frame(100, [(0, 30)])[:-1])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.device.readings.exists())
+
+    def test_json_batch(self):
+        CurrentStatus.objects.filter(device=self.device).update(auto_mode=True)
+        start = timezone.now() - timedelta(minutes=5)
+        levels = [40, 36, 32, 28, 24]
+        samples = [
+            {'moisture': level, 'timestamp': (start + timedelta(seconds=15 * i)).isoformat()}
+            for i, level in enumerate(levels)
+        ]
+        # Out of order on the wire: the newest sample still wins.
+        samples.insert(0, samples.pop())
+        with mock.patch.object(ingest, 'get_engine') as get_engine, CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/readings/batch/', {'readings': samples}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['count'], len(levels))
+        self.assertEqual(self.device.readings.count(), len(levels))
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "dashboard_sensorreading"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(CurrentStatus.objects.get(device=self.device).current_moisture, 24)
+        # Auto mode is evaluated once, against the newest sample.
+        get_engine.return_value.submit.assert_called_once_with(self.device.pk, 24, start + timedelta(seconds=60))
+
+
+class SequenceWindowTests(SimpleTestCase):
+    def test_replays_inside_window(self):
+        window = SequenceWindow()
+        self.assertEqual([window.mark(seq) for seq in [1, 2, 3, 2, 5, 4, 5]], [True] * 3 + [False, True, True, False])
+
+    def test_far_behind_is_duplicate(self):
+        window = SequenceWindow()
+        for seq in range(1, 101):
+            window.mark(seq)
+        self.assertTrue(window.seen(1))
+        self.assertFalse(window.mark(1))
+
+    def test_seq_zero_resets_window(self):
+        # The firmware restarts at 0 on every boot, often well inside the window.
+        window = SequenceWindow()
+        self.assertTrue(all(window.mark(seq) for seq in range(11)))
+        self.assertEqual([window.mark(seq) for seq in range(11)], [True] * 11)
+        self.assertEqual((window.high, window.mask), (10, (1 << 11) - 1))
+
+    def test_large_gap_resets_window(self):
+        window = SequenceWindow()
+        window.mark(RESTART_GAP + 50)
+        self.assertTrue(window.mark(10))
+        self.assertEqual(window.high, 10)
+
+
+class ReadingViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        api_key_cache.clear()
+        dedup.registry.forget()
+        self.user = User.objects.create_user(username='sender', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_D01', api_key='reading-key')
+        CurrentStatus.objects.create(device=self.device)
+        self.client = APIClient()
+        self.client.credentials(HTTP_X_API_KEY='reading-key')
+
+    def post(self, seq, moisture=40):
+        return self.client.post('/api/readings/', {'moisture': moisture, 'seq': seq}, format='json')
+
+    def test_retry_is_ignored(self):
+        self.assertEqual(self.post(3).status_code, 201)
+        response = self.post(3)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['reading_id'])
+        self.assertEqual(self.device.readings.count(), 1)
+
+    def test_duplicate_from_db_cursor(self):
+        # Another worker accepted it: the in-memory fast path knows nothing.
+        self.post(3)
+        dedup.registry.forget()
+        self.assertEqual(self.post(3).status_code, 200)
+        self.assertEqual(self.device.readings.count(), 1)
+
+    def test_reboot_restarts_sequence(self):
+        for seq in range(5):
+            self.assertEqual(self.post(seq).status_code, 201)
+        for seq in range(5):
+            self.assertEqual(self.post(seq).status_code, 201)
+        self.assertEqual(self.device.readings.count(), 10)
+
+
+class WriteBehindBufferTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        dedup.registry.forget()
+        self.user = User.objects.create_user(username='buffered', password='test1234')
+        self.devices = [
+            Device.objects.create(user=self.user, device_id=f'ESP32_WB{i}', api_key=f'buffer-{i}')
+            for i in range(2)
+        ]
+        self.spool_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool_dir)
+
+    def make_buffer(self, **config):
+        # Never started: the tests flush on their own thread.
+        buffer = WriteBehindBuffer({**ingest_buffer.get_config(), 'MAX_ATTEMPTS': 3, **config})
+        if buffer._spool is not None:
+            self.addCleanup(lambda: buffer._spool.close())
+        return buffer
+
+    def test_flush_writes_per_device(self):
+        buffer = self.make_buffer()
+        buffer.submit(self.devices[0], [{'moisture': 40, 'seq': 1}, {'moisture': 41, 'seq': 2}])
+        buffer.submit(self.devices[1], [{'moisture': 50}])
+        self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(buffer.size, 0)
+        self.assertEqual(self.devices[0].readings.count(), 2)
+        self.assertEqual(CurrentStatus.objects.get(device=self.devices[1]).current_moisture, 50)
+
+    def test_failing_device_does_not_block_others(self):
+        buffer = self.make_buffer()
+        bad = self.devices[0]
+        store = ingest.store_readings
+
+        def failing_store(device, samples):
+            if device.pk == bad.pk:
+                raise IntegrityError('device is gone')
+            return store(device, samples)
+
+        buffer.submit(bad, [{'moisture': 40}])
+        buffer.submit(self.devices[1], [{'moisture': 50}])
+        with mock.patch.object(ingest, 'store_readings', failing_store), self.assertLogs('dashboard.ingest_buffer', 'ERROR'):
+            self.assertEqual(buffer.flush(), 1)
+            self.assertEqual(buffer.size, 1)
+            self.assertEqual(self.devices[1].readings.count(), 1)
+            buffer.flush()
+            self.assertEqual(buffer.size, 1)
+            # Third failure: dropped instead of retried forever.
+            buffer.flush()
+        self.assertEqual(buffer.size, 0)
+        self.assertFalse(bad.readings.exists())
+
+    def test_side_effects_run_once_per_commit(self):
+        buffer = self.make_buffer()
+        store = ingest.store_readings
+        calls = []
+
+        def flaky_store(device, samples):
+            if not calls:
+                calls.append(device.pk)
+                raise IntegrityError('transient')
+            return store(device, samples)
+
+        buffer.submit(self.devices[0], [{'moisture': 40, 'seq': 1}])
+        with mock.patch.object(ingest, 'store_readings', flaky_store), \
+                mock.patch.object(ingest, 'after_store') as after_store, \
+                self.assertLogs('dashboard.ingest_buffer', 'ERROR'):
+            self.assertEqual(buffer.flush(), 0)
+            after_store.assert_not_called()
+            self.assertEqual(buffer.flush(), 1)
+        after_store.assert_called_once()
+
+    def test_spool_per_process(self):
+        base = os.path.join(self.spool_dir, 'ingest.spool')
+        buffer = self.make_buffer(SPOOL_PATH=base)
+        buffer.submit(self.devices[0], [{'moisture': 40, 'seq': 1}])
+        with open(f'{base}.{os.getpid()}', encoding='utf-8') as spool:
+            self.assertEqual(len(spool.readlines()), 1)
+        buffer.flush()
+        self.assertEqual(os.path.getsize(f'{base}.{os.getpid()}'), 0)
+
+    def test_adopts_orphaned_spools_only(self):
+        base = os.path.join(self.spool_dir, 'ingest.spool')
+        line = json.dumps({'device': self.devices[0].pk, 'samples': [
+            {'moisture': 33, 'seq': 7, 'timestamp': timezone.now().isoformat()},
+        ]}) + '\n'
+        for path in [f'{base}.1', f'{base}.2', f'{base}.backup']:
+            with open(path, 'w', encoding='utf-8') as spool:
+                spool.write(line)
+        # Worker 2 is still running and holds its lock.
+        live = open(f'{base}.2', encoding='utf-8')
+        self.addCleanup(live.close)
+        fcntl.flock(live.fileno(), fcntl.LOCK_EX)
+
+        buffer = self.make_buffer(SPOOL_PATH=base)
+        self.assertFalse(os.path.exists(f'{base}.1'))
+        self.assertTrue(os.path.exists(f'{base}.2'))
+        self.assertTrue(os.path.exists(f'{base}.backup'))
+        with open(f'{base}.{os.getpid()}', encoding='utf-8') as spool:
+            self.assertEqual(spool.read(), line)
+
+        self.assertEqual(buffer._requeue_recovered(), 1)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(list(self.devices[0].readings.values_list('moisture_level', flat=True)), [33])
+
+    def test_views_answer_202_and_429(self):
+        buffer = self.make_buffer(MAX_ITEMS=1)
+        client = APIClient()
+        client.credentials(HTTP_X_API_KEY='buffer-0')
+        with mock.patch('dashboard.views.get_buffer', return_value=buffer):
+            self.assertEqual(client.post('/api/readings/', {'moisture': 40}, format='json').status_code, 202)
+            full = client.post('/api/readings/', {'moisture': 41}, format='json')
+        self.assertEqual(full.status_code, 429)
+        self.assertEqual(full['Retry-After'], '1')
+
+
+class MetricsViewTests(TestCase):
+    def test_disabled_without_token(self):
+        with self.settings(METRICS={'TOKEN': None}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_requires_token(self):
+        with self.settings(METRICS={'TOKEN': 's3cret'}):
+            self.assertEqual(self.client.get('/metrics').status_code, 401)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 401)
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
+
+
+class AnomalyDetectorTests(TestCase):
+    INTERVAL = 15
+
+    def setUp(self):
+        self.detector = AnomalyDetector(anomaly.get_config())
+        self.rng = random.Random(3)
+
+    def feed(self, state, values, start=0.0, interval=INTERVAL):
+        return [self.detector.observe(state, value, start + i * interval) for i, value in enumerate(values)]
+
+    def warm_state(self):
+        state = SensorState()
+        self.feed(state, [50 + self.rng.gauss(0, 0.3) for _ in range(30)])
+        return state
+
+    def test_spike(self):
+        state = self.warm_state()
+        when = state.last_time + self.INTERVAL
+        self.assertEqual(self.detector.observe(state, 58, when), (SPIKE,))
+        self.assertTrue(state.suspect)
+        # The clipped baseline did not follow the glitch.
+        self.assertEqual(self.detector.observe(state, 50, when + self.INTERVAL), ())
+        self.assertFalse(state.suspect)
+
+    def test_jump(self):
+        state = self.warm_state()
+        self.assertIn(JUMP, self.detector.observe(state, 100, state.last_time + self.INTERVAL))
+        # The same change spread over hours is just irrigation.
+        slow = SensorState()
+        self.assertEqual(self.feed(slow, [40, 52, 64], interval=3600), [(), (), ()])
+
+    def test_stuck_after_elapsed_time(self):
+        state = SensorState()
+        stuck_seconds = self.detector.stuck_seconds
+        flags = self.feed(state, [0.0] * (stuck_seconds // self.INTERVAL + 2))
+        first = next(i for i, kinds in enumerate(flags) if kinds)
+        self.assertEqual(first * self.INTERVAL, stuck_seconds)
+        self.assertEqual(flags[-1], (STUCK,))
+        # Informational only by default: it does not make the sample suspect.
+        self.assertFalse(state.suspect)
+
+    def test_sparse_samples_are_not_stuck(self):
+        state = SensorState()
+        self.assertEqual(self.feed(state, [42.0] * 4, interval=6 * 3600), [()] * 4)
+
+    def test_quantized_drift(self):
+        # Whole-percent readings of a field drying at 0.3 %/h repeat a value for hours.
+        state = SensorState()
+        samples = 10 * 3600 // self.INTERVAL
+        values = [round(45.4 - 0.3 * i * self.INTERVAL / 3600 + self.rng.gauss(0, 0.2)) for i in range(samples)]
+        self.assertEqual([kinds for kinds in self.feed(state, values) if kinds], [])
+        longest = max(len(list(run)) for _, run in itertools.groupby(values))
+        self.assertGreater(longest, self.detector.stuck_samples)
+
+    def stuck_readings(self, device):
+        start = timezone.now()
+        return [
+            SensorReading(device=device, moisture_level=20, timestamp=start + timedelta(seconds=i * self.INTERVAL))
+            for i in range(self.detector.stuck_seconds // self.INTERVAL + 2)
+        ]
+
+    def test_stuck_does_not_suppress_auto_mode(self):
+        user = User.objects.create_user(username='probe', password='test1234')
+        device = Device.objects.create(user=user, device_id='ESP32_A01', api_key='probe-key')
+        stuck = self.stuck_readings(device)
+        flagged, suspect = self.detector.check(device.pk, stuck)
+        self.assertEqual(flagged[-1][1], (STUCK,))
+        self.assertFalse(suspect)
+
+        spike = SensorReading(device=device, moisture_level=28, timestamp=stuck[-1].timestamp + timedelta(seconds=15))
+        with self.assertLogs('dashboard.anomaly', 'WARNING'):
+            _, suspect = self.detector.check(device.pk, [spike])
+        self.assertTrue(suspect)
+
+
+    def test_stuck_suppresses_auto_mode_when_configured(self):
+        user = User.objects.create_user(username='probe', password='test1234')
+        device = Device.objects.create(user=user, device_id='ESP32_A01', api_key='probe-key')
+        self.detector = AnomalyDetector({**anomaly.get_config(), 'SUPPRESS_ON_STUCK': True})
+        stuck = self.stuck_readings(device)
+        with self.assertLogs('dashboard.anomaly', 'WARNING'):
+            flagged, suspect = self.detector.check(device.pk, stuck)
+        self.assertEqual(flagged[-1][1], (STUCK,))
+        self.assertTrue(suspect)
+
+
+class RollupTests(TestCase):
+    BASE = datetime(2026, 1, 5, 10, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='charter', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_H01', api_key='history-key')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def store(self, *points):
+        """
+        (minutes after BASE, moisture) pairs, stored and rolled up like ingest does.
+        """
+        readings = SensorReading.objects.bulk_create(
+            SensorReading(device=self.device, moisture_level=level, timestamp=self.BASE + timedelta(minutes=minutes))
+            for minutes, level in points
+        )
+        apply_readings(self.device, readings)
+        return readings
+
+    def bucket(self, resolution, minutes=0):
+        return ReadingRollup.objects.values_list('count', 'total', 'min_moisture', 'max_moisture').get(
+            device=self.device, resolution=resolution,
+            bucket_start=bucket_start(self.BASE + timedelta(minutes=minutes), resolution),
+        )
+
+    def test_second_batch_merges_into_buckets(self):
+        self.store((0, 40), (0.5, 44))
+        self.store((0.25, 38), (0.75, 50), (30, 45))
+        self.assertEqual(self.bucket('1m'), (4, 172, 38, 50))
+        self.assertEqual(self.bucket('1h'), (5, 217, 38, 50))
+        self.assertEqual(self.bucket('1d'), (5, 217, 38, 50))
+        self.assertEqual(self.bucket('1m', 30), (1, 45, 45, 45))
+
+    def test_backfill_matches_incremental(self):
+        self.store(*((i * 7, 30 + i % 13) for i in range(100)))
+        incremental = set(ReadingRollup.objects.values_list(
+            'resolution', 'bucket_start', 'count', 'total', 'min_moisture', 'max_moisture'
+        ))
+        ReadingRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=StringIO())
+        rebuilt = set(ReadingRollup.objects.values_list(
+            'resolution', 'bucket_start', 'count', 'total', 'min_moisture', 'max_moisture'
+        ))
+        self.assertEqual(rebuilt, incremental)
+
+    def test_choose_resolution(self):
+        start = self.BASE
+        self.assertEqual(choose_resolution(start, start + timedelta(minutes=30), 60), 'raw')
+        self.assertEqual(choose_resolution(start, start + timedelta(hours=1), 60), '1m')
+        self.assertEqual(choose_resolution(start, start + timedelta(days=1), 60), '1m')
+        self.assertEqual(choose_resolution(start, start + timedelta(days=5), 60), '1h')
+        self.assertEqual(choose_resolution(start, start + timedelta(days=90), 60), '1d')
+
+    def history(self, **params):
+        return self.client.get('/api/history/', {key: value.isoformat() if isinstance(value, datetime) else value
+                                                 for key, value in params.items()})
+
+    def test_raw_and_rollup_aggregates_agree(self):
+        self.store(*((i * 11, 20 + (i * 7) % 50) for i in range(40)))
+        window = {'from': self.BASE, 'to': self.BASE + timedelta(hours=8)}
+        raw = self.history(resolution='raw', **window).data['points']
+        hourly = self.history(resolution='1h', **window).data['points']
+
+        expected = {}
+        for point in raw:
+            hour = bucket_start(point['timestamp'], '1h')
+            expected.setdefault(hour, []).append(point['avg'])
+        self.assertEqual(
+            [(p['timestamp'], p['count'], p['min'], p['max']) for p in hourly],
+            [(hour, len(values), min(values), max(values)) for hour, values in sorted(expected.items())],
+        )
+        for point in hourly:
+            self.assertAlmostEqual(point['avg'], sum(expected[point['timestamp']]) / point['count'])
+
+    def test_first_bucket_straddling_from(self):
+        self.store((10, 40), (40, 50), (70, 60))
+        response = self.history(resolution='1h', **{'from': self.BASE + timedelta(minutes=30), 'to': self.BASE + timedelta(hours=3)})
+        points = response.data['points']
+        self.assertEqual([p['timestamp'] for p in points], [self.BASE, self.BASE + timedelta(hours=1)])
+        self.assertEqual(points[0]['count'], 2)
+
+    def test_auto_resolution(self):
+        self.store((0, 40))
+        response = self.history(**{'from': self.BASE, 'to': self.BASE + timedelta(days=5)})
+        self.assertEqual(response.data['resolution'], '1h')
+
+    def test_bad_range_is_rejected(self):
+        self.assertEqual(self.history(**{'from': self.BASE, 'to': self.BASE}).status_code, 400)
+        self.assertEqual(self.history(**{'from': self.BASE + timedelta(hours=1), 'to': self.BASE}).status_code, 400)
+        self.assertEqual(self.history(**{'from': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.history(resolution='5m').status_code, 400)
+
+
+class RetentionTests(TestCase):
+    NOW = datetime(2026, 3, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='keeper', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_R01', api_key='retention-key')
+        self.other = Device.objects.create(user=self.user, device_id='ESP32_R02', api_key='retention-key-2')
+
+    def days_ago(self, days):
+        return self.NOW - timedelta(days=days)
+
+    def test_chunked_delete_respects_cutoff(self):
+        # The readings cutoff is the start of the day 30 days back: 2026-01-30 00:00.
+        SensorReading.objects.bulk_create(
+            SensorReading(device=self.device, moisture_level=days, timestamp=self.days_ago(days))
+            for days in (31, 32, 40, 45, 60, 30.25, 29, 1)
+        )
+        report = dict(retention.prune(now=self.NOW, CHUNK_SIZE=2, ACKED_COMMANDS_DAYS=None))
+        self.assertEqual(report['sensor readings'], 5)
+        self.assertEqual(sorted(SensorReading.objects.values_list('moisture_level', flat=True)), [1, 29, 30.25])
+
+    def test_live_commands_are_never_pruned(self):
+        old = self.days_ago(365)
+        PumpCommand.objects.bulk_create([
+            PumpCommand(device=self.device, action='ON', timestamp=old, status=PumpCommand.QUEUED),
+            PumpCommand(device=self.other, action='ON', timestamp=old, status=PumpCommand.DELIVERED),
+            PumpCommand(device=self.device, action='OFF', timestamp=old, status=PumpCommand.ACKED),
+            PumpCommand(device=self.device, action='OFF', timestamp=old, status=PumpCommand.EXPIRED),
+            PumpCommand(device=self.device, action='OFF', timestamp=old, status=PumpCommand.SUPERSEDED),
+            PumpCommand(device=self.other, action='OFF', timestamp=self.days_ago(1), status=PumpCommand.ACKED),
+        ])
+        report = dict(retention.prune(now=self.NOW, CHUNK_SIZE=1, READINGS_DAYS=None))
+        self.assertEqual(report['finished pump commands'], 3)
+        self.assertEqual(
+            sorted(PumpCommand.objects.values_list('status', flat=True)),
+            sorted([PumpCommand.QUEUED, PumpCommand.DELIVERED, PumpCommand.ACKED]),
+        )
+
+    def test_dry_run_deletes_nothing(self):
+        SensorReading.objects.create(device=self.device, moisture_level=40, timestamp=timezone.now() - timedelta(days=400))
+        PumpCommand.objects.create(device=self.device, action='ON', timestamp=timezone.now() - timedelta(days=400),
+                                   status=PumpCommand.ACKED)
+        out = StringIO()
+        call_command('prune_data', '--dry-run', stdout=out)
+        self.assertIn('Would delete 1 sensor readings', out.getvalue())
+        self.assertIn('Would delete 1 finished pump commands', out.getvalue())
+        self.assertEqual(SensorReading.objects.count(), 1)
+        self.assertEqual(PumpCommand.objects.count(), 1)
+
+
+class BackgroundJobTests(SimpleTestCase):
+    def started(self):
+        with mock.patch.object(jobs, 'start_job') as start_job:
+            jobs.start_background_jobs()
+        return {call.args[0] for call in start_job.call_args_list}
+
+    def test_every_process_flushes_its_own_state(self):
+        with self.settings(RUN_SHARED_JOBS=True):
+            self.assertEqual(self.started(), {'liveness', 'anomaly', 'retention', 'offline', 'outbox'})
+
+    def test_shared_jobs_can_be_disabled(self):
+        with self.settings(RUN_SHARED_JOBS=False):
+            self.assertEqual(self.started(), {'liveness', 'anomaly'})
+
+
+class ExportViewTests(TestCase):
+    BASE = datetime(2026, 2, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='exporter', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_E01', api_key='export-key')
+        SensorReading.objects.bulk_create(
+            SensorReading(device=self.device, moisture_level=40 + i, timestamp=self.BASE + timedelta(hours=i))
+            for i in range(3)
+        )
+        PumpCommand.objects.create(device=self.device, action='ON', triggered_by='auto', timestamp=self.BASE,
+                                   status=PumpCommand.ACKED)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def export(self, path, headers=None, **params):
+        params = {key: value.isoformat() if isinstance(value, datetime) else value for key, value in params.items()}
+        return self.client.get(f'/api/export/{path}', {'device': 'ESP32_E01', **params}, headers=headers)
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response = self.export('readings.csv')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename="readings-ESP32_E01-'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(self.body(response).decode().splitlines(), [
+            'device_id,timestamp,moisture_level',
+            'ESP32_E01,2026-02-01T08:00:00+00:00,40.0',
+            'ESP32_E01,2026-02-01T09:00:00+00:00,41.0',
+            'ESP32_E01,2026-02-01T10:00:00+00:00,42.0',
+        ])
+
+    def test_ndjson(self):
+        response = self.export('commands.ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.body(response).decode().splitlines()]
+        self.assertEqual(rows, [{
+            'device_id': 'ESP32_E01', 'timestamp': '2026-02-01T08:00:00+00:00',
+            'action': 'ON', 'triggered_by': 'auto', 'status': PumpCommand.ACKED,
+        }])
+
+    def test_gzip_when_accepted(self):
+        plain = self.body(self.export('readings.csv'))
+        response = self.export('readings.csv', headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(self.body(response)), plain)
+
+    def test_from_to_filter(self):
+        response = self.export('readings.ndjson', **{'from': self.BASE + timedelta(minutes=30),
+                                                     'to': self.BASE + timedelta(hours=1)})
+        rows = [json.loads(line) for line in self.body(response).decode().splitlines()]
+        self.assertEqual([row['moisture_level'] for row in rows], [41])
+
+    def test_other_users_device_is_not_found(self):
+        stranger = User.objects.create_user(username='stranger', password='test1234')
+        Device.objects.create(user=stranger, device_id='ESP32_E02', api_key='stranger-key')
+        self.assertEqual(self.export('readings.csv', device='ESP32_E02').status_code, 404)
+        self.assertEqual(self.export('readings.xml').status_code, 404)
+
+
+class LivenessTests(TestCase):
+    NOW = datetime(2026, 2, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        principal_cache.clear()
+        self.user = User.objects.create_user(username='watcher', password='test1234')
+        self.devices = [
+            Device.objects.create(user=self.user, device_id=f'ESP32_L0{i}', api_key=f'liveness-key-{i}', expected_interval=10)
+            for i in range(3)
+        ]
+        self.tracker = liveness.LivenessTracker({**liveness.get_config(), 'THROTTLE': 5, 'GRACE_INTERVALS': 3})
+
+    def at(self, seconds):
+        return self.NOW + timedelta(seconds=seconds)
+
+    def test_touch_is_throttled(self):
+        device = self.devices[0]
+        self.tracker.touch(device, now=self.at(0))
+        self.assertEqual(self.tracker.flush(), 1)
+        self.tracker.touch(device, now=self.at(1))
+        self.tracker.touch(device, now=self.at(4.9))
+        self.assertEqual(self.tracker.flush(), 0)
+        self.tracker.touch(device, now=self.at(5))
+        self.assertEqual(self.tracker.flush(), 1)
+        device.refresh_from_db()
+        self.assertEqual(device.last_seen, self.at(5))
+
+    def test_flush_writes_with_bulk_update(self):
+        for i, device in enumerate(self.devices):
+            self.tracker.touch(device, now=self.at(i))
+        with mock.patch.object(Device.objects, 'bulk_update', wraps=Device.objects.bulk_update) as bulk_update, \
+                CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.tracker.flush(), 3)
+        bulk_update.assert_called_once()
+        # One read of who came back online, one batched UPDATE.
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            list(Device.objects.order_by('device_id').values_list('last_seen', 'stale_at', 'is_online')),
+            [(self.at(i), self.at(i + 30), True) for i in range(3)],
+        )
+
+    def test_detect_offline_after_stale_at(self):
+        for device in self.devices[:2]:
+            self.tracker.touch(device, now=self.at(0))
+        self.tracker.touch(self.devices[2], now=self.at(20))
+        self.tracker.flush()
+
+        self.assertEqual(liveness.detect_offline(now=self.at(30)), 0)
+        self.assertEqual(liveness.detect_offline(now=self.at(31), batch_size=1), 2)
+        self.assertEqual(
+            list(Device.objects.order_by('device_id').values_list('is_online', flat=True)),
+            [False, False, True],
+        )
+        self.assertEqual(liveness.detect_offline(now=self.at(31)), 0)
+
+    def test_fleet_health_counts(self):
+        self.tracker.touch(self.devices[0], now=timezone.now())
+        self.tracker.touch(self.devices[1], now=timezone.now() - timedelta(minutes=10))
+        self.tracker.flush()
+        liveness.detect_offline()
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = client.get('/api/fleet/health/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {key: response.data[key] for key in ('total', 'online', 'offline', 'never_seen')},
+            {'total': 3, 'online': 1, 'offline': 1, 'never_seen': 1},
+        )
+        self.assertEqual([row['device_id'] for row in response.data['offline_devices']], ['ESP32_L01'])
+
+
+class InsightsTests(TestCase):
+    BASE = datetime(2026, 2, 1, 8, 0, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='analyst', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_I01', api_key='insights-key')
+        # Dry at 30% until the pump has run, 50% from 15 minutes on.
+        SensorReading.objects.bulk_create(
+            SensorReading(device=self.device, moisture_level=30 if minute < 15 else 50,
+                          timestamp=self.BASE + timedelta(minutes=minute))
+            for minute in range(61)
+        )
+        PumpCommand.objects.create(device=self.device, action='ON', timestamp=self.BASE + timedelta(minutes=5),
+                                   status=PumpCommand.ACKED)
+        self.off = PumpCommand.objects.create(device=self.device, action='OFF', timestamp=self.BASE + timedelta(minutes=8),
+                                              status=PumpCommand.SUPERSEDED)
+
+    def irrigation(self):
+        insights = analytics.compute([self.device], self.BASE, self.BASE + timedelta(hours=1))
+        return insights[self.device.pk]['irrigation']
+
+    def test_coalesced_command_does_not_create_a_run(self):
+        self.assertEqual(self.irrigation()['events'], 0)
+
+        PumpCommand.objects.filter(pk=self.off.pk).update(status=PumpCommand.ACKED)
+        irrigation = self.irrigation()
+        self.assertEqual(irrigation['events'], 1)
+        self.assertEqual(irrigation['last_gain'], 20)
+
+
+class CommandOutboxTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        api_key_cache.clear()
+        self.user = User.objects.create_user(username='operator', password='test1234')
+        self.device = Device.objects.create(user=self.user, device_id='ESP32_O01', api_key='outbox-key')
+        CurrentStatus.objects.create(device=self.device)
+
+    def status(self, command):
+        return PumpCommand.objects.values_list('status', flat=True).get(pk=command.pk)
+
+    def test_enqueue_supersedes_the_live_command(self):
+        first = outbox.enqueue(self.device.pk, 'ON', 'manual')
+        outbox.next_command(self.device)
+        second = outbox.enqueue(self.device.pk, 'OFF', 'manual')
+        third = outbox.enqueue(self.device.pk, 'ON', 'auto')
+        self.assertEqual(self.status(first), PumpCommand.SUPERSEDED)
+        self.assertEqual(self.status(second), PumpCommand.SUPERSEDED)
+        self.assertEqual(self.status(third), PumpCommand.QUEUED)
+        self.assertEqual(outbox.next_command(self.device), third)
+
+    def test_expire_overdue(self):
+        command = outbox.enqueue(self.device.pk, 'ON', 'manual', ttl=60)
+        forever = outbox.enqueue(
+            Device.objects.create(user=self.user, device_id='ESP32_O02', api_key='outbox-key-2').pk, 'ON', 'manual', ttl=0,
+        )
+        self.assertEqual(outbox.expire_overdue(now=timezone.now() + timedelta(seconds=30)), 0)
+        self.assertEqual(outbox.expire_overdue(now=timezone.now() + timedelta(seconds=61)), 1)
+        self.assertEqual(self.status(command), PumpCommand.EXPIRED)
+        self.assertEqual(self.status(forever), PumpCommand.QUEUED)
+
+    def test_poll_expires_overdue_command(self):
+        command = outbox.enqueue(self.device.pk, 'ON', 'manual', ttl=60)
+        self.assertIsNone(outbox.next_command(self.device, now=timezone.now() + timedelta(seconds=61)))
+        self.assertEqual(self.status(command), PumpCommand.EXPIRED)
+
+    def test_reading_acks_delivered_command(self):
+        command = outbox.enqueue(self.device.pk, 'ON', 'manual')
+        self.assertEqual(outbox.next_command(self.device), command)
+        self.assertEqual(self.status(command), PumpCommand.DELIVERED)
+
+        client = APIClient()
+        client.credentials(HTTP_X_API_KEY='outbox-key')
+        response = client.post('/api/readings/', {'moisture': 40, 'ack_command_ids': [command.pk]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        command.refresh_from_db()
+        self.assertEqual(command.status, PumpCommand.ACKED)
+        self.assertIsNotNone(command.acked_at)
+        self.assertIsNone(outbox.next_command(self.device))
+
+
+class CommandOutboxMigrationTests(TransactionTestCase):
+    before = [('dashboard', '0009_sensorhealth')]
+    after = [('dashboard', '0010_command_outbox')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes('dashboard'))
+
+    def test_newest_pending_command_stays_queued(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        apps = executor.loader.project_state(self.before).apps
+        Device, PumpCommand = apps.get_model('dashboard', 'Device'), apps.get_model('dashboard', 'PumpCommand')
+        user = apps.get_model('auth', 'User').objects.create(username='legacy')
+        pending = Device.objects.create(user_id=user.pk, device_id='ESP32_M01', api_key='legacy-key-1')
+        settled = Device.objects.create(user_id=user.pk, device_id='ESP32_M02', api_key='legacy-key-2')
+        ids = {
+            name: PumpCommand.objects.create(device=device, action='ON', acknowledged=acknowledged).pk
+            for name, device, acknowledged in [
+                ('old', pending, False), ('acked', pending, True), ('newest', pending, False),
+                ('stale', settled, False), ('done', settled, True),
+            ]
+        }
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.after)
+        apps = executor.loader.project_state(self.after).apps
+        statuses = dict(apps.get_model('dashboard', 'PumpCommand').objects.values_list('pk', 'status'))
+        self.assertEqual({name: statuses[pk] for name, pk in ids.items()}, {
+            'old': 'superseded', 'acked': 'acked', 'newest': 'queued', 'stale': 'superseded', 'done': 'acked',
+        })
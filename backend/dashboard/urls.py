@@ -5,8 +5,17 @@ urlpatterns = [
     path('me/', views.MeView.as_view(), name='me'),
     path('status/', views.StatusView.as_view(), name='status'),
     path('status/esp/', views.StatusViewEsp.as_view(), name='status-esp'),
+    path('status/esp/wait/', views.StatusWaitView.as_view(), name='status-esp-wait'),
+    path('status/stream/', views.StatusStreamView.as_view(), name='status-stream'),
+    path('history/', views.HistoryView.as_view(), name='history'),
+    path('fleet/', views.FleetView.as_view(), name='fleet'),
+    path('fleet/health/', views.FleetHealthView.as_view(), name='fleet_health'),
+    path('insights/', views.InsightsView.as_view(), name='insights'),
+    path('export/<slug:kind>.<slug:fmt>', views.ExportView.as_view(), name='export'),
+    path('commands/next/', views.NextCommandView.as_view(), name='next_command'),
     path('update/', views.UpdatePumpView.as_view(), name='update_pump'),
     path('readings/', views.ReadingView.as_view(), name='readings'),
+    path('readings/batch/', views.ReadingBatchView.as_view(), name='readings_batch'),
     path('auto/', views.AutoModeView.as_view(), name='auto_mode'),  # New
     path('users/', views.UserCreateView.as_view(), name='create_user'),
     path('devices/', views.DeviceCreateView.as_view(), name='create_device'),
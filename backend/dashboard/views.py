@@ -1,17 +1,43 @@
+import asyncio
+import hmac
+import json
+import logging
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views import View
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import status, exceptions
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
+from django.conf import settings
 from django.db import transaction
-from .models import User, Device, SensorReading, PumpCommand, CurrentStatus
+from django.db.models import Count, Q
+from datetime import timedelta
+from .models import User, Device, SensorReading, PumpCommand, CurrentStatus, ReadingRollup
 from .serializer import (
     UserSerializer, DeviceSerializer, SensorReadingSerializer, 
     PumpCommandSerializer, 
-    ReadingInputSerializer, PumpUpdateSerializer, AutoModeSerializer
+    ReadingInputSerializer, ReadingBatchInputSerializer, PumpUpdateSerializer, AutoModeSerializer,
+    HistoryQuerySerializer, ExportQuerySerializer, FleetQuerySerializer, InsightsQuerySerializer,
+    NextCommandQuerySerializer
 )
-from rest_framework_simplejwt.authentication import JWTAuthentication
-from .authentication import DeviceAPIKeyAuthentication  # Custom auth for ESP API keys
+from .ingest import record_readings
+from .ingest_buffer import get_buffer, BufferFull
+from . import status_cache, status_builder, pubsub, outbox
+from .rollups import bucket_start, choose_resolution, summarize
+from .parsers import TelemetryFrame, TelemetryFrameParser
+from . import metrics, analytics
+from .export import EXPORTS, FORMATS, ENCODERS, export_rows, gzip_chunks, iterate_in_thread
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .authentication import DeviceAPIKeyAuthentication, CachedJWTAuthentication, active_device_of  # Custom auth for ESP API keys
+
+
+logger = logging.getLogger(__name__)
+
 
 class AutoModeView(APIView):
     """
@@ -25,7 +51,7 @@ class AutoModeView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            device = Device.objects.filter(user=request.user, is_active=True).first()
+            device = active_device_of(request.user)
             if not device:
                 return Response({'message': 'No active device found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -35,14 +61,15 @@ class AutoModeView(APIView):
             current_status, _ = CurrentStatus.objects.get_or_create(device=device)
             current_status.auto_mode = enabled
             current_status.save()
+            status_cache.update_snapshot(device.pk, is_auto_mode=enabled)
 
             return Response({
                 'message': f'Auto mode {"enabled" if enabled else "disabled"}',
                 'is_auto_mode': enabled
             }, status=status.HTTP_200_OK)
 
-        except Exception as e:
-            print(f"Error in AutoModeView: {e}")
+        except Exception:
+            logger.exception("Error in AutoModeView")
             return Response({'message': 'Failed to update auto mode'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 class MeView(APIView):
@@ -61,98 +88,427 @@ class StatusView(APIView):
     GET /api/status/ - Dashboard status for user (JWT) or ESP poll (API key).
     - If JWT: Returns user's device status with history/actions.
     - If API key: Returns device's latest moisture, pump status, and pending commands (for ESP sync).
-    Assumes one active device per user.
+    Assumes one active device per user. Built by status_builder from values_list
+    rows in a fixed number of queries, without writes or serializers.
     """
-    authentication_classes = [DeviceAPIKeyAuthentication, JWTAuthentication]  # Supports both JWT and API key
+    authentication_classes = [DeviceAPIKeyAuthentication, CachedJWTAuthentication]  # Supports both JWT and API key
     permission_classes = []
 
     def get(self, request):
         try:
-            device = None
+            base_data = None
             is_device_request = hasattr(request.user, 'name') and not hasattr(request.user, 'username')
-            print(request.user)
 
             if hasattr(request.user, 'is_authenticated') and request.user.is_authenticated and hasattr(request.user, 'username'):
-                
-                device = Device.objects.filter(user=request.user, is_active=True).first()
-                print(device)
+                active = active_device_of(request.user)
+                if active is not None:
+                    base_data = status_builder.load_status(active, actions=True)
             elif is_device_request:
-                device = request.user
+                base_data = status_builder.load_status(request.user, pending=True)
 
-            if not device:
+            if not base_data:
                 return Response({'message': 'No active device found'}, status=status.HTTP_404_NOT_FOUND)
 
-            
-            current_status, _ = CurrentStatus.objects.get_or_create(device=device)
-
-            latest_reading = device.readings.order_by('-timestamp').first()
-
-            base_data = {
-                'soil_moisture': latest_reading.moisture_level if latest_reading else current_status.current_moisture,
-                'motor_status': current_status.pump_status,
-                'is_auto_mode': current_status.auto_mode,  
-                'timestamp': latest_reading.timestamp if latest_reading else current_status.last_updated,
-                'history': SensorReadingSerializer(device.readings.order_by('-timestamp')[:10], many=True).data,
-            }
-
-            
-            if hasattr(request.user, 'username'):  
-                base_data['actions'] = PumpCommandSerializer(device.commands.order_by('-timestamp')[:10], many=True).data
-                return Response(base_data, status=status.HTTP_200_OK)
-
-            
-            pending_commands = device.commands.filter(acknowledged=False).order_by('-timestamp')[:5]  
-            base_data['pending_commands'] = PumpCommandSerializer(pending_commands, many=True).data
-            base_data['actions'] = []  
+            if is_device_request:
+                base_data['actions'] = []
 
             return Response(base_data, status=status.HTTP_200_OK)
 
-        except Exception as e:
-            print(f"Error in StatusView: {e}")  
+        except Exception:
+            logger.exception("Error in StatusView")
             return Response({'message': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
 class StatusViewEsp(APIView):
     """
-    GET /api/status/ - Dashboard status for user (JWT) or ESP poll (API key).
-    - If JWT: Returns user's device status with history/actions.
-    - If API key: Returns device's latest moisture, pump status, and pending commands (for ESP sync).
-    Assumes one active device per user.
+    GET /api/status/esp/ - Lightweight status for ESP polls (API key) or the dashboard (JWT).
+    Served from the write-through status cache; the DB is only hit on a cache miss.
+    Sends an ETag so an unchanged poll can be answered with 304 and no body.
     """
-    authentication_classes = [DeviceAPIKeyAuthentication, JWTAuthentication]  # Supports both JWT and API key
+    authentication_classes = [DeviceAPIKeyAuthentication, CachedJWTAuthentication]  # Supports both JWT and API key
     permission_classes = []
 
     def get(self, request):
         try:
             device = None
             is_device_request = hasattr(request.user, 'name') and not hasattr(request.user, 'username')
-            print(request.user)
 
             if hasattr(request.user, 'is_authenticated') and request.user.is_authenticated and hasattr(request.user, 'username'):
-                
-                device = Device.objects.filter(user=request.user, is_active=True).first()
-                print(device)
+                device = active_device_of(request.user)
             elif is_device_request:
                 device = request.user
 
             if not device:
                 return Response({'message': 'No active device found'}, status=status.HTTP_404_NOT_FOUND)
 
-            
-            current_status, _ = CurrentStatus.objects.get_or_create(device=device)
+            entry = status_cache.get_or_build_snapshot(device)
 
-            latest_reading = device.readings.order_by('-timestamp').first()
+            headers = {'ETag': entry['etag']}
+            if request.headers.get('If-None-Match') == entry['etag']:
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
-            base_data = {
-                'soil_moisture': latest_reading.moisture_level if latest_reading else current_status.current_moisture,
-                'motor_status': current_status.pump_status,
-                'is_auto_mode': current_status.auto_mode,  
-                'timestamp': latest_reading.timestamp if latest_reading else current_status.last_updated,
-            } 
+            return Response(entry['data'], status=status.HTTP_200_OK, headers=headers)
 
-            return Response(base_data, status=status.HTTP_200_OK)
+        except Exception:
+            logger.exception("Error in StatusViewEsp")
+            return Response({'message': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class HistoryView(APIView):
+    """
+    GET /api/history/?from=&to=&resolution=auto - Moisture history for charts (JWT).
+    Served from the rollup tables; 'auto' picks the coarsest bucket that still
+    gives HISTORY_MIN_POINTS points over the range, falling back to raw readings.
+    Defaults to the last 24 hours.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = HistoryQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        device = active_device_of(request.user)
+        if not device:
+            return Response({'message': 'No active device found'}, status=status.HTTP_404_NOT_FOUND)
+
+        end = serializer.validated_data.get('to') or timezone.now()
+        start = serializer.validated_data.get('from') or end - timedelta(days=1)
+        if start >= end:
+            return Response({'message': "'from' must be before 'to'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        resolution = serializer.validated_data['resolution']
+        if resolution == 'auto':
+            resolution = choose_resolution(start, end, getattr(settings, 'HISTORY_MIN_POINTS', 60))
+        max_points = getattr(settings, 'HISTORY_MAX_POINTS', 5000)
+
+        if resolution == 'raw':
+            rows = (
+                device.readings.filter(timestamp__gte=start, timestamp__lte=end)
+                .order_by('-timestamp')
+                .values_list('timestamp', 'moisture_level')[:max_points]
+            )
+            points = [
+                {'timestamp': ts, 'avg': value, 'min': value, 'max': value, 'count': 1}
+                for ts, value in reversed(rows)
+            ]
+        else:
+            rows = (
+                ReadingRollup.objects.filter(
+                    # Floored, so the bucket that straddles 'from' is not dropped.
+                    device=device, resolution=resolution,
+                    bucket_start__gte=bucket_start(start, resolution), bucket_start__lte=end,
+                )
+                .order_by('-bucket_start')
+                .values_list('bucket_start', 'count', 'total', 'min_moisture', 'max_moisture')[:max_points]
+            )
+            points = [
+                {'timestamp': ts, 'avg': total / count, 'min': low, 'max': high, 'count': count}
+                for ts, count, total, low, high in reversed(rows)
+            ]
+
+        return Response({
+            'resolution': resolution,
+            'from': start,
+            'to': end,
+            'points': points,
+        }, status=status.HTTP_200_OK)
+
+
+class FleetView(APIView):
+    """
+    GET /api/fleet/?after=<device id>&limit=50 - Status of all the user's devices (JWT).
+    Current snapshot, last-seen age and 24h min/avg/max moisture per device,
+    in two queries per page whatever the number of devices. Pass the returned
+    'next' as ?after= for the following page; it is null on the last one.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = FleetQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        limit = serializer.validated_data['limit']
+
+        # One extra row tells whether another page follows.
+        devices = list(status_builder.fleet_queryset(request.user, serializer.validated_data.get('after'))[:limit + 1])
+        has_more = len(devices) > limit
+        devices = devices[:limit]
+
+        now = timezone.now()
+        stats = summarize([device.id for device in devices], now - timedelta(hours=24)) if devices else {}
+        return Response({
+            'devices': [status_builder.build_fleet_entry(device, stats.get(device.id), now) for device in devices],
+            'next': devices[-1].id if has_more else None,
+        }, status=status.HTTP_200_OK)
+
+
+class FleetHealthView(APIView):
+    """
+    GET /api/fleet/health/ - Online/offline counts and the most recently lost
+    devices (JWT). Superusers see the whole fleet. Reads the liveness columns
+    kept by dashboard.liveness, so it never touches the readings table.
+    """
+    permission_classes = [IsAuthenticated]
+    offline_list_size = 100
+
+    def get(self, request):
+        devices = Device.objects.all() if request.user.is_superuser else Device.objects.filter(user=request.user)
+        counts = devices.aggregate(
+            total=Count('id'),
+            online=Count('id', filter=Q(is_online=True)),
+            never_seen=Count('id', filter=Q(last_seen__isnull=True)),
+        )
+        offline = (
+            devices.filter(is_online=False, last_seen__isnull=False)
+            .order_by('-last_seen')
+            .values('id', 'device_id', 'name', 'last_seen', 'expected_interval')[:self.offline_list_size]
+        )
+        now = timezone.now()
+        return Response({
+            'total': counts['total'],
+            'online': counts['online'],
+            'offline': counts['total'] - counts['online'] - counts['never_seen'],
+            'never_seen': counts['never_seen'],
+            'offline_devices': [
+                {**row, 'offline_seconds': (now - row['last_seen']).total_seconds()} for row in offline
+            ],
+        }, status=status.HTTP_200_OK)
+
+
+class InsightsView(APIView):
+    """
+    GET /api/insights/?device=&hours=48 - Drying rate, irrigation efficacy and
+    time-to-dry forecast per device (JWT), computed by dashboard.analytics over
+    the last `hours` of readings. Superusers may pick any device, everyone else
+    only their own.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        serializer = InsightsQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        devices = Device.objects.all() if request.user.is_superuser else Device.objects.filter(user=request.user)
+        device_id = serializer.validated_data.get('device')
+        if device_id:
+            devices = devices.filter(device_id=device_id)
+        elif request.user.is_superuser:
+            devices = devices.filter(user=request.user)
+        devices = list(devices.order_by('id').only('id', 'device_id', 'name'))
+        if not devices:
+            return Response({'message': 'No device found'}, status=status.HTTP_404_NOT_FOUND)
+
+        config = analytics.get_config()
+        end = timezone.now()
+        start = end - timedelta(hours=serializer.validated_data.get('hours') or config['WINDOW_HOURS'])
+        insights = analytics.compute(devices, start, end, config)
+        return Response({
+            'from': start,
+            'to': end,
+            'devices': [
+                {'id': device.id, 'device_id': device.device_id, 'name': device.name, **insights[device.id]}
+                for device in devices
+            ],
+        }, status=status.HTTP_200_OK)
+
+
+class ExportView(APIView):
+    """
+    GET /api/export/<readings|commands>.<csv|ndjson>?device=&from=&to= - Raw history download (JWT).
+    Streams rows straight from the database, so memory stays flat for any range;
+    gzip-compressed on the fly when the client sends Accept-Encoding: gzip.
+    Superusers may export any device, everyone else only their own.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, kind, fmt):
+        if kind not in EXPORTS or fmt not in FORMATS:
+            return Response({'message': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
 
-        except Exception as e:
-            print(f"Error in StatusView: {e}")  
+        serializer = ExportQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        start = serializer.validated_data.get('from')
+        end = serializer.validated_data.get('to')
+        if start and end and start >= end:
+            return Response({'message': "'from' must be before 'to'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        devices = Device.objects.all() if request.user.is_superuser else Device.objects.filter(user=request.user)
+        device_id = serializer.validated_data.get('device')
+        if device_id:
+            devices = devices.filter(device_id=device_id)
+        devices = list(devices.only('id', 'device_id'))
+        if not devices:
+            return Response({'message': 'No device found'}, status=status.HTTP_404_NOT_FOUND)
+
+        chunks = ENCODERS[fmt](kind, export_rows(kind, devices, start, end))
+        compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+        if compress:
+            chunks = gzip_chunks(chunks)
+        if isinstance(request._request, ASGIRequest):
+            chunks = iterate_in_thread(chunks)
+
+        response = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+        response['Content-Disposition'] = (
+            f'attachment; filename="{kind}-{device_id or "all"}-{timezone.now():%Y%m%d}.{fmt}"'
+        )
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+
+class StatusStreamView(View):
+    """
+    GET /api/status/stream/ - Server-sent events with the user's device status (JWT).
+    Sends the full snapshot first, then 'status', 'readings' and 'action' deltas
+    as ReadingView, UpdatePumpView and AutoModeView publish them.
+    EventSource cannot set headers, so the token may also be passed as ?token=.
+    Needs the ASGI entry point (backend.asgi): under WSGI Django would drain the
+    endless stream into memory before sending anything, pinning a worker thread
+    per open dashboard, so it answers 503 and the dashboard falls back to polling.
+    """
+    heartbeat_seconds = 15
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({'message': 'Live updates need the ASGI server; poll /api/status/ instead'}, status=503)
+
+        device = await sync_to_async(self._resolve_device)(request)
+        if device is None:
+            return JsonResponse({'message': 'Authentication required or no active device found'}, status=401)
+
+        response = StreamingHttpResponse(self._events(device), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+        return response
+
+    def _resolve_device(self, request):
+        header = request.headers.get('Authorization', '')
+        raw_token = header.split(' ', 1)[1] if header.startswith('Bearer ') else request.GET.get('token')
+        if not raw_token:
+            return None
+
+        authenticator = CachedJWTAuthentication()
+        try:
+            user = authenticator.get_user(authenticator.get_validated_token(raw_token))
+        except (InvalidToken, TokenError, exceptions.AuthenticationFailed):
+            return None
+        return active_device_of(user)
+
+    def _format(self, event_type, data):
+        return f"event: {event_type}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+    async def _events(self, device):
+        # Subscribe before reading the snapshot so no change falls in between.
+        subscription = pubsub.broker.subscribe(device.pk)
+        try:
+            entry = await sync_to_async(status_cache.get_or_build_snapshot)(device)
+            yield self._format('status', entry['data'])
+            while True:
+                event = await subscription.get(timeout=self.heartbeat_seconds)
+                if event is None:
+                    yield ': ping\n\n'
+                    continue
+                yield self._format(event['type'], event['data'])
+        finally:
+            subscription.close()
+
+
+class StatusWaitView(View):
+    """
+    GET /api/status/esp/wait/?since=<command_id>&timeout=<seconds> - Long-poll for the ESP (API key).
+    Returns the status snapshot plus the device's effective command (see
+    dashboard.outbox) as soon as one newer than `since` exists, or 204 when none
+    arrives before the timeout; `since` acknowledges the command it names.
+    Without `since` it answers immediately with the live command, if any.
+    Holds the connection for `timeout` seconds, so the firmware only uses it
+    when built with USE_LONG_POLL against the ASGI server.
+    Parked requests only hold a pub/sub subscription on the event loop, not a thread.
+    """
+
+    async def get(self, request):
+        try:
+            device, _ = await sync_to_async(DeviceAPIKeyAuthentication().authenticate)(request) or (None, None)
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse({'detail': str(e.detail)}, status=403)
+        if device is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+        try:
+            since = int(request.GET['since']) if 'since' in request.GET else None
+            timeout = float(request.GET.get('timeout', settings.LONG_POLL_MAX_TIMEOUT))
+        except ValueError:
+            return JsonResponse({'message': "'since' and 'timeout' must be numbers"}, status=400)
+        timeout = max(0.0, min(timeout, settings.LONG_POLL_MAX_TIMEOUT))
+
+        # Subscribe before checking the DB so a command created in between is not missed.
+        subscription = pubsub.broker.subscribe(device.pk, maxsize=10)
+        try:
+            command = await sync_to_async(self._next_command)(device, since)
+            if command is None and since is not None:
+                await self._wait_for_command(subscription, since, timeout)
+                # Re-read even on timeout: a burst of toggles is coalesced to its final
+                # command, and one created by another worker never reaches our pub/sub.
+                command = await sync_to_async(self._next_command)(device, since)
+        finally:
+            subscription.close()
+
+        if command is None and since is not None:
+            return HttpResponse(status=204)
+
+        entry = await sync_to_async(status_cache.get_or_build_snapshot)(device)
+        data = dict(entry['data'])
+        if command is not None:
+            # The command is newer than any snapshot written alongside it.
+            data['motor_status'] = command['action'] == 'ON'
+        data['command'] = command
+        return JsonResponse(data, encoder=DjangoJSONEncoder)
+
+    def _next_command(self, device, since):
+        # Only a live command may override motor_status; an expired or superseded
+        # one is not the device's intent any more.
+        command = outbox.next_command(device, after=since)
+        return PumpCommandSerializer(command).data if command else None
+
+    async def _wait_for_command(self, subscription, since, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return None
+            event = await subscription.get(timeout=remaining)
+            if event is None:
+                return None
+            if event['type'] == 'action' and event['data']['id'] > since:
+                return event['data']
+
+
+class NextCommandView(APIView):
+    """
+    GET /api/commands/next/?after=<command_id> - Outbox cursor for the ESP (API key).
+    Returns the single command the device should execute next, or 204 when there
+    is none. `after` names the last command the device executed and acknowledges
+    it, so the firmware needs no separate ack.
+    """
+    authentication_classes = [DeviceAPIKeyAuthentication]
+    permission_classes = []
+
+    def get(self, request):
+        serializer = NextCommandQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            command = outbox.next_command(request.user, after=serializer.validated_data.get('after'))
+            if command is None:
+                return Response(status=status.HTTP_204_NO_CONTENT)
+            return Response(PumpCommandSerializer(command).data, status=status.HTTP_200_OK)
+
+        except Exception:
+            logger.exception("Error in NextCommandView")
             return Response({'message': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -169,7 +525,7 @@ class UpdatePumpView(APIView):
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            device = Device.objects.filter(user=request.user, is_active=True).first()
+            device = active_device_of(request.user)
             if not device:
                 return Response({'message': 'No active device found'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -177,19 +533,14 @@ class UpdatePumpView(APIView):
             action = 'ON' if pump_state else 'OFF'
 
             
-            command = PumpCommand.objects.create(
-                device=device,
-                action=action,
-                triggered_by='manual',
-                acknowledged=False  
-            )
+            command = outbox.enqueue(device.pk, action, 'manual')
 
           
             current_status, _ = CurrentStatus.objects.get_or_create(device=device)
             current_status.pump_status = pump_state
             current_status.last_updated = timezone.now()
             current_status.save()
-
+            status_cache.update_snapshot(device.pk, motor_status=pump_state)
 
             return Response({
                 'message': f'Pump turned {action}',
@@ -197,12 +548,25 @@ class UpdatePumpView(APIView):
                 'timestamp': command.timestamp
             }, status=status.HTTP_200_OK)
 
-        except Exception as e:
-            print(f"Error in UpdatePumpView: {e}")  # Debugging
+        except Exception:
+            logger.exception("Error in UpdatePumpView")
             return Response({'message': 'Failed to update pump'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
 
+def queue_readings(buffer, device, samples):
+    """
+    Hand samples to the write-behind buffer: 202 once queued, 429 when it is full.
+    """
+    try:
+        buffer.submit(device, samples)
+    except BufferFull:
+        response = Response({'message': 'Ingest buffer full, retry later'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(buffer.config['RETRY_AFTER'])
+        return response
+    return Response({'message': 'Readings queued', 'count': len(samples)}, status=status.HTTP_202_ACCEPTED)
+
+
 class ReadingView(APIView):
     """
     POST /api/readings/ - ESP sends moisture data (API key required).
@@ -219,55 +583,75 @@ class ReadingView(APIView):
 
         try:
             device = request.user  
-            moisture = serializer.validated_data['moisture']
+            sample = {'moisture': serializer.validated_data['moisture']}
+            if 'seq' in serializer.validated_data:
+                sample['seq'] = serializer.validated_data['seq']
 
-            # Create reading
-            reading = SensorReading.objects.create(
-                device=device,
-                moisture_level=moisture,
-                timestamp=timezone.now()
-            )
+            if 'ack_command_ids' in serializer.validated_data:
+                outbox.acknowledge(device, serializer.validated_data['ack_command_ids'])
 
-            # Update current status
-            current_status, _ = CurrentStatus.objects.get_or_create(device=device)
-            current_status.current_moisture = moisture
-            current_status.last_updated = timezone.now()
-            current_status.save()
+            buffer = get_buffer()
+            if buffer is not None:
+                return queue_readings(buffer, device, [sample])
 
-            # Auto-trigger logic if enabled
-            if current_status.auto_mode:
-                if moisture < 30 and not current_status.pump_status:
-                    command = PumpCommand.objects.create(
-                        device=device,
-                        action='ON',
-                        triggered_by='auto',
-                        acknowledged=False
-                    )
-                    current_status.pump_status = True
-                    current_status.save()
-                    print(f"Auto-triggered pump ON due to low moisture: {moisture}%")  # Logging
-                elif moisture > 60 and current_status.pump_status:
-                    command = PumpCommand.objects.create(
-                        device=device,
-                        action='OFF',
-                        triggered_by='auto',
-                        acknowledged=False
-                    )
-                    current_status.pump_status = False
-                    current_status.save()
-                    print(f"Auto-triggered pump OFF due to high moisture: {moisture}%")  # Logging
+            # Create reading, update current status and run auto mode
+            readings = record_readings(device, [sample])
 
-            if 'ack_command_ids' in serializer.validated_data:
-                command_ids = serializer.validated_data['ack_command_ids']
-                PumpCommand.objects.filter(id__in=command_ids, device=device).update(acknowledged=True)
+            if not readings:
+                # A retry of a reading we already stored.
+                return Response({'message': 'Duplicate reading ignored', 'reading_id': None}, status=status.HTTP_200_OK)
 
-            return Response({'message': 'Reading recorded', 'reading_id': reading.id}, status=status.HTTP_201_CREATED)
+            return Response({'message': 'Reading recorded', 'reading_id': readings[0].id}, status=status.HTTP_201_CREATED)
 
-        except Exception as e:
-            print(f"Error in ReadingView: {e}")  # Debugging
+        except Exception:
+            logger.exception("Error in ReadingView")
             return Response({'message': 'Failed to record reading'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ReadingBatchView(APIView):
+    """
+    POST /api/readings/batch/ - ESP flushes buffered moisture samples (API key required).
+    All samples are inserted at once; status and auto mode follow the newest sample.
+    Accepts JSON or the compact binary frame (application/vnd.agri.telemetry),
+    which is validated by its parser and skips the serializer entirely.
+    """
+    authentication_classes = [DeviceAPIKeyAuthentication]
+    permission_classes = []
+    parser_classes = [JSONParser, TelemetryFrameParser]
+
+    def post(self, request):
+        if isinstance(request.data, TelemetryFrame):
+            samples, ack_command_ids = request.data.readings, None
+        else:
+            serializer = ReadingBatchInputSerializer(data=request.data)
+            if not serializer.is_valid():
+                return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            samples = serializer.validated_data['readings']
+            ack_command_ids = serializer.validated_data.get('ack_command_ids')
+
+        try:
+            device = request.user
+            if ack_command_ids:
+                outbox.acknowledge(device, ack_command_ids)
+
+            buffer = get_buffer()
+            if buffer is not None:
+                return queue_readings(buffer, device, samples)
+
+            readings = record_readings(device, samples)
+
+            return Response({
+                'message': 'Readings recorded',
+                'count': len(readings),
+                'duplicates': len(samples) - len(readings),
+                'reading_ids': [reading.id for reading in readings],
+            }, status=status.HTTP_201_CREATED)
+
+        except Exception:
+            logger.exception("Error in ReadingBatchView")
+            return Response({'message': 'Failed to record readings'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
 class UserCreateView(APIView):
     """
     POST /api/users/ - Admin creates user (no manual registration).
@@ -293,7 +677,7 @@ class UserCreateView(APIView):
             if user_serializer.is_valid():
                 user = user_serializer.save()
             else:
-                print(user_serializer.errors)  # Debugging
+                logger.info("Rejected user creation: %s", user_serializer.errors)
                 return Response(user_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
             device_data = {
@@ -334,4 +718,20 @@ class DeviceCreateView(APIView):
                 'message': 'Device created successfully',
                 'device_id': device.id
             }, status=status.HTTP_201_CREATED)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class MetricsView(View):
+    """
+    GET /metrics - Request metrics in Prometheus text format (see MetricsMiddleware).
+    Requires "Authorization: Bearer <METRICS_TOKEN>"; without a configured token
+    it is disabled (403), since it exposes per-route traffic and latency.
+    """
+
+    def get(self, request):
+        token = metrics.get_config()['TOKEN']
+        if not token:
+            return HttpResponse('Set METRICS_TOKEN to enable /metrics', status=403, content_type='text/plain')
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+            return HttpResponse(status=401)
+        return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -17,6 +17,12 @@ const char* API_KEY = "abc12345devicekey";  // Must match Django Device.api_key
 unsigned long lastUpdate = 0;
 int updateInterval = 15000;  // 15 seconds
 bool pumpState = false;      // Track current pump state to prevent chatter
+// Set to 1 only when the backend runs under ASGI: a long-poll holds a WSGI
+// worker thread for LONG_POLL_SECONDS per device. The default is the plain poll.
+#define USE_LONG_POLL 0
+long lastCommandId = -1;     // Long-poll cursor: newest pump command seen
+const int LONG_POLL_SECONDS = 10;
+unsigned long readingSeq = 0; // Per-sample sequence number; the server drops retried duplicates
 
 // ------------------- HELPER FUNCTIONS -------------------
 void blinkLED(int times, int delayMs = 200) {
@@ -90,6 +96,7 @@ bool sendSoilReading() {
     StaticJsonDocument<200> doc;
     doc["device_id"] = DEVICE_ID;
     doc["moisture"] = moisture_percent;
+    doc["seq"] = readingSeq++;
 
     String requestBody;
     serializeJson(doc, requestBody);
@@ -97,7 +104,8 @@ bool sendSoilReading() {
     int httpCode = http.POST(requestBody);
     Serial.printf("📤 Sent Reading -> HTTP %d | Moisture: %.2f%%\n", httpCode, moisture_percent);
 
-    if (httpCode == 201) {
+    // 201 stored, 202 queued by the write-behind buffer, 200 a retry already stored
+    if (httpCode >= 200 && httpCode < 300) {
       blinkLED(2, 200);
       http.end();
       return true;
@@ -118,22 +126,40 @@ bool sendSoilReading() {
 void fetchPumpCommand() {
   if (WiFi.status() == WL_CONNECTED) {
     HTTPClient http;
-    String url = String(BASE_URL) + "/status/esp/";
+#if USE_LONG_POLL
+    // Long-poll: the server answers as soon as a newer command exists, or 204 on timeout
+    String url = String(BASE_URL) + "/status/esp/wait/";
+    if (lastCommandId >= 0) {
+      url += "?since=" + String(lastCommandId) + "&timeout=" + String(LONG_POLL_SECONDS);
+    }
 
     http.begin(url);
+    http.setTimeout((LONG_POLL_SECONDS + 5) * 1000);
+#else
+    String url = String(BASE_URL) + "/status/esp/";
+    http.begin(url);
+#endif
     http.addHeader("X-API-KEY", API_KEY);
 
     int httpCode = http.GET();
     Serial.printf("📥 Fetch Command -> HTTP %d\n", httpCode);
 
-    if (httpCode == 200) {
+    if (httpCode == 204) {
+      Serial.println("⏳ No new command");
+    } else if (httpCode == 200) {
       String payload = http.getString();
       Serial.println("Response: " + payload);
 
-      StaticJsonDocument<512> doc;
+      StaticJsonDocument<768> doc;
       DeserializationError err = deserializeJson(doc, payload);
       blinkLED(5, 200);
       if (!err) {
+        if (!doc["command"].isNull()) {
+          lastCommandId = doc["command"]["id"];
+        } else if (lastCommandId < 0) {
+          lastCommandId = 0;
+        }
+
         float soil_moisture = doc["soil_moisture"];
         bool motor_status = doc["motor_status"];
         bool is_auto_mode = doc["is_auto_mode"];
@@ -141,24 +167,19 @@ void fetchPumpCommand() {
         Serial.printf("🌱 Moisture: %.2f | Auto: %d | Motor: %d\n",
                       soil_moisture, is_auto_mode, motor_status);
 
-        float dry_threshold = 40.0;
-        float wet_threshold = 70.0;
-
         if (is_auto_mode) {
           blinkLED(2, 200);
-          // --- Auto Mode (with hysteresis) ---
-          if (soil_moisture < dry_threshold && !pumpState) {
+          // --- Auto Mode: the server's rules engine decides, we follow motor_status ---
+          if (motor_status && !pumpState) {
             digitalWrite(RELAY_PIN, HIGH);
             digitalWrite(LED_BUILTIN, HIGH);
             pumpState = true;
-            //updatePumpStatusToServer(true);
-            Serial.println("💧 Auto Mode: Pump ON (soil too dry)");
-          } else if (soil_moisture > wet_threshold && pumpState) {
+            Serial.println("💧 Auto Mode: Pump ON (server decision)");
+          } else if (!motor_status && pumpState) {
             digitalWrite(RELAY_PIN, LOW);
             digitalWrite(LED_BUILTIN, LOW);
             pumpState = false;
-            //updatePumpStatusToServer(false);
-            Serial.println("🛑 Auto Mode: Pump OFF (soil wet enough)");
+            Serial.println("🛑 Auto Mode: Pump OFF (server decision)");
           } else {
             Serial.println("⚖️ Auto Mode: No change (stable moisture)");
           }
@@ -37,6 +37,7 @@ const Dashboard = () => {
   const [actionHistory, setActionHistory] = useState<ActionLog[]>([]);
   const [lastUpdated, setLastUpdated] = useState<string>("");
   const [isLoading, setIsLoading] = useState(false);
+  const [isStreaming, setIsStreaming] = useState(false);
 
   // Check authentication on mount
   useEffect(() => {
@@ -135,21 +136,67 @@ const Dashboard = () => {
     navigate("/");
   };
 
-  // Initial fetch + polling
+  // Initial fetch
   useEffect(() => {
     if (token) {
       fetchSystemStatus();
+    }
+  }, [token]);
+
+  // Live updates pushed by the backend (status deltas, new readings, pump actions)
+  useEffect(() => {
+    if (!token) return;
+    const source = new EventSource(`${baseUrl}/api/status/stream/?token=${encodeURIComponent(token)}`);
+
+    source.onopen = () => setIsStreaming(true);
+    source.onerror = () => {
+      setIsStreaming(false);
+      // A network drop is retried by EventSource; an HTTP error (503 when the
+      // backend runs under WSGI) closes the stream for good, so keep polling.
+      if (source.readyState === EventSource.CLOSED) source.close();
+    };
+
+    source.addEventListener("status", (event) => {
+      const delta = JSON.parse((event as MessageEvent).data);
+      setSystemStatus((prev) => ({ ...(prev ?? {}), ...delta }) as SystemStatus);
+      setLastUpdated(new Date().toLocaleTimeString());
+    });
+
+    source.addEventListener("readings", (event) => {
+      const readings = JSON.parse((event as MessageEvent).data);
+      setMoistureHistory((prev) =>
+        [
+          ...readings.map((h: any) => ({ time: h.timestamp, moisture: h.moisture_level })),
+          ...prev,
+        ].slice(0, 10)
+      );
+    });
+
+    source.addEventListener("action", (event) => {
+      const a = JSON.parse((event as MessageEvent).data);
+      setActionHistory((prev) =>
+        [{ id: a.id.toString(), action: a.action_display, timestamp: a.timestamp }, ...prev].slice(0, 10)
+      );
+    });
+
+    return () => source.close();
+  }, [token]);
+
+  // Fall back to polling while the stream is down
+  useEffect(() => {
+    if (token && !isStreaming) {
       const interval = setInterval(fetchSystemStatus, 30000);
       return () => clearInterval(interval);
     }
-  }, [token]);  // Fixed: Depends on token
+  }, [token, isStreaming]);
 
-  // Refetch on window focus (for app backgrounding in mobile)
+  // Refetch on window focus (for app backgrounding in mobile) unless the stream is live
   useEffect(() => {
+    if (isStreaming) return;
     const handleFocus = () => fetchSystemStatus();
     window.addEventListener("focus", handleFocus);
     return () => window.removeEventListener("focus", handleFocus);
-  }, [token]);
+  }, [token, isStreaming]);
 
   if (!token) return null;  // Guard render
 